@@ -0,0 +1,153 @@
+"""
+Destination autocomplete from an in-memory prefix tree.
+
+The tree holds the ``AUTOCOMPLETE_DESTINATIONS`` most common trip
+destinations. Each node keeps its best completions, so a lookup is one walk
+down the prefix. Every word of a name is indexed, so "ker" finds
+"Munnar, Kerala". The tree is rebuilt in a background thread once it is older
+than ``AUTOCOMPLETE_REFRESH_SECONDS``; only the very first lookup waits for
+the database. Until a first build succeeds, lookups fall back to a prefix
+query on the trips table.
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count
+
+from .models import Trip
+
+MAX_SUGGESTIONS = 10
+
+_word_start = re.compile(r'(?:^|[^\w])(?=\w)')
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+class DestinationTrie:
+    """Prefix tree over destination names, most popular first."""
+
+    def __init__(self, names, k=MAX_SUGGESTIONS):
+        # ``names`` must already be sorted by popularity, best first, so that
+        # the first ``k`` names to reach a node are its completions.
+        self.k    = k
+        self.size = 0
+        self._root = {'children': {}, 'top': []}
+        for name in names:
+            self._insert(name)
+
+    def _insert(self, name):
+        normalized = _normalize(name)
+        if not normalized:
+            return
+        self.size += 1
+        seen = set()
+        for match in _word_start.finditer(normalized):
+            node = self._root
+            for char in normalized[match.end():]:
+                node = node['children'].setdefault(char, {'children': {}, 'top': []})
+                if len(node['top']) < self.k and id(node) not in seen:
+                    node['top'].append(name)
+                    seen.add(id(node))
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        node = self._root
+        for char in _normalize(prefix):
+            node = node['children'].get(char)
+            if node is None:
+                return []
+        return node['top'][:limit]
+
+
+def popular_destinations(limit):
+    """The ``limit`` most common destinations, case variants merged under the commonest spelling."""
+    counts, spelling = {}, {}
+    rows = (Trip.objects.values('destination').annotate(n=Count('id'))
+            .order_by('-n')[:limit * 2])
+    for row in rows:
+        key = _normalize(row['destination'])
+        counts[key] = counts.get(key, 0) + row['n']
+        spelling.setdefault(key, row['destination'].strip())
+    ranked = sorted(counts, key=lambda key: (-counts[key], key))[:limit]
+    return [spelling[key] for key in ranked]
+
+
+def prefix_matches(prefix, limit):
+    """Destinations starting with ``prefix``, most common first, straight from the trips table."""
+    rows = (Trip.objects.filter(destination__istartswith=_normalize(prefix))
+            .values('destination').annotate(n=Count('id')).order_by('-n', 'destination')[:limit])
+    return [row['destination'] for row in rows]
+
+
+class DestinationIndex:
+    """Holds the current :class:`DestinationTrie` and rebuilds it when it goes stale."""
+
+    def __init__(self, size, refresh_seconds, loader=popular_destinations):
+        self.size            = size
+        self.refresh_seconds = refresh_seconds
+        self._loader         = loader
+        self._trie           = None
+        self._built_at       = 0.0
+        self._lock           = threading.Lock()
+        self._refreshing     = False
+
+    def refresh(self):
+        trie = DestinationTrie(self._loader(self.size))
+        with self._lock:
+            self._trie     = trie
+            self._built_at = time.monotonic()
+        return trie
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Autocomplete refresh failed, serving the old index: {e}")
+            finally:
+                close_old_connections()
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='autocomplete-refresh', daemon=True).start()
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        trie = self._trie
+        if trie is None:
+            try:
+                trie = self.refresh()
+            except Exception as e:
+                print(f"⚠️ Autocomplete build failed, querying trips directly: {e}")
+                return prefix_matches(prefix, limit)
+        elif time.monotonic() - self._built_at >= self.refresh_seconds:
+            self._refresh_in_background()
+        return trie.suggest(prefix, limit)
+
+    def stats(self) -> dict:
+        return {
+            'destinations': self._trie.size if self._trie else 0,
+            'age_seconds':  round(time.monotonic() - self._built_at, 1) if self._trie else None,
+        }
+
+
+_index      = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> DestinationIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DestinationIndex(settings.AUTOCOMPLETE_DESTINATIONS,
+                                          settings.AUTOCOMPLETE_REFRESH_SECONDS)
+    return _index
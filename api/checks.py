@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+DUMMY_CACHE  = 'django.core.cache.backends.dummy.DummyCache'
+
+# Caches invalidated on write; the other workers keep whatever a per-process
+# one holds until it expires
+INVALIDATED_CACHE_SETTINGS = ['GROUP_CACHE_ALIAS', 'PROFILE_CACHE_ALIAS']
+
+
+def _backend(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND')
+
+
+def _per_process(alias):
+    """True when entries written in one worker are not seen by the others."""
+    return _backend(alias) in (LOCMEM_CACHE, DUMMY_CACHE)
+
+
+@register(Tags.caches, Tags.database)
+def check_replica_pin_cache(app_configs, **kwargs):
+    if settings.DB_REPLICA_ALIASES and _per_process(settings.DB_PIN_CACHE_ALIAS):
+        return [Error(
+            f"DB_PIN_CACHE_ALIAS '{settings.DB_PIN_CACHE_ALIAS}' is a per-process cache, so a "
+            f"client is pinned to the primary only in the worker that served its write.",
+            hint='Point DB_PIN_CACHE_ALIAS at a Redis or Memcached cache shared by every worker.',
+            id='api.E001',
+        )]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_invalidated_caches(app_configs, **kwargs):
+    # A dummy cache holds nothing, so there is nothing to go stale
+    warnings = []
+    for name in INVALIDATED_CACHE_SETTINGS:
+        alias = getattr(settings, name)
+        if _backend(alias) == LOCMEM_CACHE:
+            warnings.append(Warning(
+                f"{name} '{alias}' is a per-process cache, so an invalidation only reaches the "
+                f"worker that made it; the others serve stale entries until they expire.",
+                hint=f'Point {name} at a Redis or Memcached cache shared by every worker.',
+                id='api.W001',
+            ))
+    return warnings
@@ -0,0 +1,97 @@
+"""
+Materializes ``CompletedTrip`` rows for every active registration on a trip
+whose ``end_date`` has passed, so trips/completed/ is a plain indexed read.
+
+Run it with the ``materialize_completed_trips`` management command from
+cron. A run holds a Postgres advisory lock, so one that starts while another
+is still going skips instead of repeating the work.
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import TripRegistration
+
+DEFAULT_BATCH_SIZE = 50000
+
+# pg_try_advisory_lock key taken by a run
+LOCK_KEY = 0x636f6d70
+
+MATERIALIZE_SQL = """
+INSERT INTO completed_trips (user_id, trip_id, destination, start_date, end_date, created_at)
+SELECT r.user_id, r.trip_id, t.destination, t.start_date, t.end_date, %(now)s
+FROM trip_registrations r
+JOIN trip_details t ON t.id = r.trip_id
+WHERE r.id BETWEEN %(lo)s AND %(hi)s
+  AND r.status IN ({active})
+  AND t.end_date < %(today)s
+  AND t.end_date >= %(since)s
+ON CONFLICT (user_id, trip_id) DO UPDATE SET
+    destination = EXCLUDED.destination,
+    start_date  = EXCLUDED.start_date,
+    end_date    = EXCLUDED.end_date
+WHERE completed_trips.destination <> EXCLUDED.destination
+   OR completed_trips.start_date  <> EXCLUDED.start_date
+   OR completed_trips.end_date    <> EXCLUDED.end_date
+""".format(active=', '.join(f"'{status}'" for status in TripRegistration.ACTIVE_STATUSES))
+
+
+def materialize_range(lo, hi, today, since=date.min):
+    """Upserts completed trips for registration ids in ``[lo, hi]``. Returns rows inserted or corrected."""
+    params = {'lo': lo, 'hi': hi, 'today': today, 'since': since, 'now': timezone.now()}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(MATERIALIZE_SQL, params)
+        return cursor.rowcount
+
+
+def materialize(since=None, today=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upserts a ``CompletedTrip`` for each active registration on a trip whose
+    ``end_date`` is before ``today``, one ``INSERT ... ON CONFLICT`` per
+    ``batch_size`` registration ids. Rows whose trip changed get the current
+    destination and dates; unchanged rows are not rewritten. With ``since``,
+    only trips that ended on or after that date are considered.
+
+    Returns the number of rows inserted or corrected.
+    """
+    today  = today or date.today()
+    since  = since or date.min
+    bounds = TripRegistration.objects.aggregate(lo=Min('id'), hi=Max('id'))
+    if bounds['lo'] is None:
+        return 0
+    written = 0
+    for lo in range(bounds['lo'], bounds['hi'] + 1, batch_size):
+        written += materialize_range(lo, lo + batch_size - 1, today, since)
+    return written
+
+
+def recent(lookback_days=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Materializes trips that ended within the last ``lookback_days`` days."""
+    lookback_days = lookback_days if lookback_days is not None else settings.COMPLETED_TRIPS_LOOKBACK_DAYS
+    return materialize(since=date.today() - timedelta(days=lookback_days), batch_size=batch_size)
+
+
+# ── Locking ───────────────────────────────────────────────────────────────────
+
+@contextmanager
+def run_lock():
+    """
+    Yields whether the caller holds the lock on materializing. Only one
+    session holds it at a time on Postgres; other databases always yield True.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [LOCK_KEY])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_KEY])
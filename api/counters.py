@@ -0,0 +1,93 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from . import profile_cache
+from .models import Follower, Post, TripRegistration, UserStats
+
+FIELDS = ('post_count', 'follower_count', 'following_count', 'trip_count')
+
+
+def _fresh_counts(user_id):
+    return {
+        'post_count':      Post.objects.filter(user_id=user_id).count(),
+        'follower_count':  Follower.objects.filter(following_id=user_id).count(),
+        'following_count': Follower.objects.filter(follower_id=user_id).count(),
+        'trip_count':      TripRegistration.objects.filter(
+            user_id=user_id, status__in=TripRegistration.ACTIVE_STATUSES).count(),
+    }
+
+
+def get_stats(user):
+    """
+    The user's counter row. Rows are created at signup and by writes, never
+    here: a read that wrote would pin its client to the primary. A user
+    without one (from before migration 0024, or bulk-created) gets live
+    counts in an unsaved row.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    stats      = UserStats(user_id=user.id, **_fresh_counts(user.id))
+    user.stats = stats
+    return stats
+
+
+def create_for_new_user(user_id):
+    """A new user has nothing to count yet, so their row starts at zero."""
+    UserStats.objects.bulk_create([UserStats(user_id=user_id)], ignore_conflicts=True)
+
+
+def bump(user_id, **deltas):
+    """
+    Atomically adds ``deltas`` (e.g. ``post_count=3``) to a user's counters.
+
+    Callers run this in the same transaction as the write it mirrors. A user
+    without a row yet gets one built from live counts, which already include
+    that write. Every counter change also changes the profile, so the user's
+    cached profile version is bumped once the transaction commits.
+    """
+    profile_cache.bump_version_on_commit(user_id)
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+    if not updated:
+        try:
+            with transaction.atomic():
+                UserStats.objects.create(user_id=user_id, **_fresh_counts(user_id))
+        except IntegrityError:
+            bump(user_id, **deltas)
+
+
+# ── Bulk recompute ────────────────────────────────────────────────────────────
+
+RECOMPUTE_SQL = """
+INSERT INTO user_stats (user_id, post_count, follower_count, following_count, trip_count)
+SELECT u.id,
+       COALESCE(p.n, 0), COALESCE(fr.n, 0), COALESCE(fg.n, 0), COALESCE(r.n, 0)
+FROM auth_user u
+LEFT JOIN (SELECT user_id, COUNT(*) AS n FROM posts
+           WHERE user_id BETWEEN %(lo)s AND %(hi)s GROUP BY user_id) p ON p.user_id = u.id
+LEFT JOIN (SELECT following_id, COUNT(*) AS n FROM followers
+           WHERE following_id BETWEEN %(lo)s AND %(hi)s GROUP BY following_id) fr ON fr.following_id = u.id
+LEFT JOIN (SELECT follower_id, COUNT(*) AS n FROM followers
+           WHERE follower_id BETWEEN %(lo)s AND %(hi)s GROUP BY follower_id) fg ON fg.follower_id = u.id
+LEFT JOIN (SELECT user_id, COUNT(*) AS n FROM trip_registrations
+           WHERE user_id BETWEEN %(lo)s AND %(hi)s AND status IN ({active}) GROUP BY user_id) r ON r.user_id = u.id
+WHERE u.id BETWEEN %(lo)s AND %(hi)s
+ON CONFLICT (user_id) DO UPDATE SET
+    post_count      = EXCLUDED.post_count,
+    follower_count  = EXCLUDED.follower_count,
+    following_count = EXCLUDED.following_count,
+    trip_count      = EXCLUDED.trip_count
+WHERE user_stats.post_count      <> EXCLUDED.post_count
+   OR user_stats.follower_count  <> EXCLUDED.follower_count
+   OR user_stats.following_count <> EXCLUDED.following_count
+   OR user_stats.trip_count      <> EXCLUDED.trip_count
+""".format(active=', '.join(f"'{status}'" for status in TripRegistration.ACTIVE_STATUSES))
+
+
+def recompute_range(lo, hi):
+    """Rewrites counters for user ids in ``[lo, hi]``. Returns rows inserted or corrected."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(RECOMPUTE_SQL, {'lo': lo, 'hi': hi})
+        return cursor.rowcount
@@ -0,0 +1,22 @@
+"""
+Connection settings and psycopg pool counters for internal/stats/.
+
+The pool is per worker process, so these numbers describe only the process
+that answered the request.
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def stats(alias='default') -> dict:
+    connection = connections[alias]
+    result = {
+        'mode':          settings.DB_CONN_MODE,
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'conn_max_age':  connection.settings_dict['CONN_MAX_AGE'],
+    }
+    # Only the PostgreSQL backend has a pool, and only with OPTIONS['pool'] set
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        result['pool'] = pool.get_stats()
+    return result
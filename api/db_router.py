@@ -0,0 +1,287 @@
+"""
+Read replicas for the read-heavy endpoints.
+
+Views decorated with :func:`read_from_replica` send their ORM reads to one
+of ``DB_REPLICA_ALIASES``. Writes, and everything outside those views, stay
+on ``default``. Raw SQL through ``django.db.connection`` always uses the
+primary. Inside a decorated view, reads go back to the primary after its
+first write, and inside a transaction on it.
+
+Read-your-writes: :class:`PrimaryPinMiddleware` pins a client to the
+primary for ``DB_PIN_SECONDS`` after any request that writes. The client is
+identified by its credentials (Authorization header or session cookie), or
+by its address when it sends none. Pins live in the cache
+``DB_PIN_CACHE_ALIAS``, which has to be shared by all workers (Redis,
+Memcached, ...); the api.E001 check refuses a per-process one.
+
+Health: each replica is probed at most every ``DB_REPLICA_CHECK_SECONDS``
+per process. A replica that fails the probe, lags by more than
+``DB_REPLICA_MAX_LAG_SECONDS``, or raises a connection error during a view
+is skipped for ``DB_REPLICA_RETRY_SECONDS``. A view that failed that way is
+run again on the primary, which is safe for the GET-only views this is
+applied to.
+"""
+import contextvars
+import functools
+import hashlib
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, InterfaceError, OperationalError, connections
+from rest_framework.throttling import BaseThrottle
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Per-request routing state: {'alias': replica or None, 'wrote': bool}. A dict
+# rather than plain values so that changes made in sync_to_async threads are
+# seen by the middleware and the decorator.
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state['alias'] is None or state['wrote']:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state['alias']
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in settings.DB_REPLICA_ALIASES
+
+
+# ── Replica health ────────────────────────────────────────────────────────────
+
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+_health      = {}   # alias -> {'down_until': float, 'next_check': float, 'lag': float | None}
+_health_lock = threading.Lock()
+_stats       = {'replica_reads': {}, 'primary_reads': 0, 'pinned': 0, 'fallbacks': 0, 'probe_failures': 0}
+
+
+def _count(key, alias=None):
+    with _health_lock:
+        if alias is None:
+            _stats[key] += 1
+        else:
+            _stats[key][alias] = _stats[key].get(alias, 0) + 1
+
+
+def mark_down(alias):
+    with _health_lock:
+        entry = _health.setdefault(alias, {'next_check': 0.0, 'lag': None})
+        entry['down_until'] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+        entry['next_check'] = entry['down_until']
+
+
+def _probe(alias):
+    """Checks that ``alias`` answers and is not too far behind; marks it down otherwise."""
+    try:
+        with connections[alias].cursor() as cursor:
+            if connections[alias].vendor == 'postgresql':
+                cursor.execute(LAG_SQL)
+                lag = float(cursor.fetchone()[0] or 0)
+            else:
+                cursor.execute('SELECT 1')
+                lag = 0.0
+    except (OperationalError, InterfaceError):
+        lag = None
+    with _health_lock:
+        entry = _health.setdefault(alias, {'down_until': 0.0})
+        entry['lag'] = lag
+        entry['next_check'] = time.monotonic() + settings.DB_REPLICA_CHECK_SECONDS
+    if lag is None or lag > settings.DB_REPLICA_MAX_LAG_SECONDS:
+        _count('probe_failures')
+        mark_down(alias)
+        return False
+    return True
+
+
+def _candidates():
+    """Replicas not marked down, and which of them are due a probe."""
+    now = time.monotonic()
+    up, due = [], []
+    with _health_lock:
+        for alias in settings.DB_REPLICA_ALIASES:
+            entry = _health.get(alias)
+            if entry is None or entry['next_check'] <= now:
+                due.append(alias)
+            elif entry['down_until'] <= now:
+                up.append(alias)
+    return up, due
+
+
+def _choose(up, probed):
+    healthy = up + [alias for alias, ok in probed if ok]
+    return random.choice(healthy) if healthy else None
+
+
+def stats() -> dict:
+    """Where routed reads went and the last known state of each replica, for this process."""
+    now = time.monotonic()
+    with _health_lock:
+        return {
+            'replica_reads':  dict(_stats['replica_reads']),
+            'primary_reads':  _stats['primary_reads'],
+            'pinned':         _stats['pinned'],
+            'fallbacks':      _stats['fallbacks'],
+            'probe_failures': _stats['probe_failures'],
+            'replicas': {
+                alias: {
+                    'up':    _health.get(alias, {}).get('down_until', 0.0) <= now,
+                    'lag_s': _health.get(alias, {}).get('lag'),
+                }
+                for alias in settings.DB_REPLICA_ALIASES
+            },
+        }
+
+
+# ── Read-your-writes pins ─────────────────────────────────────────────────────
+
+def _pin_keys(request):
+    """
+    Cache keys for the client making ``request``: its credentials when it
+    sends any, otherwise its address. The address is only a fallback: it is
+    shared by everyone behind a NAT, and a forwarded one can be made up.
+    """
+    ident = (request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+             or BaseThrottle().get_ident(request))
+    return [f'dbpin:{hashlib.sha256(ident.encode()).hexdigest()[:32]}'] if ident else []
+
+
+def _pin_cache():
+    return caches[settings.DB_PIN_CACHE_ALIAS]
+
+
+def _wrote(request, state):
+    return state['wrote'] or request.method not in SAFE_METHODS
+
+
+def _pins_for(request):
+    return dict.fromkeys(_pin_keys(request), 1)
+
+
+class PrimaryPinMiddleware:
+    """Sets up routing state for each request and pins clients after writes."""
+
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {'alias': None, 'wrote': False}
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if settings.DB_REPLICA_ALIASES and _wrote(request, state) and response.status_code < 500:
+            _pin_cache().set_many(_pins_for(request), timeout=settings.DB_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        state = {'alias': None, 'wrote': False}
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if settings.DB_REPLICA_ALIASES and _wrote(request, state) and response.status_code < 500:
+            await _pin_cache().aset_many(_pins_for(request), timeout=settings.DB_PIN_SECONDS)
+        return response
+
+
+# ── View decorator ────────────────────────────────────────────────────────────
+
+def read_from_replica(view):
+    """
+    Sends the ORM reads of a safe-method view to a healthy replica, unless
+    the client is pinned to the primary. Needs :class:`PrimaryPinMiddleware`.
+    The view has to let ``OperationalError`` and ``InterfaceError`` escape;
+    one it turns into a response cannot be retried on the primary.
+    """
+    def routable(request):
+        return settings.DB_REPLICA_ALIASES and request.method in SAFE_METHODS and _state.get() is not None
+
+    def fall_back(state, error):
+        print(f"⚠️ Replica {state['alias']} failed, retrying on the primary: {error}")
+        _count('fallbacks')
+        mark_down(state['alias'])
+        state['alias'] = None
+
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            if not routable(request):
+                return await view(request, *args, **kwargs)
+            state = _state.get()
+            if await _pin_cache().aget_many(_pin_keys(request)):
+                _count('pinned')
+                return await view(request, *args, **kwargs)
+            up, due = _candidates()
+            probed = [(alias, await sync_to_async(_probe)(alias)) for alias in due]
+            state['alias'] = _choose(up, probed)
+            if state['alias'] is None:
+                _count('primary_reads')
+                return await view(request, *args, **kwargs)
+            _count('replica_reads', state['alias'])
+            try:
+                return await view(request, *args, **kwargs)
+            except (OperationalError, InterfaceError) as e:
+                if state['wrote']:
+                    raise
+                fall_back(state, e)
+                return await view(request, *args, **kwargs)
+            finally:
+                state['alias'] = None
+    else:
+        def wrapper(request, *args, **kwargs):
+            if not routable(request):
+                return view(request, *args, **kwargs)
+            state = _state.get()
+            if _pin_cache().get_many(_pin_keys(request)):
+                _count('pinned')
+                return view(request, *args, **kwargs)
+            up, due = _candidates()
+            state['alias'] = _choose(up, [(alias, _probe(alias)) for alias in due])
+            if state['alias'] is None:
+                _count('primary_reads')
+                return view(request, *args, **kwargs)
+            _count('replica_reads', state['alias'])
+            try:
+                return view(request, *args, **kwargs)
+            except (OperationalError, InterfaceError) as e:
+                if state['wrote']:
+                    raise
+                fall_back(state, e)
+                return view(request, *args, **kwargs)
+            finally:
+                state['alias'] = None
+
+    return functools.wraps(view)(wrapper)
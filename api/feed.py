@@ -0,0 +1,198 @@
+"""
+Home feed built from per-user timelines of post ids.
+
+New posts are fanned out on write to each follower's timeline in batches.
+Authors with more than ``FEED_FANOUT_MAX_FOLLOWERS`` followers are skipped
+at write time; their recent posts are merged in when a follower reads
+(fan-out on read). Timelines hold at most ``FEED_TIMELINE_CAP`` entries and
+are paged newest first by post id.
+
+Storage is pluggable through ``FEED_TIMELINE_BACKEND``: ``CacheTimelineStore``
+(Django cache, for local testing) or ``DBTimelineStore`` (``feed_timelines``).
+"""
+import abc
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils.module_loading import import_string
+
+from .models import Follower, Post, TimelineEntry, UserStats
+
+
+# ── Stores ────────────────────────────────────────────────────────────────────
+
+class TimelineStore(abc.ABC):
+    """Entries are ``(post_id, author_id)`` pairs; reads return them newest first."""
+
+    def __init__(self, cap):
+        self.cap = cap
+
+    @abc.abstractmethod
+    def push(self, user_ids, entries):
+        """Adds ``entries`` to each user's timeline, keeping the newest ``cap``."""
+
+    @abc.abstractmethod
+    def read(self, user_id, before=None, limit=20):
+        """Up to ``limit`` entries older than post id ``before``, newest first."""
+
+    @abc.abstractmethod
+    def remove_author(self, user_id, author_id):
+        """Drops one author's entries from one timeline."""
+
+
+class CacheTimelineStore(TimelineStore):
+    """
+    Timelines as capped lists in the Django cache. Updates are
+    read-modify-write, so concurrent pushes to one user can drop an entry;
+    use it for local testing, not production.
+    """
+
+    KEY_PREFIX = 'feed_timeline:'
+
+    def _key(self, user_id):
+        return f'{self.KEY_PREFIX}{user_id}'
+
+    def push(self, user_ids, entries):
+        keys     = [self._key(user_id) for user_id in user_ids]
+        existing = cache.get_many(keys)
+        updated  = {}
+        for key in keys:
+            merged = dict(existing.get(key, []))
+            merged.update(entries)
+            updated[key] = sorted(merged.items(), reverse=True)[:self.cap]
+        cache.set_many(updated, timeout=None)
+
+    def read(self, user_id, before=None, limit=20):
+        entries = cache.get(self._key(user_id), [])
+        if before is not None:
+            entries = [entry for entry in entries if entry[0] < before]
+        return [tuple(entry) for entry in entries[:limit]]
+
+    def remove_author(self, user_id, author_id):
+        key     = self._key(user_id)
+        entries = cache.get(key, [])
+        cache.set(key, [e for e in entries if e[1] != author_id], timeout=None)
+
+
+class DBTimelineStore(TimelineStore):
+    """Timelines as rows in ``feed_timelines``; every push trims the timelines it wrote to the cap."""
+
+    def push(self, user_ids, entries):
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id)
+            for user_id in user_ids for post_id, author_id in entries
+        ], ignore_conflicts=True)
+        self._trim(user_ids)
+
+    def read(self, user_id, before=None, limit=20):
+        rows = TimelineEntry.objects.filter(user_id=user_id)
+        if before is not None:
+            rows = rows.filter(post_id__lt=before)
+        return list(rows.order_by('-post_id').values_list('post_id', 'author_id')[:limit])
+
+    def _trim(self, user_ids):
+        # One pass numbers each user's entries newest first; only users with
+        # more than the cap have rows past it to delete
+        position = Window(RowNumber(), partition_by=F('user_id'), order_by=F('post_id').desc())
+        past_cap = (TimelineEntry.objects.filter(user_id__in=user_ids)
+                    .annotate(position=position).filter(position__gt=self.cap).values('id'))
+        TimelineEntry.objects.filter(id__in=past_cap).delete()
+
+    def remove_author(self, user_id, author_id):
+        TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.FEED_TIMELINE_BACKEND)(cap=settings.FEED_TIMELINE_CAP)
+    return _store
+
+
+# ── Write side ────────────────────────────────────────────────────────────────
+
+def _is_high_fanout(author_id):
+    follower_count = (UserStats.objects.filter(user_id=author_id)
+                      .values_list('follower_count', flat=True).first())
+    return (follower_count or 0) > settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+def fan_out(author_id, post_ids):
+    """Pushes ``post_ids`` to every follower's timeline, ``FEED_FANOUT_BATCH_SIZE`` followers at a time."""
+    if not post_ids or _is_high_fanout(author_id):
+        return
+    store, batch_size = get_store(), settings.FEED_FANOUT_BATCH_SIZE
+    entries      = [(post_id, author_id) for post_id in post_ids]
+    follower_ids = (Follower.objects.filter(following_id=author_id)
+                    .values_list('follower_id', flat=True).iterator(chunk_size=batch_size))
+    batch = []
+    for follower_id in follower_ids:
+        batch.append(follower_id)
+        if len(batch) >= batch_size:
+            store.push(batch, entries)
+            batch = []
+    if batch:
+        store.push(batch, entries)
+
+
+def fan_out_on_commit(author_id, post_ids):
+    transaction.on_commit(partial(fan_out, author_id, list(post_ids)))
+
+
+def backfill(follower_id, author_id):
+    """Copies the author's recent posts into a new follower's timeline."""
+    if _is_high_fanout(author_id):
+        return
+    post_ids = (Post.objects.filter(user_id=author_id).order_by('-id')
+                .values_list('id', flat=True)[:settings.FEED_BACKFILL_POSTS])
+    entries  = [(post_id, author_id) for post_id in post_ids]
+    if entries:
+        get_store().push([follower_id], entries)
+
+
+def on_follow(follower_id, author_id):
+    transaction.on_commit(partial(backfill, follower_id, author_id))
+
+
+def on_unfollow(follower_id, author_id):
+    transaction.on_commit(partial(get_store().remove_author, follower_id, author_id))
+
+
+# ── Read side ─────────────────────────────────────────────────────────────────
+
+def _high_fanout_followees(user_id):
+    return list(Follower.objects.filter(
+        follower_id=user_id,
+        following__stats__follower_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('following_id', flat=True))
+
+
+def read_feed(user_id, before=None, limit=20):
+    """
+    Returns ``(posts, next_cursor)``: the newest ``limit`` posts older than
+    post id ``before``, merged from the stored timeline and fan-out-on-read
+    authors. Raises ``ValueError`` unless ``limit`` is at least 1.
+    """
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    post_ids = [post_id for post_id, _ in get_store().read(user_id, before, limit)]
+
+    pulled_authors = _high_fanout_followees(user_id)
+    if pulled_authors:
+        pulled = Post.objects.filter(user_id__in=pulled_authors)
+        if before is not None:
+            pulled = pulled.filter(id__lt=before)
+        post_ids += list(pulled.order_by('-id').values_list('id', flat=True)[:limit])
+
+    post_ids = sorted(set(post_ids), reverse=True)[:limit]
+    by_id    = Post.objects.select_related('user__details', 'trip').in_bulk(post_ids)
+    posts    = [by_id[post_id] for post_id in post_ids if post_id in by_id]
+    next_cursor = post_ids[-1] if len(post_ids) == limit else None
+    return posts, next_cursor
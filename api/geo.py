@@ -0,0 +1,114 @@
+"""
+Geohash helpers for "trips near me" without PostGIS.
+
+Route origins and stop points store a ``GEOHASH_PRECISION`` character
+geohash. A radius search tiles the circle's bounding box with a few dozen
+geohash cells and reads them with indexed prefix scans. It then ranks the
+candidates by great-circle distance, using NumPy when it is installed.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - pure-Python fallback
+    np = None
+
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM   = 6371.0088
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# A radius search reads at most this many geohash cells
+MAX_COVER_CELLS = 64
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            value, lng_lo, lng_hi = ((value << 1) | 1, mid, lng_hi) if lng >= mid else (value << 1, lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            value, lat_lo, lat_hi = ((value << 1) | 1, mid, lat_hi) if lat >= mid else (value << 1, lat_lo, mid)
+        even, bits = not even, bits + 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def _cell_degrees(precision):
+    """``(height, width)`` in degrees of a geohash cell of this length."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def _cover(lat_lo, lat_hi, lng_lo, lng_hi, precision):
+    height, width = _cell_degrees(precision)
+    first_row, first_col = math.floor((lat_lo + 90) / height), math.floor((lng_lo + 180) / width)
+    rows = math.floor((lat_hi + 90) / height) - first_row + 1
+    cols = min(math.floor((lng_hi + 180) / width) - first_col + 1, round(360 / width))
+    if rows * cols > MAX_COVER_CELLS:
+        return None
+    cells = []
+    for row in range(rows):
+        lat = min((first_row + row + 0.5) * height - 90, 90 - height / 2)
+        for col in range(cols):
+            lng = ((first_col + col + 0.5) * width) % 360 - 180
+            cells.append(encode(lat, lng, precision))
+    return list(dict.fromkeys(cells))
+
+
+def cells_for_radius(lat, lng, radius_km):
+    """
+    Geohash prefixes that together cover every point within ``radius_km`` of
+    ``(lat, lng)``: the finest cells that tile the circle's bounding box in
+    at most ``MAX_COVER_CELLS`` cells.
+    """
+    lat_span = radius_km / 110.574
+    lat_lo, lat_hi = max(-90.0, lat - lat_span), min(90.0, lat + lat_span)
+    # Degrees of longitude shrink towards the poles; size for the poleward edge
+    edge_lat = max(abs(lat_lo), abs(lat_hi))
+    lng_span = 180.0
+    if edge_lat < 89.9:
+        lng_span = min(180.0, radius_km / (111.320 * math.cos(math.radians(edge_lat))))
+    for precision in range(GEOHASH_PRECISION - 1, 0, -1):
+        cells = _cover(lat_lo, lat_hi, lng - lng_span, lng + lng_span, precision)
+        if cells is not None:
+            return cells
+    return list(_BASE32)
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distances in km from ``(lat, lng)`` to each point of ``lats``/``lngs``."""
+    if np is None:
+        return [_haversine_one(lat, lng, lat2, lng2) for lat2, lng2 in zip(lats, lngs)]
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lngs, dtype=float))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _haversine_one(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def nearest_per_key(keys, distances):
+    """``{key: smallest distance}`` over parallel sequences of keys and distances."""
+    if np is not None and len(keys):
+        keys, distances = np.asarray(keys), np.asarray(distances, dtype=float)
+        order           = np.lexsort((distances, keys))
+        unique, first   = np.unique(keys[order], return_index=True)
+        return dict(zip(unique.tolist(), distances[order][first].tolist()))
+    nearest = {}
+    for key, distance in zip(keys, distances):
+        distance = float(distance)
+        if distance < nearest.get(key, math.inf):
+            nearest[key] = distance
+    return nearest
@@ -0,0 +1,72 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import GroupDetails, GroupMembership
+
+KEY_PREFIX = 'group_members:'
+
+
+def _key(group_id):
+    return f'{KEY_PREFIX}{group_id}'
+
+
+def _cache():
+    return caches[settings.GROUP_CACHE_ALIAS]
+
+
+async def _abuild_payload(group_id):
+    group = await GroupDetails.objects.aget(id=group_id)
+    rows  = [membership async for membership in
+             GroupMembership.objects.filter(group_id=group_id)
+             .select_related('user__details').order_by('joined_at', 'id')]
+    members = []
+    for membership in rows:
+        user        = membership.user
+        user_detail = getattr(user, 'details', None)
+        members.append({
+            'user_id':  user.id,
+            'name':     user_detail.name if user_detail else
+                        f"{user.first_name} {user.last_name}".strip() or user.username,
+            'email':    user.email,
+            'is_admin': user.id == group.admin_id,
+        })
+    return {
+        'group_id':   group.id,
+        'group_name': group.group_name,
+        'admin_id':   group.admin_id,
+        'members':    members,
+    }
+
+
+async def aget_group_payload(group_id):
+    """
+    The ``groups/<id>/`` response body. Served from cache when warm; a cold
+    build runs two queries, one for the group and one for its members.
+    Raises ``GroupDetails.DoesNotExist``.
+    """
+    payload = await _cache().aget(_key(group_id))
+    if payload is None:
+        payload = await _abuild_payload(group_id)
+        await _cache().aset(_key(group_id), payload, timeout=settings.GROUP_MEMBERS_CACHE_TTL)
+    return payload
+
+
+def invalidate_group(group_id):
+    _cache().delete(_key(group_id))
+
+
+def invalidate_groups_for_user(user_id):
+    group_ids = GroupMembership.objects.filter(user_id=user_id).values_list('group_id', flat=True)
+    _cache().delete_many([_key(group_id) for group_id in group_ids])
+
+
+def invalidate_group_on_commit(group_id):
+    """Invalidates after the surrounding transaction commits, so a rebuild never caches uncommitted state."""
+    transaction.on_commit(partial(invalidate_group, group_id))
+
+
+def invalidate_groups_for_user_on_commit(user_id):
+    transaction.on_commit(partial(invalidate_groups_for_user, user_id))
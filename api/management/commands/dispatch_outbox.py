@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.outbox import dispatch, stats
+
+
+class Command(BaseCommand):
+    help = ('Sends queued emails from email_outbox over pooled SMTP connections, '
+            'retrying failures with backoff. Runs until stopped unless --once is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='send everything that is due now, then exit')
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE,
+                            help='emails per claimed batch and SMTP connection')
+        parser.add_argument('--workers', type=int, default=settings.OUTBOX_WORKERS,
+                            help='batches sent in parallel')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='seconds to wait when nothing is due (default: 2)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            totals  = dispatch(batch_size=options['batch_size'], workers=options['workers'])
+            if totals['sent'] or totals['failed']:
+                self.stdout.write(
+                    f"Sent {totals['sent']}, failed {totals['failed']} "
+                    f"in {time.monotonic() - started:.1f}s")
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Outbox: {stats()}'))
+                return
+            time.sleep(options['interval'])
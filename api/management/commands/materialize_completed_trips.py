@@ -0,0 +1,34 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from api.completed_trips import DEFAULT_BATCH_SIZE, materialize, recent, run_lock
+
+
+class Command(BaseCommand):
+    help = ('Upserts completed_trips rows for every active registration on a trip '
+            'whose end date has passed. Skips if another run is still going.')
+
+    def add_arguments(self, parser):
+        window = parser.add_mutually_exclusive_group()
+        window.add_argument('--since', type=date.fromisoformat,
+                            help='only trips that ended on or after this date (YYYY-MM-DD)')
+        window.add_argument('--recent', action='store_true',
+                            help='only trips that ended within COMPLETED_TRIPS_LOOKBACK_DAYS (for cron)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'registration ids per INSERT (default: {DEFAULT_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        with run_lock() as acquired:
+            if not acquired:
+                self.stdout.write('Another run is materializing completed trips; skipped.')
+                return
+            started = time.monotonic()
+            if options['recent']:
+                written = recent(batch_size=options['batch_size'])
+            else:
+                written = materialize(since=options['since'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Materialized completed trips in {time.monotonic() - started:.1f}s; '
+            f'{written} row(s) created or corrected'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.reservations import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Releases seat holds whose held_until has passed and returns their seats.'
+
+    def handle(self, *args, **options):
+        released = release_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired seat hold(s)'))
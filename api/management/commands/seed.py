@@ -0,0 +1,331 @@
+import functools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from api import geo
+from api.models import (
+    ContactDetails, Follower, GroupDetails, GroupMembership, PaymentDetails, Post, Route, RouteStop,
+    SeatAvailability, Trip, TripRegistration, UserDetails, Vehicle,
+)
+
+DESTINATIONS = [
+    'Goa', 'Munnar', 'Ooty', 'Kodaikanal', 'Coorg', 'Hampi', 'Gokarna', 'Pondicherry', 'Alleppey',
+    'Varkala', 'Wayanad', 'Mysore', 'Chikmagalur', 'Manali', 'Shimla', 'Rishikesh', 'Leh', 'Spiti',
+    'Kasol', 'Jaipur', 'Udaipur', 'Jaisalmer', 'Pushkar', 'Varanasi', 'Darjeeling', 'Gangtok',
+    'Shillong', 'Tawang', 'Andaman', 'Lonavala', 'Mahabaleshwar', 'Rann of Kutch', 'Mount Abu',
+    'Auli', 'Nainital', 'Mussoorie', 'Kanyakumari', 'Rameswaram', 'Madurai', 'Yercaud',
+]
+CITIES = [
+    ('Kochi', 9.93, 76.27), ('Chennai', 13.08, 80.27), ('Bengaluru', 12.97, 77.59),
+    ('Hyderabad', 17.38, 78.49), ('Mumbai', 19.08, 72.88), ('Pune', 18.52, 73.86),
+    ('Delhi', 28.61, 77.21), ('Kolkata', 22.57, 88.36), ('Ahmedabad', 23.02, 72.57),
+    ('Jaipur', 26.91, 75.79), ('Trivandrum', 8.52, 76.94), ('Coimbatore', 11.02, 76.96),
+]
+VEHICLES = [('car', 'Swift'), ('car', 'Innova'), ('suv', 'XUV700'), ('bike', 'Himalayan'), ('van', 'Tempo Traveller')]
+
+# Columns written for each table, in foreign-key order
+FIELDS = {
+    User:             ['id', 'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+                       'is_staff', 'is_active', 'date_joined'],
+    UserDetails:      ['user', 'supabase_uid', 'name', 'email', 'created_at'],
+    Trip:             ['id', 'user', 'destination', 'start_date', 'end_date', 'vehicle', 'passengers',
+                       'created_at', 'updated_at'],
+    Route:            ['trip', 'start_location', 'stops', 'origin_lat', 'origin_lng', 'origin_geohash'],
+    RouteStop:        ['trip', 'position', 'name', 'lat', 'lng', 'geohash'],
+    Vehicle:          ['trip', 'vehicle_number', 'vehicle_model'],
+    PaymentDetails:   ['trip', 'price_per_head', 'booking_deadline', 'cancel_deadline', 'payment_method', 'upi_id'],
+    ContactDetails:   ['trip', 'phone', 'email', 'is_phone_verified', 'is_email_verified', 'created_at'],
+    GroupDetails:     ['id', 'trip', 'group_name', 'admin', 'members_count', 'created_at'],
+    SeatAvailability: ['trip', 'total_seats', 'available_seats'],
+    GroupMembership:  ['group', 'user', 'role', 'joined_at'],
+    TripRegistration: ['user', 'trip', 'status', 'registered_at'],
+    Post:             ['user', 'trip', 'image_url', 'caption', 'created_at'],
+    Follower:         ['follower', 'following', 'created_at'],
+}
+
+USER_CHUNK     = 20_000
+FOLLOWER_CHUNK = 5_000
+
+# Zipf exponents: who gets followed, who hosts trips, who joins them
+FOLLOW_SKEW = 1.0
+HOST_SKEW   = 0.8
+JOIN_SKEW   = 0.5
+
+
+# ── Generation ────────────────────────────────────────────────────────────────
+# Each batch draws from its own Random(f'{seed}:{phase}:{batch}'), and rows
+# that others point at (users, trips, groups) get ids from blocks reserved up
+# front, so the data is the same whatever the number of workers.
+
+@functools.lru_cache(maxsize=8)
+def _zipf(n, skew):
+    """Cumulative weights for ranks 0..n-1, and a stride that spreads the ranks over user indexes."""
+    stride = 2654435761 % n or 1
+    while math.gcd(stride, n) != 1:
+        stride += 1
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(n))), stride
+
+
+def _pick_users(rng, plan, skew, k):
+    """``k`` user ids drawn with popularity following a power law (may repeat)."""
+    n = plan['users']
+    cum, stride = _zipf(n, skew)
+    base = plan['user_id']
+    return [base + rank * stride % n for rank in rng.choices(range(n), cum_weights=cum, k=k)]
+
+
+def _at(day, rng):
+    return datetime.combine(day, dtime(rng.randrange(24), rng.randrange(60)), tzinfo=timezone.utc)
+
+
+def _users(rng, plan, lo, hi):
+    seed, today = plan['seed'], plan['today']
+    users, details = [], []
+    for n in range(lo, hi):
+        user_id, name = plan['user_id'] + n, f'seed{seed}-{n}'
+        joined = _at(today - timedelta(days=rng.randint(30, 1500)), rng)
+        first, last = f'Traveller{n}', rng.choice(['', 'K', 'S', 'R', 'M'])
+        users.append((user_id, '!', False, name, first, last, f'{name}@example.com', False, True, joined))
+        details.append((user_id, name, f'{first} {last}'.strip(), f'{name}@example.com', joined))
+    return {User: users, UserDetails: details}
+
+
+def _trips(rng, plan, lo, hi):
+    today, rows = plan['today'], {model: [] for model in list(FIELDS)[2:-1]}
+    trips, routes, stops, vehicles, payments, contacts, groups, seats, members, registrations, posts = rows.values()
+    hosts = _pick_users(rng, plan, HOST_SKEW, hi - lo)
+    for n, owner in zip(range(lo, hi), hosts):
+        trip_id, group_id = plan['trip_id'] + n, plan['group_id'] + n
+        destination = rng.choice(DESTINATIONS)
+        vehicle     = rng.choice(VEHICLES)
+        passengers  = rng.randint(2, 8)
+        start       = today + timedelta(days=rng.randint(-365, 120))
+        end         = start + timedelta(days=rng.randint(1, 7))
+        created     = _at(start - timedelta(days=rng.randint(5, 60)), rng)
+        trips.append((trip_id, owner, destination, start, end, vehicle[0], passengers, created, created))
+
+        city, lat, lng = rng.choice(CITIES)
+        lat, lng = lat + rng.uniform(-0.3, 0.3), lng + rng.uniform(-0.3, 0.3)
+        route_stops = [{'name': f'Stop {p + 1}', 'lat': lat + rng.uniform(-2, 2), 'lng': lng + rng.uniform(-2, 2)}
+                       for p in range(rng.randint(0, 3))]
+        routes.append((trip_id, city, route_stops, lat, lng, geo.encode(lat, lng)))
+        stops.extend((trip_id, p, stop['name'], stop['lat'], stop['lng'], geo.encode(stop['lat'], stop['lng']))
+                     for p, stop in enumerate(route_stops))
+        vehicles.append((trip_id, f'KL-{rng.randint(1, 99):02d}-{rng.randint(1000, 9999)}', vehicle[1]))
+        deadline = datetime.combine(start, dtime(), tzinfo=timezone.utc)
+        payments.append((trip_id, rng.randrange(500, 20000, 100), deadline - timedelta(days=1),
+                         deadline - timedelta(days=3), 'UPI', f'traveller{owner}@upi'))
+        contacts.append((trip_id, f'9{rng.randint(100000000, 999999999)}', f'trip{trip_id}@example.com',
+                         False, True, created))
+
+        # Trips that are over filled up; upcoming ones are still filling
+        fill    = rng.uniform(0.5, 1.0) if end < today else rng.uniform(0.0, 0.8)
+        wanted  = round((passengers - 1) * fill)
+        joiners = list(dict.fromkeys(u for u in _pick_users(rng, plan, JOIN_SKEW, wanted * 2) if u != owner))[:wanted]
+        groups.append((group_id, trip_id, f'Trip to {destination}', owner, 1 + len(joiners), created))
+        seats.append((trip_id, passengers, passengers - len(joiners)))
+        members.append((group_id, owner, GroupMembership.ROLE_ADMIN, created))
+        registrations.append((owner, trip_id, TripRegistration.STATUS_REGISTERED, created))
+        for user_id in joiners:
+            joined = created + timedelta(hours=rng.randint(1, 24 * 30))
+            members.append((group_id, user_id, GroupMembership.ROLE_MEMBER, joined))
+            registrations.append((user_id, trip_id, TripRegistration.STATUS_REGISTERED, joined))
+        if end < today:
+            for user_id in [owner, *joiners]:
+                for photo in range(rng.choice((0, 0, 0, 1, 1, 2, 4))):
+                    posts.append((user_id, trip_id, f'https://img.example.com/{trip_id}/{user_id}/{photo}.jpg',
+                                  f'{destination} with the group',
+                                  _at(min(end + timedelta(days=rng.randint(0, 10)), today), rng)))
+    return rows
+
+
+def _followers(rng, plan, lo, hi):
+    today, rows = plan['today'], []
+    for n in range(lo, hi):
+        user_id = plan['user_id'] + n
+        # Most people follow a handful of accounts, a few follow hundreds
+        wanted = min(plan['users'] - 1, int(rng.paretovariate(1.2) * 2) - 1, 1000)
+        if wanted <= 0:
+            continue
+        followed = dict.fromkeys(_pick_users(rng, plan, FOLLOW_SKEW, wanted))
+        followed.pop(user_id, None)
+        rows.extend((user_id, following_id, _at(today - timedelta(days=rng.randint(0, 700)), rng))
+                    for following_id in followed)
+    return {Follower: rows}
+
+
+PHASES = {'users': _users, 'trips': _trips, 'followers': _followers}
+
+
+# ── Writing ───────────────────────────────────────────────────────────────────
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _text_formatter(field):
+    """Renders one value of ``field`` in COPY's text format."""
+    kind = field.get_internal_type()
+    if kind == 'JSONField':
+        render = lambda value: json.dumps(value).translate(_ESCAPES)  # noqa: E731
+    elif kind == 'BooleanField':
+        render = lambda value: 't' if value else 'f'  # noqa: E731
+    elif kind in ('CharField', 'TextField', 'EmailField'):
+        render = lambda value: value.translate(_ESCAPES)  # noqa: E731
+    else:
+        render = str   # numbers, dates and aware datetimes read back as they print
+    if not field.null:
+        return render
+    return lambda value: '\\N' if value is None else render(value)
+
+
+def _copy(rows):
+    """
+    Streams each table's rows with Postgres ``COPY ... FROM STDIN``. The
+    text is built here with one formatter per column and sent in one piece;
+    psycopg's ``write_row`` adapts every value on its own and took longer
+    than generating the rows.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL synchronous_commit TO OFF')
+        for model, values in rows.items():
+            if not values:
+                continue
+            fields  = [model._meta.get_field(name) for name in FIELDS[model]]
+            columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+            formats = [_text_formatter(field) for field in fields]
+            text    = '\n'.join(['\t'.join([render(value) for render, value in zip(formats, row)])
+                                  for row in values])
+            with cursor.copy(f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN') as copy:
+                copy.write(text + '\n')
+
+
+def _bulk_create(rows):
+    for model, values in rows.items():
+        names = [model._meta.get_field(name).attname for name in FIELDS[model]]
+        model.objects.bulk_create([model(**dict(zip(names, row))) for row in values], batch_size=2000)
+
+
+def _run(task):
+    """Generates and writes one batch in its own transaction; returns rows written per table."""
+    phase, batch, lo, hi, plan = task
+    rows = PHASES[phase](random.Random(f"{plan['seed']}:{phase}:{batch}"), plan, lo, hi)
+    with transaction.atomic():
+        (_copy if plan['method'] == 'copy' else _bulk_create)(rows)
+    return {model._meta.db_table: len(values) for model, values in rows.items()}
+
+
+def _reserve_ids(model, count):
+    """First of ``count`` consecutive primary keys nobody else will be given."""
+    table, count = model._meta.db_table, max(count, 1)
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+            sequence = cursor.fetchone()[0]
+            cursor.execute('SELECT setval(%s, nextval(%s) + %s - 1)', [sequence, sequence, count])
+            return cursor.fetchone()[0] - count + 1
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _close_connections():
+    """Forked workers must not share the parent's sockets or its connection pool."""
+    for conn in connections.all():
+        conn.close()
+        if hasattr(conn, 'close_pool'):
+            conn.close_pool()
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic users, trips (with route, payment, contact, seats, '
+            'group, members and posts) and followers for load tests. The same --seed and --today '
+            'give the same data, whatever --workers is. On Postgres rows are streamed with COPY '
+            'from parallel worker processes. Ids are reserved by moving the sequences, so do '
+            'not run it against a database that is taking writes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=None,
+                            help='default: one user per four trips, at least 20')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--today', type=date.fromisoformat, default=None,
+                            help='date the trips are spread around (YYYY-MM-DD, default: today)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='trips generated and written per transaction (default: 5000)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='worker processes (default: one per CPU on Postgres, otherwise 1)')
+        parser.add_argument('--method', choices=['copy', 'bulk'], default=None,
+                            help='COPY (Postgres only, the default there) or bulk_create')
+        parser.add_argument('--flush', action='store_true',
+                            help='empty every table first (manage.py flush)')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='do not ask before flushing')
+
+    def handle(self, *args, **options):
+        postgres = connection.vendor == 'postgresql'
+        method   = options['method'] or ('copy' if postgres else 'bulk')
+        workers  = options['workers'] or (os.cpu_count() if postgres else 1)
+        if method == 'copy' and not postgres:
+            raise CommandError('--method copy needs PostgreSQL')
+        if workers > 1 and not postgres:
+            raise CommandError('--workers above 1 needs PostgreSQL')
+        if options['flush']:
+            call_command('flush', interactive=options['interactive'], verbosity=0)
+
+        trips = options['trips']
+        users = options['users'] or max(20, trips // 4)
+        plan  = {
+            'seed': options['seed'], 'today': options['today'] or date.today(), 'method': method,
+            'users': users, 'trips': trips,
+            'user_id': _reserve_ids(User, users), 'trip_id': _reserve_ids(Trip, trips),
+            'group_id': _reserve_ids(GroupDetails, trips),
+        }
+        chunks = {'users': (users, USER_CHUNK), 'trips': (trips, options['batch_size']),
+                  'followers': (users, FOLLOWER_CHUNK)}
+
+        _close_connections()
+        pool    = multiprocessing.get_context('fork').Pool(workers) if workers > 1 else None
+        totals  = {}
+        started = time.monotonic()
+        try:
+            # Phases run one after another so every foreign key already exists
+            for phase, (count, size) in chunks.items():
+                phase_started, phase_rows = time.monotonic(), 0
+                tasks = [(phase, batch, lo, min(lo + size, count), plan)
+                         for batch, lo in enumerate(range(0, count, size))]
+                for written in (pool.imap_unordered(_run, tasks) if pool else map(_run, tasks)):
+                    for table, n in written.items():
+                        totals[table] = totals.get(table, 0) + n
+                    phase_rows += sum(written.values())
+                elapsed = time.monotonic() - phase_started
+                self.stdout.write(f'  {phase:<9} {phase_rows:>11,} row(s) in {elapsed:6.1f}s '
+                                  f'({phase_rows / elapsed:,.0f} rows/s)')
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        elapsed = time.monotonic() - started
+        rows    = sum(totals.values())
+        for table, n in totals.items():
+            self.stdout.write(f'    {table:<20} {n:>11,}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows:,} row(s) in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s) '
+            f'with {workers} worker(s) using {method}'))
+
+        if postgres:
+            with connection.cursor() as cursor:
+                for model in FIELDS:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        # Derived tables, built the same way as in production
+        call_command('materialize_completed_trips', stdout=self.stdout)
+        call_command('recompute_user_stats', stdout=self.stdout)
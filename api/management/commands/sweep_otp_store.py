@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.otp_store import get_store
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired OTP codes and fully refilled resend allowances.'
+
+    def handle(self, *args, **options):
+        removed = get_store().sweep()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired OTP entry(ies)'))
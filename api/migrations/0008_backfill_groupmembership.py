@@ -0,0 +1,58 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_memberships(apps, schema_editor):
+    GroupDetails    = apps.get_model('api', 'GroupDetails')
+    GroupMembership = apps.get_model('api', 'GroupMembership')
+    User            = apps.get_model('auth', 'User')
+
+    existing_users = set(User.objects.values_list('id', flat=True))
+    rows = []
+    for group in GroupDetails.objects.only('id', 'admin_id', 'members_list').iterator(chunk_size=BATCH_SIZE):
+        member_ids = [group.admin_id] + [uid for uid in (group.members_list or []) if isinstance(uid, int)]
+        for uid in dict.fromkeys(member_ids):
+            if uid not in existing_users:
+                continue
+            rows.append(GroupMembership(
+                group_id=group.id, user_id=uid,
+                role='admin' if uid == group.admin_id else 'member',
+            ))
+        if len(rows) >= BATCH_SIZE:
+            GroupMembership.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    GroupMembership.objects.bulk_create(rows, ignore_conflicts=True)
+
+    # members_count was maintained by hand; make it agree with the table
+    counts = {}
+    for group_id in GroupMembership.objects.values_list('group_id', flat=True).iterator():
+        counts[group_id] = counts.get(group_id, 0) + 1
+    groups = list(GroupDetails.objects.only('id', 'members_count'))
+    for group in groups:
+        group.members_count = counts.get(group.id, 0)
+    GroupDetails.objects.bulk_update(groups, ['members_count'], batch_size=BATCH_SIZE)
+
+
+def restore_members_list(apps, schema_editor):
+    GroupDetails    = apps.get_model('api', 'GroupDetails')
+    GroupMembership = apps.get_model('api', 'GroupMembership')
+
+    members = {}
+    for group_id, user_id in GroupMembership.objects.order_by('joined_at', 'id').values_list('group_id', 'user_id'):
+        members.setdefault(group_id, []).append(user_id)
+    groups = list(GroupDetails.objects.only('id', 'members_list'))
+    for group in groups:
+        group.members_list = members.get(group.id, [])
+    GroupDetails.objects.bulk_update(groups, ['members_list'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_groupmembership'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_memberships, restore_members_list),
+    ]
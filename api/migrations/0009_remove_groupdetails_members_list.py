@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_backfill_groupmembership'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='groupdetails',
+            name='members_list',
+        ),
+    ]
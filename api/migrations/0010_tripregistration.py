@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_remove_groupdetails_members_list'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripRegistration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('registered', 'Registered'), ('success', 'Success')], default='registered', max_length=12)),
+                ('registered_at', models.DateTimeField(auto_now_add=True)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registrations', to='api.trip')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trip_registrations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'trip_registrations',
+                'indexes': [models.Index(fields=['user', 'status'], name='registration_user_status_idx'), models.Index(fields=['trip'], name='registration_trip_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'trip'), name='uniq_trip_registration')],
+            },
+        ),
+    ]
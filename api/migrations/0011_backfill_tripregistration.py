@@ -0,0 +1,53 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_registrations(apps, schema_editor):
+    UserDetails      = apps.get_model('api', 'UserDetails')
+    Trip             = apps.get_model('api', 'Trip')
+    TripRegistration = apps.get_model('api', 'TripRegistration')
+
+    existing_trips = set(Trip.objects.values_list('id', flat=True))
+    rows = []
+    for details in UserDetails.objects.only('user_id', 'trips_registered', 'trips_success').iterator(chunk_size=BATCH_SIZE):
+        statuses = {}
+        for trip_id in details.trips_registered or []:
+            statuses[trip_id] = 'registered'
+        for trip_id in details.trips_success or []:
+            statuses[trip_id] = 'success'
+        for trip_id, status in statuses.items():
+            if trip_id in existing_trips:
+                rows.append(TripRegistration(user_id=details.user_id, trip_id=trip_id, status=status))
+        if len(rows) >= BATCH_SIZE:
+            TripRegistration.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    TripRegistration.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def restore_json_lists(apps, schema_editor):
+    UserDetails      = apps.get_model('api', 'UserDetails')
+    TripRegistration = apps.get_model('api', 'TripRegistration')
+
+    registered, success = {}, {}
+    for user_id, trip_id, status in (TripRegistration.objects.order_by('registered_at', 'id')
+                                     .values_list('user_id', 'trip_id', 'status')):
+        registered.setdefault(user_id, []).append(trip_id)
+        if status == 'success':
+            success.setdefault(user_id, []).append(trip_id)
+    rows = list(UserDetails.objects.only('id', 'user_id'))
+    for details in rows:
+        details.trips_registered = registered.get(details.user_id, [])
+        details.trips_success    = success.get(details.user_id, [])
+    UserDetails.objects.bulk_update(rows, ['trips_registered', 'trips_success'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_tripregistration'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_registrations, restore_json_lists),
+    ]
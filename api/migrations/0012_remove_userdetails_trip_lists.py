@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_backfill_tripregistration'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userdetails',
+            name='trips_registered',
+        ),
+        migrations.RemoveField(
+            model_name='userdetails',
+            name='trips_success',
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_remove_userdetails_trip_lists'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripregistration',
+            name='held_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='tripregistration',
+            name='status',
+            field=models.CharField(choices=[('held', 'Held'), ('registered', 'Registered'), ('success', 'Success')], default='registered', max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='tripregistration',
+            index=models.Index(condition=models.Q(('status', 'held')), fields=['held_until'], name='registration_hold_expiry_idx'),
+        ),
+    ]
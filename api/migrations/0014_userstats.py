@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_seat_holds'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.IntegerField(default=0)),
+                ('follower_count', models.IntegerField(default=0)),
+                ('following_count', models.IntegerField(default=0)),
+                ('trip_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'user_stats',
+            },
+        ),
+    ]
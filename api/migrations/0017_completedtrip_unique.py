@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicates(apps, schema_editor):
+    # The old per-GET get_or_create could race and insert the same
+    # (user, trip) twice; keep the oldest row of each pair.
+    CompletedTrip = apps.get_model('api', 'CompletedTrip')
+    dupes = (CompletedTrip.objects.values('user_id', 'trip_id')
+             .annotate(n=Count('id'), keep=Min('id')).filter(n__gt=1))
+    for row in dupes.iterator():
+        (CompletedTrip.objects.filter(user_id=row['user_id'], trip_id=row['trip_id'])
+         .exclude(id=row['keep']).delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_timelineentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='completedtrip',
+            index=models.Index(fields=['user', '-end_date'], name='completed_user_end_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='completedtrip',
+            constraint=models.UniqueConstraint(fields=('user', 'trip'), name='uniq_completed_trip'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:53
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_completedtrip_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='route',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['start_location'], name='route_start_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='route',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('start_location', config='simple'), name='route_start_fts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['destination'], name='trip_destination_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('destination', config='simple'), name='trip_destination_fts_idx'),
+        ),
+    ]
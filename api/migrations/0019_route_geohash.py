@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_trip_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('geohash', models.CharField(max_length=12)),
+            ],
+            options={
+                'db_table': 'route_stops',
+            },
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='origin_geohash',
+            field=models.CharField(blank=True, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='origin_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='origin_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(fields=['origin_geohash'], name='route_origin_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddField(
+            model_name='routestop',
+            name='trip',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stop_points', to='api.trip'),
+        ),
+        migrations.AddIndex(
+            model_name='routestop',
+            index=models.Index(fields=['geohash'], name='route_stop_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddConstraint(
+            model_name='routestop',
+            constraint=models.UniqueConstraint(fields=('trip', 'position'), name='uniq_route_stop_position'),
+        ),
+    ]
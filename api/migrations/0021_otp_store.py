@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+OTP_TABLES = ('otp_codes', 'otp_send_buckets')
+
+
+def set_unlogged(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for table in OTP_TABLES:
+            schema_editor.execute(f'ALTER TABLE {table} SET UNLOGGED')
+
+
+def set_logged(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for table in OTP_TABLES:
+            schema_editor.execute(f'ALTER TABLE {table} SET LOGGED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OTPSendBucket',
+            fields=[
+                ('email', models.CharField(max_length=254, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.FloatField()),
+            ],
+            options={
+                'db_table': 'otp_send_buckets',
+            },
+        ),
+        migrations.CreateModel(
+            name='OTPCode',
+            fields=[
+                ('email', models.CharField(max_length=254, primary_key=True, serialize=False)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('expires_at', models.FloatField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'otp_codes',
+                'indexes': [models.Index(fields=['expires_at'], name='otp_code_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(set_unlogged, set_logged),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+def set_unlogged(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE throttle_counters SET UNLOGGED')
+
+
+def set_logged(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE throttle_counters SET LOGGED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_otp_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleCounter',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.FloatField()),
+            ],
+            options={
+                'db_table': 'throttle_counters',
+                'indexes': [models.Index(fields=['expires_at'], name='throttle_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(set_unlogged, set_logged),
+    ]
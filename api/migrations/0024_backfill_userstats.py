@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 2000
+
+ACTIVE_STATUSES = ('registered', 'success')
+
+
+def _counts(queryset, field, user_ids):
+    return dict(queryset.filter(**{f'{field}__in': user_ids}).values(field)
+                .annotate(n=Count('id')).values_list(field, 'n'))
+
+
+def _create_stats(apps, user_ids):
+    Post             = apps.get_model('api', 'Post')
+    Follower         = apps.get_model('api', 'Follower')
+    TripRegistration = apps.get_model('api', 'TripRegistration')
+    UserStats        = apps.get_model('api', 'UserStats')
+
+    posts     = _counts(Post.objects, 'user_id', user_ids)
+    followers = _counts(Follower.objects, 'following_id', user_ids)
+    following = _counts(Follower.objects, 'follower_id', user_ids)
+    trips     = _counts(TripRegistration.objects.filter(status__in=ACTIVE_STATUSES), 'user_id', user_ids)
+    UserStats.objects.bulk_create([
+        UserStats(user_id=user_id, post_count=posts.get(user_id, 0),
+                  follower_count=followers.get(user_id, 0), following_count=following.get(user_id, 0),
+                  trip_count=trips.get(user_id, 0))
+        for user_id in user_ids
+    ], ignore_conflicts=True)
+
+
+def backfill_user_stats(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    batch = []
+    for user_id in (User.objects.filter(stats__isnull=True).order_by('id')
+                    .values_list('id', flat=True).iterator(chunk_size=BATCH_SIZE)):
+        batch.append(user_id)
+        if len(batch) >= BATCH_SIZE:
+            _create_stats(apps, batch)
+            batch = []
+    if batch:
+        _create_stats(apps, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_alter_post_trip'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
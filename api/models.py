@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 
 
 class UserDetails(models.Model):
@@ -8,8 +10,6 @@ class UserDetails(models.Model):
     name             = models.CharField(max_length=255)
     email            = models.EmailField(unique=True)
     phone            = models.CharField(max_length=15, blank=True, null=True)
-    trips_registered = models.JSONField(default=list, blank=True)
-    trips_success    = models.JSONField(default=list, blank=True)
     created_at       = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -31,6 +31,13 @@ class Trip(models.Model):
 
     class Meta:
         db_table = 'trip_details'
+        indexes  = [
+            # Keyset pagination in search_trips walks (created_at, id) newest first
+            models.Index(fields=['-created_at', '-id'], name='trip_created_id_idx'),
+            # search_trips?mode=text: fuzzy (pg_trgm) and whole-word matches
+            GinIndex(fields=['destination'], opclasses=['gin_trgm_ops'], name='trip_destination_trgm_idx'),
+            GinIndex(SearchVector('destination', config='simple'), name='trip_destination_fts_idx'),
+        ]
 
 
 class Route(models.Model):
@@ -39,9 +46,39 @@ class Route(models.Model):
     stops          = models.JSONField(default=list)
     start_datetime = models.DateTimeField(null=True, blank=True)
     end_datetime   = models.DateTimeField(null=True, blank=True)
+    # Optional origin coordinates; the geohash is filled in by RouteSerializer
+    origin_lat     = models.FloatField(null=True, blank=True)
+    origin_lng     = models.FloatField(null=True, blank=True)
+    origin_geohash = models.CharField(max_length=12, null=True, blank=True)
 
     class Meta:
         db_table = 'route_details'
+        indexes  = [
+            GinIndex(fields=['start_location'], opclasses=['gin_trgm_ops'], name='route_start_trgm_idx'),
+            GinIndex(SearchVector('start_location', config='simple'), name='route_start_fts_idx'),
+            # Prefix scans for search_trips?mode=near
+            models.Index(fields=['origin_geohash'], opclasses=['varchar_pattern_ops'], name='route_origin_geohash_idx'),
+        ]
+
+
+class RouteStop(models.Model):
+    """A stop from ``Route.stops`` that came with coordinates, indexed by geohash."""
+    # Keyed by trip (Route is one-to-one with it) so nearby search needs no join
+    trip     = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='stop_points')
+    position = models.PositiveSmallIntegerField()
+    name     = models.CharField(max_length=255, blank=True)
+    lat      = models.FloatField()
+    lng      = models.FloatField()
+    geohash  = models.CharField(max_length=12)
+
+    class Meta:
+        db_table    = 'route_stops'
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'position'], name='uniq_route_stop_position'),
+        ]
+        indexes     = [
+            models.Index(fields=['geohash'], opclasses=['varchar_pattern_ops'], name='route_stop_geohash_idx'),
+        ]
 
 
 class Vehicle(models.Model):
@@ -85,13 +122,35 @@ class GroupDetails(models.Model):
     group_name    = models.CharField(max_length=255)
     admin         = models.ForeignKey(User, on_delete=models.CASCADE, related_name='admin_groups')
     members_count = models.IntegerField(default=1)
-    members_list  = models.JSONField(default=list)
     created_at    = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'group_details'
 
 
+class GroupMembership(models.Model):
+    ROLE_ADMIN   = 'admin'
+    ROLE_MEMBER  = 'member'
+    ROLE_CHOICES = [(ROLE_ADMIN, 'Admin'), (ROLE_MEMBER, 'Member')]
+
+    group     = models.ForeignKey(GroupDetails, on_delete=models.CASCADE, related_name='memberships')
+    user      = models.ForeignKey(User, on_delete=models.CASCADE, related_name='group_memberships')
+    role      = models.CharField(max_length=10, choices=ROLE_CHOICES, default=ROLE_MEMBER)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table    = 'group_memberships'
+        constraints = [
+            # Also serves "is user X in group Y" and "members of group Y"
+            models.UniqueConstraint(fields=['group', 'user'], name='uniq_group_member'),
+        ]
+        indexes     = [
+            # "My groups": index-only scan from user to group and role
+            models.Index(fields=['user', 'group'], include=['role'],
+                         name='membership_user_group_idx'),
+        ]
+
+
 class SeatAvailability(models.Model):
     trip            = models.OneToOneField(Trip, on_delete=models.CASCADE, related_name='seat_info')
     total_seats     = models.IntegerField()
@@ -111,11 +170,33 @@ class Post(models.Model):
     class Meta:
         db_table = 'posts'
         ordering = ['-created_at']
+        indexes  = [
+            # Profile post pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='post_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.username} - {self.trip.destination if self.trip else 'No trip'}"
 
 
+class TimelineEntry(models.Model):
+    """One post in a follower's home feed; written by fan-out, see api/feed.py."""
+    user   = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    post   = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        db_table    = 'feed_timelines'
+        constraints = [
+            # Also the read path: WHERE user_id = ? AND post_id < ? ORDER BY post_id DESC
+            models.UniqueConstraint(fields=['user', 'post'], name='uniq_timeline_post'),
+        ]
+        indexes     = [
+            # Unfollow drops one author's entries from one timeline
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+
+
 class Follower(models.Model):
     follower   = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
     following  = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
@@ -128,6 +209,38 @@ class Follower(models.Model):
     def __str__(self):
         return f"{self.follower.username} → {self.following.username}"
 
+class TripRegistration(models.Model):
+    STATUS_HELD       = 'held'
+    STATUS_REGISTERED = 'registered'
+    STATUS_SUCCESS    = 'success'
+    STATUS_CHOICES    = [
+        (STATUS_HELD, 'Held'), (STATUS_REGISTERED, 'Registered'), (STATUS_SUCCESS, 'Success'),
+    ]
+    # Statuses that count as "this user is on this trip"; a hold only reserves a seat
+    ACTIVE_STATUSES   = (STATUS_REGISTERED, STATUS_SUCCESS)
+
+    user          = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trip_registrations')
+    trip          = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='registrations')
+    status        = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_REGISTERED)
+    held_until    = models.DateTimeField(null=True, blank=True)
+    registered_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table    = 'trip_registrations'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'trip'], name='uniq_trip_registration'),
+        ]
+        indexes     = [
+            models.Index(fields=['user', 'status'], name='registration_user_status_idx'),
+            models.Index(fields=['trip'], name='registration_trip_idx'),
+            models.Index(fields=['held_until'], name='registration_hold_expiry_idx',
+                         condition=models.Q(status='held')),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} → {self.trip_id} ({self.status})"
+
+
 class CompletedTrip(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE)
@@ -140,6 +253,101 @@ class CompletedTrip(models.Model):
 
     class Meta:
         db_table = "completed_trips"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'trip'], name='uniq_completed_trip'),
+        ]
+        indexes = [
+            # trips/completed/ reads one user's rows, most recently finished first
+            models.Index(fields=['user', '-end_date'], name='completed_user_end_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.destination}"
\ No newline at end of file
+        return f"{self.user.username} - {self.destination}"
+
+
+class UserStats(models.Model):
+    """Denormalized profile counters; recompute with ``manage.py recompute_user_stats``."""
+    user            = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                           related_name='stats')
+    post_count      = models.IntegerField(default=0)
+    follower_count  = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    trip_count      = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'user_stats'
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting for ``manage.py dispatch_outbox``. Rows are kept as a
+    delivery log, but the body is blanked once the row is sent or failed.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT    = 'sent'
+    STATUS_FAILED  = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'), (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'), (STATUS_FAILED, 'Failed'),
+    ]
+
+    to_email        = models.EmailField()
+    subject         = models.CharField(max_length=255)
+    body            = models.TextField()
+    status          = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts        = models.PositiveSmallIntegerField(default=0)
+    # When a pending row is next due, or when a claimed row's lease runs out
+    next_attempt_at = models.DateTimeField(auto_now_add=True)
+    last_error      = models.TextField(blank=True)
+    created_at      = models.DateTimeField(auto_now_add=True)
+    sent_at         = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        indexes  = [
+            models.Index(fields=['next_attempt_at'], name='outbox_due_idx',
+                         condition=models.Q(status__in=['pending', 'sending'])),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} ({self.status})"
+
+
+# ── OTP store (api.otp_store.DBOTPStore) ──────────────────────────────────────
+# Unlogged on Postgres: codes are short-lived and can be lost on a crash.
+# Times are epoch seconds so the atomic upserts can do arithmetic on them
+# in plain SQL on any backend.
+
+class OTPCode(models.Model):
+    email      = models.CharField(max_length=254, primary_key=True)
+    code_hash  = models.CharField(max_length=64)
+    expires_at = models.FloatField()
+    attempts   = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        db_table = 'otp_codes'
+        indexes  = [models.Index(fields=['expires_at'], name='otp_code_expiry_idx')]
+
+
+class OTPSendBucket(models.Model):
+    email      = models.CharField(max_length=254, primary_key=True)
+    tokens     = models.FloatField()
+    updated_at = models.FloatField()
+
+    class Meta:
+        db_table = 'otp_send_buckets'
+
+
+# ── Throttle counters (api.throttling.DBWindowStore) ──────────────────────────
+# One row per (scope, client, fixed window). Unlogged on Postgres like the OTP
+# tables; losing the counts on a crash only resets the limits.
+
+class ThrottleCounter(models.Model):
+    key        = models.CharField(max_length=100, primary_key=True)
+    hits       = models.PositiveIntegerField(default=0)
+    expires_at = models.FloatField()
+
+    class Meta:
+        db_table = 'throttle_counters'
+        indexes  = [models.Index(fields=['expires_at'], name='throttle_expiry_idx')]
@@ -0,0 +1,230 @@
+"""
+OTP storage shared by every worker process.
+
+Codes are stored as HMAC-SHA256 digests keyed with ``SECRET_KEY`` and
+compared in constant time. Each code allows ``OTP_MAX_ATTEMPTS`` guesses and
+is deleted when used. Each email has a resend allowance of
+``OTP_RESEND_BURST`` codes, refilled at one per
+``OTP_RESEND_REFILL_SECONDS``. Every check-and-update is a single atomic
+statement or cache operation, so concurrent requests cannot race past a
+limit.
+
+``OTP_STORE`` selects :class:`DBOTPStore` (unlogged tables, default) or
+:class:`CacheOTPStore` (a shared Django cache).
+"""
+import abc
+import hashlib
+import hmac
+import math
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import OTPCode, OTPSendBucket
+
+
+class OTPError(Exception):
+    pass
+
+
+class ResendLimited(OTPError):
+    def __init__(self, retry_after):
+        super().__init__(f'Retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+class OTPNotFound(OTPError):
+    """No live code for this email: never sent, expired or already used."""
+
+
+class OTPMismatch(OTPError):
+    def __init__(self, attempts_left):
+        super().__init__(f'{attempts_left} attempt(s) left')
+        self.attempts_left = attempts_left
+
+
+class TooManyAttempts(OTPError):
+    pass
+
+
+def generate_code():
+    return f'{secrets.randbelow(900000) + 100000}'
+
+
+def _normalize(email):
+    return email.strip().lower()
+
+
+def hash_code(email, code):
+    message = f'{_normalize(email)}:{code}'.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+class OTPStore(abc.ABC):
+    def __init__(self, max_attempts, burst, refill_seconds):
+        self.max_attempts   = max_attempts
+        self.burst          = burst
+        self.refill_seconds = refill_seconds
+
+    @abc.abstractmethod
+    def issue(self, email, code, ttl):
+        """Stores ``code`` for ``email``, replacing any earlier one. Raises :class:`ResendLimited`."""
+
+    @abc.abstractmethod
+    def verify(self, email, code):
+        """Consumes the code if it matches; raises an :class:`OTPError` otherwise."""
+
+    def sweep(self):
+        """Drops expired state. Returns the number of entries removed."""
+        return 0
+
+
+# ── Database ──────────────────────────────────────────────────────────────────
+
+class DBOTPStore(OTPStore):
+    """OTPs in ``otp_codes`` and resend allowances in ``otp_send_buckets``."""
+
+    TAKE_TOKEN_SQL = """
+    INSERT INTO otp_send_buckets (email, tokens, updated_at)
+    VALUES (%(email)s, %(burst)s - 1, %(now)s)
+    ON CONFLICT (email) DO UPDATE SET
+        tokens     = CASE WHEN otp_send_buckets.tokens + (%(now)s - otp_send_buckets.updated_at) / %(refill)s > %(burst)s
+                          THEN %(burst)s
+                          ELSE otp_send_buckets.tokens + (%(now)s - otp_send_buckets.updated_at) / %(refill)s
+                     END - 1,
+        updated_at = %(now)s
+    WHERE otp_send_buckets.tokens + (%(now)s - otp_send_buckets.updated_at) / %(refill)s >= 1
+    RETURNING tokens
+    """
+
+    STORE_CODE_SQL = """
+    INSERT INTO otp_codes (email, code_hash, expires_at, attempts)
+    VALUES (%(email)s, %(code_hash)s, %(expires_at)s, 0)
+    ON CONFLICT (email) DO UPDATE SET
+        code_hash  = EXCLUDED.code_hash,
+        expires_at = EXCLUDED.expires_at,
+        attempts   = 0
+    """
+
+    COUNT_ATTEMPT_SQL = """
+    UPDATE otp_codes SET attempts = attempts + 1
+    WHERE email = %(email)s AND expires_at > %(now)s
+    RETURNING code_hash, attempts
+    """
+
+    def issue(self, email, code, ttl):
+        email, now = _normalize(email), time.time()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(self.TAKE_TOKEN_SQL, {
+                'email': email, 'now': now, 'burst': self.burst, 'refill': self.refill_seconds})
+            if cursor.fetchone() is None:
+                raise ResendLimited(self._retry_after(email, now))
+            cursor.execute(self.STORE_CODE_SQL, {
+                'email': email, 'code_hash': hash_code(email, code), 'expires_at': now + ttl})
+
+    def _retry_after(self, email, now):
+        bucket = OTPSendBucket.objects.filter(email=email).first()
+        if bucket is None:
+            return 1
+        tokens = bucket.tokens + (now - bucket.updated_at) / self.refill_seconds
+        return max(1, math.ceil((1 - tokens) * self.refill_seconds))
+
+    def verify(self, email, code):
+        email = _normalize(email)
+        with connection.cursor() as cursor:
+            cursor.execute(self.COUNT_ATTEMPT_SQL, {'email': email, 'now': time.time()})
+            row = cursor.fetchone()
+        if row is None:
+            raise OTPNotFound()
+        code_hash, attempts = row
+        if attempts > self.max_attempts:
+            OTPCode.objects.filter(email=email).delete()
+            raise TooManyAttempts()
+        if not hmac.compare_digest(code_hash, hash_code(email, code)):
+            raise OTPMismatch(self.max_attempts - attempts)
+        # Only one of several concurrent correct guesses gets to delete it
+        deleted, _ = OTPCode.objects.filter(email=email, code_hash=code_hash).delete()
+        if not deleted:
+            raise OTPNotFound()
+
+    def sweep(self):
+        now = time.time()
+        codes, _   = OTPCode.objects.filter(expires_at__lte=now).delete()
+        # A bucket left alone this long has refilled completely; dropping it is the same
+        buckets, _ = OTPSendBucket.objects.filter(
+            updated_at__lte=now - self.burst * self.refill_seconds).delete()
+        return codes + buckets
+
+
+# ── Shared cache ──────────────────────────────────────────────────────────────
+
+class CacheOTPStore(OTPStore):
+    """
+    OTPs in a Django cache shared by all workers (Redis, Memcached, ...).
+
+    The resend allowance is ``burst`` slots, each taken with an atomic
+    ``add`` and freed ``burst * refill_seconds`` after use. That gives the
+    same burst and long-run rate as the token bucket without a
+    read-modify-write. Attempts are counted with ``incr``. Only the request
+    whose ``delete`` succeeds may use a code.
+    """
+
+    KEY_PREFIX = 'otp:'
+
+    def __init__(self, max_attempts, burst, refill_seconds, alias='default'):
+        super().__init__(max_attempts, burst, refill_seconds)
+        self.cache = caches[alias]
+
+    def _key(self, kind, email):
+        return f'{self.KEY_PREFIX}{kind}:{hashlib.sha256(_normalize(email).encode()).hexdigest()}'
+
+    def issue(self, email, code, ttl):
+        now, window = time.time(), self.burst * self.refill_seconds
+        slots = [f"{self._key('slot', email)}:{n}" for n in range(self.burst)]
+        if not any(self.cache.add(slot, now + window, timeout=window) for slot in slots):
+            freed_at = [at for at in self.cache.get_many(slots).values() if at]
+            raise ResendLimited(max(1, math.ceil(min(freed_at, default=now + 1) - now)))
+        self.cache.set_many({
+            self._key('code', email):     hash_code(email, code),
+            self._key('attempts', email): 0,
+        }, timeout=ttl)
+
+    def verify(self, email, code):
+        code_key, attempts_key = self._key('code', email), self._key('attempts', email)
+        try:
+            attempts = self.cache.incr(attempts_key)
+        except ValueError:
+            raise OTPNotFound()
+        if attempts > self.max_attempts:
+            self.cache.delete_many([code_key, attempts_key])
+            raise TooManyAttempts()
+        code_hash = self.cache.get(code_key)
+        if code_hash is None:
+            raise OTPNotFound()
+        if not hmac.compare_digest(code_hash, hash_code(email, code)):
+            raise OTPMismatch(self.max_attempts - attempts)
+        if not self.cache.delete(code_key):
+            raise OTPNotFound()
+        self.cache.delete(attempts_key)
+
+
+_store = None
+
+
+def get_store() -> OTPStore:
+    global _store
+    if _store is None:
+        store_class = import_string(settings.OTP_STORE)
+        kwargs = {
+            'max_attempts':   settings.OTP_MAX_ATTEMPTS,
+            'burst':          settings.OTP_RESEND_BURST,
+            'refill_seconds': settings.OTP_RESEND_REFILL_SECONDS,
+        }
+        if issubclass(store_class, CacheOTPStore):
+            kwargs['alias'] = settings.OTP_CACHE_ALIAS
+        _store = store_class(**kwargs)
+    return _store
@@ -0,0 +1,166 @@
+"""
+Transactional outbox for outgoing email.
+
+Request handlers call :func:`enqueue`, which only inserts a row, so a slow
+SMTP server never holds up a request. ``manage.py dispatch_outbox`` claims
+due rows in batches. It sends each batch over a single SMTP connection on a
+worker thread and records the outcome on every row. Failed sends are retried
+with exponential backoff until ``OUTBOX_MAX_ATTEMPTS``. A row's body is
+blanked once it is sent or given up, since it may hold a one-time code.
+"""
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+MAX_ERROR_LENGTH = 2000
+
+
+def enqueue(to_email, subject, body):
+    """Queues one email. Inside a transaction it is only sent if that transaction commits."""
+    return OutboxEmail.objects.create(to_email=to_email, subject=subject, body=body)
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the ``attempts``-th failure, with +/-20% jitter."""
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+                settings.OUTBOX_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+# ── Dispatching ───────────────────────────────────────────────────────────────
+
+def lease_seconds(count):
+    """
+    How long a batch of ``count`` emails stays claimed: opening the connection
+    and every send may each take up to ``EMAIL_TIMEOUT``, and
+    ``OUTBOX_LEASE_SECONDS`` is added on top.
+    """
+    return settings.OUTBOX_LEASE_SECONDS + (count + 1) * settings.EMAIL_TIMEOUT
+
+
+def claim_batch(size, now=None):
+    """
+    Leases up to ``size`` due emails to the caller and returns them.
+
+    Rows are marked ``sending`` until the lease from :func:`lease_seconds`
+    runs out. ``skip_locked`` lets several dispatchers claim at once without
+    taking the same rows, and a dispatcher that dies mid-batch only delays
+    its rows until the lease runs out.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = list(OutboxEmail.objects.select_for_update(skip_locked=True)
+                     .filter(status__in=[OutboxEmail.STATUS_PENDING, OutboxEmail.STATUS_SENDING],
+                             next_attempt_at__lte=now)
+                     .order_by('next_attempt_at')[:size])
+        if batch:
+            lease = now + timedelta(seconds=lease_seconds(len(batch)))
+            OutboxEmail.objects.filter(id__in=[email.id for email in batch]).update(
+                status=OutboxEmail.STATUS_SENDING, next_attempt_at=lease)
+            for email in batch:
+                email.status, email.next_attempt_at = OutboxEmail.STATUS_SENDING, lease
+    return batch
+
+
+def _leased(email):
+    """
+    ``email``'s row while the caller's lease on it holds. Once it has run out
+    and another dispatcher has claimed the row, this matches nothing, so a
+    late outcome does not overwrite the newer one.
+    """
+    return OutboxEmail.objects.filter(id=email.id, status=OutboxEmail.STATUS_SENDING,
+                                      next_attempt_at=email.next_attempt_at)
+
+
+def _record_failure(email, error):
+    outcome = {'attempts': email.attempts + 1, 'last_error': str(error)[:MAX_ERROR_LENGTH]}
+    if outcome['attempts'] >= settings.OUTBOX_MAX_ATTEMPTS:
+        outcome['status'] = OutboxEmail.STATUS_FAILED
+        outcome['body']   = ''
+    else:
+        outcome['status']          = OutboxEmail.STATUS_PENDING
+        outcome['next_attempt_at'] = timezone.now() + timedelta(seconds=retry_delay(outcome['attempts']))
+    _leased(email).update(**outcome)
+
+
+def send_batch(batch):
+    """Sends ``batch`` over one SMTP connection. Returns ``(sent, failed)``."""
+    sent, failed = 0, 0
+    try:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+    except Exception as e:
+        # Nothing got through; every row waits for its next attempt
+        for email in batch:
+            _record_failure(email, e)
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            try:
+                EmailMessage(subject=email.subject, body=email.body,
+                             from_email=settings.DEFAULT_FROM_EMAIL,
+                             to=[email.to_email], connection=connection).send()
+            except Exception as e:
+                _record_failure(email, e)
+                failed += 1
+                continue
+            _leased(email).update(
+                status=OutboxEmail.STATUS_SENT, attempts=email.attempts + 1,
+                sent_at=timezone.now(), last_error='', body='')
+            sent += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return sent, failed
+
+
+def _worker(batch_size, totals, lock):
+    try:
+        while True:
+            batch = claim_batch(batch_size)
+            if not batch:
+                return
+            sent, failed = send_batch(batch)
+            with lock:
+                totals['sent']   += sent
+                totals['failed'] += failed
+    finally:
+        close_old_connections()
+
+
+def dispatch(batch_size=None, workers=None):
+    """
+    Drains every email that is due now with ``workers`` threads, each
+    claiming ``batch_size`` rows at a time. Returns ``{'sent': n, 'failed': n}``.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    workers    = workers or settings.OUTBOX_WORKERS
+    totals     = {'sent': 0, 'failed': 0}
+    lock       = threading.Lock()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox') as pool:
+        for future in [pool.submit(_worker, batch_size, totals, lock) for _ in range(workers)]:
+            future.result()
+    return totals
+
+
+def stats() -> dict:
+    counts = dict.fromkeys((status for status, _ in OutboxEmail.STATUS_CHOICES), 0)
+    for row in OutboxEmail.objects.values('status').annotate(n=Count('id')):
+        counts[row['status']] = row['n']
+    oldest = (OutboxEmail.objects.filter(status=OutboxEmail.STATUS_PENDING)
+              .order_by('created_at').values_list('created_at', flat=True).first())
+    counts['oldest_pending_age_seconds'] = (
+        round((timezone.now() - oldest).total_seconds(), 1) if oldest else None)
+    return counts
@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded         = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def encode_score_cursor(score, pk):
+    raw = f"{score!r}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def encode_rank_cursor(obj):
+    return encode_score_cursor(obj.rank, obj.id)
+
+
+def decode_rank_cursor(cursor):
+    try:
+        padded   = cursor + '=' * (-len(cursor) % 4)
+        rank, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return float(rank), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after_keyset(queryset, cursor):
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = cursor
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return queryset
+
+
+def _after_rank(queryset, cursor):
+    queryset = queryset.order_by('-rank', '-id')
+    if cursor:
+        rank, pk = cursor
+        queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=pk))
+    return queryset
+
+
+def _split(rows, limit, encode):
+    if len(rows) > limit:
+        return rows[:limit], encode(rows[limit - 1])
+    return rows, None
+
+
+def keyset_page(queryset, cursor, limit):
+    """
+    One page of ``queryset`` ordered newest first by ``(created_at, id)``.
+
+    ``cursor`` is a decoded ``(created_at, id)`` pair or ``None``. Returns
+    ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last page.
+    """
+    return _split(list(_after_keyset(queryset, cursor)[:limit + 1]), limit, encode_cursor)
+
+
+async def akeyset_page(queryset, cursor, limit):
+    """Async :func:`keyset_page`."""
+    rows = [row async for row in _after_keyset(queryset, cursor)[:limit + 1]]
+    return _split(rows, limit, encode_cursor)
+
+
+async def aranked_page(queryset, cursor, limit):
+    """
+    Like :func:`keyset_page` for a queryset annotated with ``rank``: best
+    match first, ties broken by newest id. ``cursor`` is a decoded
+    ``(rank, id)`` pair or ``None``.
+    """
+    rows = [row async for row in _after_rank(queryset, cursor)[:limit + 1]]
+    return _split(rows, limit, encode_rank_cursor)
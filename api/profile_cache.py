@@ -0,0 +1,114 @@
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_PREFIX = 'profile_version:'
+BODY_PREFIX    = 'profile_body:'
+
+_stats      = {'hits': 0, 'misses': 0, 'rebuild_ms_total': 0.0, 'rebuild_ms_max': 0.0}
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.PROFILE_CACHE_ALIAS]
+
+
+# ── Versions ──────────────────────────────────────────────────────────────────
+
+def get_version(user_id):
+    key     = f'{VERSION_PREFIX}{user_id}'
+    version = _cache().get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        _cache().add(key, time.time_ns(), timeout=None)
+        version = _cache().get(key)
+    return version
+
+
+async def aget_version(user_id):
+    key     = f'{VERSION_PREFIX}{user_id}'
+    version = await _cache().aget(key)
+    if version is None:
+        await _cache().aadd(key, time.time_ns(), timeout=None)
+        version = await _cache().aget(key)
+    return version
+
+
+def bump_version(user_id):
+    key = f'{VERSION_PREFIX}{user_id}'
+    try:
+        _cache().incr(key)
+    except ValueError:
+        _cache().add(key, time.time_ns(), timeout=None)
+
+
+def bump_version_on_commit(user_id):
+    """Bumps after the surrounding transaction commits, so a rebuild never caches uncommitted state."""
+    transaction.on_commit(partial(bump_version, user_id))
+
+
+# ── Bodies ────────────────────────────────────────────────────────────────────
+
+def _record_hit():
+    with _stats_lock:
+        _stats['hits'] += 1
+
+
+def _record_miss(started):
+    elapsed = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        _stats['misses']           += 1
+        _stats['rebuild_ms_total'] += elapsed
+        _stats['rebuild_ms_max']    = max(_stats['rebuild_ms_max'], elapsed)
+
+
+def get_or_build(user_id, variant, build):
+    """
+    The cached profile body for ``user_id`` at its current version, calling
+    ``build()`` on a miss. Bodies must not contain viewer-dependent fields;
+    callers merge those into the returned copy.
+    """
+    key  = f'{BODY_PREFIX}{user_id}:{variant}:{get_version(user_id)}'
+    body = _cache().get(key)
+    if body is not None:
+        _record_hit()
+        return dict(body)
+
+    started = time.perf_counter()
+    body    = dict(build())
+    _cache().set(key, body, timeout=settings.PROFILE_CACHE_TTL)
+    _record_miss(started)
+    return dict(body)
+
+
+async def aget_or_build(user_id, variant, build):
+    """Async :func:`get_or_build`; ``build`` is a coroutine function."""
+    key  = f'{BODY_PREFIX}{user_id}:{variant}:{await aget_version(user_id)}'
+    body = await _cache().aget(key)
+    if body is not None:
+        _record_hit()
+        return dict(body)
+
+    started = time.perf_counter()
+    body    = dict(await build())
+    await _cache().aset(key, body, timeout=settings.PROFILE_CACHE_TTL)
+    _record_miss(started)
+    return dict(body)
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+        total, worst = _stats['rebuild_ms_total'], _stats['rebuild_ms_max']
+    lookups = hits + misses
+    return {
+        'hits':           hits,
+        'misses':         misses,
+        'hit_ratio':      round(hits / lookups, 4) if lookups else 0.0,
+        'rebuild_ms_avg': round(total / misses, 3) if misses else 0.0,
+        'rebuild_ms_max': round(worst, 3),
+    }
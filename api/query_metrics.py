@@ -0,0 +1,224 @@
+"""
+Per-request database query metrics, with an N+1 detector.
+
+:class:`QueryMetricsMiddleware` samples ``QUERY_METRICS_SAMPLE_RATE`` of
+requests. For a sampled request, every statement on every connection
+passes through :func:`_execute_wrapper`, which is installed once per
+connection from the ``connection_created`` signal. The wrapper records the
+statement's shape and time. The collector lives in a context variable, so
+queries run in sync_to_async threads under ASGI count towards the request
+that started them. Unsampled requests only pay for one context variable
+lookup per statement.
+
+A query shape is the SQL with parameters left out, which is how Django
+sends it, and with ``IN (%s, %s, ...)`` lists collapsed. A shape run
+``QUERY_METRICS_NPLUSONE_THRESHOLD`` or more times in one request is
+flagged as an N+1 candidate.
+
+Each sampled request writes one JSON line to the ``api.query_metrics``
+logger. It is logged at WARNING when it has N+1 candidates or runs more
+than ``QUERY_METRICS_MAX_QUERIES`` statements. Totals per view are kept
+per process. :func:`prometheus_text` renders them for internal/metrics/.
+"""
+import contextvars
+import heapq
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST    = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_collector = contextvars.ContextVar('query_collector', default=None)
+
+
+def query_shape(sql):
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+class _Collector:
+    __slots__ = ('count', 'seconds', 'shapes', 'slowest')
+
+    def __init__(self):
+        self.count   = 0
+        self.seconds = 0.0
+        self.shapes  = Counter()
+        self.slowest = []   # min-heap of (seconds, sql), at most QUERY_METRICS_SLOWEST long
+
+    def add(self, sql, seconds):
+        self.count   += 1
+        self.seconds += seconds
+        self.shapes[sql] += 1
+        if len(self.slowest) < settings.QUERY_METRICS_SLOWEST:
+            heapq.heappush(self.slowest, (seconds, sql))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, sql))
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.add(sql, time.perf_counter() - start)
+
+
+@contextmanager
+def capture():
+    """Records every statement run inside the block, whatever the sample rate; yields the collector."""
+    collector = _Collector()
+    token     = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+def install(connection):
+    """Adds the wrapper to ``connection``; called for every new database connection."""
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+# ── Aggregates per view ───────────────────────────────────────────────────────
+
+_views      = {}
+_views_lock = threading.Lock()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+def _record(request, response, collector, elapsed):
+    view   = _view_name(request)
+    shapes = Counter()
+    for sql, n in collector.shapes.items():
+        shapes[query_shape(sql)] += n
+    repeated = {shape: n for shape, n in shapes.items() if n >= settings.QUERY_METRICS_NPLUSONE_THRESHOLD}
+    with _views_lock:
+        totals = _views.setdefault(view, {
+            'requests': 0, 'queries': 0, 'db_seconds': 0.0, 'seconds': 0.0,
+            'max_queries': 0, 'nplusone_requests': 0, 'nplusone_shapes': Counter(),
+        })
+        totals['requests']    += 1
+        totals['queries']     += collector.count
+        totals['db_seconds']  += collector.seconds
+        totals['seconds']     += elapsed
+        totals['max_queries'] = max(totals['max_queries'], collector.count)
+        if repeated:
+            totals['nplusone_requests'] += 1
+            totals['nplusone_shapes'].update(repeated.keys())
+
+    line = {
+        'event':       'db_queries',
+        'view':        view,
+        'method':      request.method,
+        'status':      response.status_code,
+        'queries':     collector.count,
+        'db_ms':       round(collector.seconds * 1000, 2),
+        'duration_ms': round(elapsed * 1000, 2),
+        'slowest':     [{'ms': round(seconds * 1000, 2), 'sql': query_shape(sql)[:500]}
+                        for seconds, sql in sorted(collector.slowest, reverse=True)],
+        'nplusone':    [{'count': n, 'sql': sql[:500]} for sql, n in repeated.items()],
+    }
+    noisy = repeated or collector.count > settings.QUERY_METRICS_MAX_QUERIES
+    logger.log(logging.WARNING if noisy else logging.INFO, json.dumps(line))
+
+
+def stats() -> dict:
+    """Per-view totals for sampled requests in this process, with the commonest N+1 shapes."""
+    with _views_lock:
+        return {
+            view: {
+                'requests':          totals['requests'],
+                'queries_avg':       round(totals['queries'] / totals['requests'], 2),
+                'db_ms_avg':         round(totals['db_seconds'] * 1000 / totals['requests'], 2),
+                'max_queries':       totals['max_queries'],
+                'nplusone_requests': totals['nplusone_requests'],
+                'nplusone_shapes':   [{'count': n, 'sql': sql[:500]}
+                                      for sql, n in totals['nplusone_shapes'].most_common(5)],
+            }
+            for view, totals in sorted(_views.items())
+        }
+
+
+def _label(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+METRICS = [
+    ('db_sampled_requests_total',  'counter', 'Requests whose queries were recorded',            'requests'),
+    ('db_queries_total',           'counter', 'Statements run by sampled requests',              'queries'),
+    ('db_query_seconds_total',     'counter', 'Time spent in the database by sampled requests',  'db_seconds'),
+    ('db_request_seconds_total',   'counter', 'Total duration of sampled requests',              'seconds'),
+    ('db_nplusone_requests_total', 'counter', 'Sampled requests with an N+1 candidate',          'nplusone_requests'),
+    ('db_max_queries',             'gauge',   'Most statements run by one sampled request',      'max_queries'),
+]
+
+
+def prometheus_text() -> str:
+    """The per-view totals in the Prometheus text exposition format."""
+    with _views_lock:
+        rows = sorted((view, dict(totals)) for view, totals in _views.items())
+    lines = [f'# Sample rate {settings.QUERY_METRICS_SAMPLE_RATE}; totals are for this worker process only']
+    for name, kind, help_text, key in METRICS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for view, totals in rows:
+            lines.append(f'{name}{{view="{_label(view)}"}} {totals[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+# ── Middleware ────────────────────────────────────────────────────────────────
+
+class QueryMetricsMiddleware:
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if _collector.get() is not None or random.random() >= settings.QUERY_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        collector = _Collector()
+        token     = _collector.set(collector)
+        started   = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+        _record(request, response, collector, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if _collector.get() is not None or random.random() >= settings.QUERY_METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        collector = _Collector()
+        token     = _collector.set(collector)
+        started   = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+        _record(request, response, collector, time.perf_counter() - started)
+        return response
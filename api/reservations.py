@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import counters
+from .models import GroupDetails, GroupMembership, SeatAvailability, TripRegistration
+
+
+class ReservationError(Exception):
+    pass
+
+
+class AlreadyJoined(ReservationError):
+    pass
+
+
+class TripFull(ReservationError):
+    pass
+
+
+class SeatInfoMissing(ReservationError):
+    pass
+
+
+class HoldNotFound(ReservationError):
+    pass
+
+
+def _take_seat(trip):
+    # Check and decrement in one statement; the row lock is held only for
+    # the UPDATE itself, so concurrent joins can never oversell.
+    taken = (SeatAvailability.objects
+             .filter(trip=trip, available_seats__gt=0)
+             .update(available_seats=F('available_seats') - 1))
+    if not taken:
+        if not SeatAvailability.objects.filter(trip=trip).exists():
+            raise SeatInfoMissing()
+        raise TripFull()
+
+
+def _give_back_seats(trip_id, count=1):
+    SeatAvailability.objects.filter(trip_id=trip_id).update(
+        available_seats=F('available_seats') + count)
+
+
+def join_trip(user, trip):
+    """
+    Reserves a seat and adds ``user`` to the trip's group in one transaction.
+
+    A live (or not yet swept) hold by the same user is converted in place
+    without taking a second seat. Returns the trip's ``GroupDetails``.
+    """
+    group = GroupDetails.objects.get(trip=trip)
+    try:
+        with transaction.atomic():
+            registration = (TripRegistration.objects.select_for_update()
+                            .filter(user=user, trip=trip).first())
+            if registration is not None:
+                if registration.status != TripRegistration.STATUS_HELD:
+                    raise AlreadyJoined()
+                registration.status     = TripRegistration.STATUS_REGISTERED
+                registration.held_until = None
+                registration.save(update_fields=['status', 'held_until'])
+            else:
+                _take_seat(trip)
+                TripRegistration.objects.create(user=user, trip=trip)
+
+            _, created = GroupMembership.objects.get_or_create(group=group, user=user)
+            if created:
+                GroupDetails.objects.filter(id=group.id).update(
+                    members_count=F('members_count') + 1)
+            counters.bump(user.id, trip_count=1)
+    except IntegrityError:
+        # A concurrent request for the same user won the unique constraint
+        raise AlreadyJoined()
+    return group
+
+
+def hold_seat(user, trip, seconds=None):
+    """Takes a seat for ``user`` without joining the group; it lapses after ``seconds``."""
+    seconds    = seconds if seconds is not None else settings.SEAT_HOLD_SECONDS
+    held_until = timezone.now() + timedelta(seconds=seconds)
+    release_expired_holds(trip=trip)
+    try:
+        with transaction.atomic():
+            if TripRegistration.objects.filter(user=user, trip=trip).exists():
+                raise AlreadyJoined()
+            _take_seat(trip)
+            return TripRegistration.objects.create(
+                user=user, trip=trip,
+                status=TripRegistration.STATUS_HELD, held_until=held_until)
+    except IntegrityError:
+        raise AlreadyJoined()
+
+
+def release_hold(user, trip):
+    with transaction.atomic():
+        deleted, _ = TripRegistration.objects.filter(
+            user=user, trip=trip, status=TripRegistration.STATUS_HELD).delete()
+        if not deleted:
+            raise HoldNotFound()
+        _give_back_seats(trip.id)
+
+
+def release_expired_holds(trip=None, now=None):
+    """Deletes lapsed holds and returns their seats. Returns the number released."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = (TripRegistration.objects.select_for_update(skip_locked=True)
+                   .filter(status=TripRegistration.STATUS_HELD, held_until__lte=now))
+        if trip is not None:
+            expired = expired.filter(trip=trip)
+        ids = list(expired.values_list('id', flat=True))
+        if not ids:
+            return 0
+        per_trip = (TripRegistration.objects.filter(id__in=ids)
+                    .values('trip_id').annotate(n=Count('id')))
+        for row in per_trip:
+            _give_back_seats(row['trip_id'], row['n'])
+        TripRegistration.objects.filter(id__in=ids).delete()
+    return len(ids)
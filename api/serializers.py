@@ -1,16 +1,42 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from . import geo
+from .counters import get_stats
 from .models import (
-    Trip, Route, Vehicle, PaymentDetails,
-    ContactDetails, GroupDetails, UserDetails, Post, Follower,
+    Trip, Route, RouteStop, Vehicle, PaymentDetails,
+    ContactDetails, GroupDetails, UserDetails, Post, Follower, TripRegistration,
 )
 
 
+def _registrations(user_id):
+    return TripRegistration.objects.filter(
+        user_id=user_id, status__in=TripRegistration.ACTIVE_STATUSES)
+
+
+def registered_trips(user_id):
+    return Trip.objects.filter(id__in=_registrations(user_id).values('trip_id'))
+
+
+def trip_summary(trip):
+    return {'id': trip.id, 'destination': trip.destination, 'start_date': str(trip.start_date)}
+
+
 class UserDetailsSerializer(serializers.ModelSerializer):
+    trips_registered = serializers.SerializerMethodField()
+    trips_success    = serializers.SerializerMethodField()
+
     class Meta:
         model  = UserDetails
         fields = ['name', 'email', 'phone', 'trips_registered', 'trips_success']
 
+    def get_trips_registered(self, obj):
+        return list(_registrations(obj.user_id).order_by('registered_at', 'id')
+                    .values_list('trip_id', flat=True))
+
+    def get_trips_success(self, obj):
+        return list(_registrations(obj.user_id).filter(status=TripRegistration.STATUS_SUCCESS)
+                    .order_by('registered_at', 'id').values_list('trip_id', flat=True))
+
 
 class UserProfileSerializer(serializers.ModelSerializer):
     details    = UserDetailsSerializer(read_only=True)
@@ -22,7 +48,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'first_name', 'last_name', 'details', 'post_count', 'bio']
 
     def get_post_count(self, obj):
-        return obj.posts.count()
+        return get_stats(obj).post_count
 
     def get_bio(self, obj):
         return ''
@@ -51,7 +77,6 @@ class OtherUserProfileSerializer(serializers.ModelSerializer):
     name            = serializers.SerializerMethodField()
     email           = serializers.EmailField()
     post_count      = serializers.SerializerMethodField()
-    posts           = serializers.SerializerMethodField()
     trip_count      = serializers.SerializerMethodField()
     trips           = serializers.SerializerMethodField()
     follower_count  = serializers.SerializerMethodField()
@@ -61,7 +86,7 @@ class OtherUserProfileSerializer(serializers.ModelSerializer):
         model  = User
         fields = [
             'id', 'name', 'email',
-            'post_count', 'posts',
+            'post_count',
             'trip_count', 'trips',
             'follower_count', 'following_count',
         ]
@@ -71,31 +96,22 @@ class OtherUserProfileSerializer(serializers.ModelSerializer):
         return name or obj.username
 
     def get_post_count(self, obj):
-        return obj.posts.count()
-
-    def get_posts(self, obj):
-        return PostSerializer(obj.posts.all(), many=True).data
+        return get_stats(obj).post_count
 
     def get_trip_count(self, obj):
-        try:
-            return len(obj.details.trips_registered or [])
-        except Exception:
-            return 0
+        return get_stats(obj).trip_count
 
     def get_trips(self, obj):
-        try:
-            trip_ids = obj.details.trips_registered or []
-            trips    = Trip.objects.filter(id__in=trip_ids)
-            return [{'id': t.id, 'destination': t.destination,
-                     'start_date': str(t.start_date)} for t in trips]
-        except Exception:
-            return []
+        # The async profile view fetches these alongside the user
+        if 'trips' in self.context:
+            return self.context['trips']
+        return [trip_summary(trip) for trip in registered_trips(obj.id)]
 
     def get_follower_count(self, obj):
-        return obj.followers.count()
+        return get_stats(obj).follower_count
 
     def get_following_count(self, obj):
-        return obj.following.count()
+        return get_stats(obj).following_count
 
 
 class TripSerializer(serializers.ModelSerializer):
@@ -104,10 +120,56 @@ class TripSerializer(serializers.ModelSerializer):
         fields = ['id', 'destination', 'start_date', 'end_date', 'vehicle', 'passengers']
 
 
+def _stop_coordinates(stop):
+    """``(lat, lng)`` of a ``stops`` entry, or ``None`` for plain names."""
+    if not isinstance(stop, dict) or stop.get('lat') is None or stop.get('lng') is None:
+        return None
+    try:
+        lat, lng = float(stop['lat']), float(stop['lng'])
+    except (TypeError, ValueError):
+        raise serializers.ValidationError({'stops': 'Stop coordinates must be numbers'})
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise serializers.ValidationError({'stops': 'Stop coordinates are out of range'})
+    return lat, lng
+
+
 class RouteSerializer(serializers.ModelSerializer):
     class Meta:
         model  = Route
-        fields = ['trip', 'start_location', 'stops', 'start_datetime', 'end_datetime']
+        fields = ['trip', 'start_location', 'stops', 'start_datetime', 'end_datetime',
+                  'origin_lat', 'origin_lng']
+        extra_kwargs = {
+            'origin_lat': {'min_value': -90, 'max_value': 90},
+            'origin_lng': {'min_value': -180, 'max_value': 180},
+        }
+
+    def validate(self, attrs):
+        lat, lng = attrs.get('origin_lat'), attrs.get('origin_lng')
+        if (lat is None) != (lng is None):
+            raise serializers.ValidationError('origin_lat and origin_lng must be sent together')
+        attrs['origin_geohash'] = geo.encode(lat, lng) if lat is not None else None
+        for stop in attrs.get('stops') or []:
+            _stop_coordinates(stop)
+        return attrs
+
+    def save(self, **kwargs):
+        route = super().save(**kwargs)
+        self.sync_stops(route)
+        return route
+
+    @staticmethod
+    def sync_stops(route):
+        """Rewrites ``route``'s ``RouteStop`` rows from the stops that carry coordinates."""
+        RouteStop.objects.filter(trip_id=route.trip_id).delete()
+        points = []
+        for position, stop in enumerate(route.stops or []):
+            coordinates = _stop_coordinates(stop)
+            if coordinates is None:
+                continue
+            lat, lng = coordinates
+            points.append(RouteStop(trip_id=route.trip_id, position=position, name=str(stop.get('name') or '')[:255],
+                                    lat=lat, lng=lng, geohash=geo.encode(lat, lng)))
+        RouteStop.objects.bulk_create(points)
 
 
 class VehicleSerializer(serializers.ModelSerializer):
@@ -133,6 +195,29 @@ class ContactDetailsSerializer(serializers.ModelSerializer):
 
 
 class GroupDetailsSerializer(serializers.ModelSerializer):
+    members_list = serializers.SerializerMethodField()
+
     class Meta:
         model  = GroupDetails
-        fields = ['id', 'trip', 'group_name', 'admin', 'members_count', 'members_list']
\ No newline at end of file
+        fields = ['id', 'trip', 'group_name', 'admin', 'members_count', 'members_list']
+
+    def get_members_list(self, obj):
+        return list(obj.memberships.order_by('joined_at', 'id').values_list('user_id', flat=True))
+
+
+# ── Single-request publish ────────────────────────────────────────────────────
+
+def _without_trip(serializer_class):
+    """The step serializer minus its ``trip`` field, for use before the trip exists."""
+    meta = type('Meta', (serializer_class.Meta,), {
+        'fields': [f for f in serializer_class.Meta.fields if f != 'trip'],
+    })
+    return type(f'Publish{serializer_class.__name__}', (serializer_class,), {'Meta': meta})
+
+
+class TripPublishSerializer(serializers.Serializer):
+    trip    = TripSerializer()
+    route   = _without_trip(RouteSerializer)()
+    vehicle = _without_trip(VehicleSerializer)()
+    payment = _without_trip(PaymentDetailsSerializer)()
+    contact = _without_trip(ContactDetailsSerializer)()
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters, group_cache, profile_cache, query_metrics
+from .models import GroupDetails, GroupMembership, UserDetails
+
+
+# ── Group member cards ────────────────────────────────────────────────────────
+
+@receiver([post_save, post_delete], sender=GroupMembership)
+def _membership_changed(sender, instance, **kwargs):
+    group_cache.invalidate_group_on_commit(instance.group_id)
+
+
+@receiver([post_save, post_delete], sender=GroupDetails)
+def _group_changed(sender, instance, **kwargs):
+    group_cache.invalidate_group_on_commit(instance.id)
+
+
+@receiver(post_save, sender=UserDetails)
+def _member_details_changed(sender, instance, **kwargs):
+    group_cache.invalidate_groups_for_user_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def _member_user_changed(sender, instance, created, **kwargs):
+    if not created:
+        group_cache.invalidate_groups_for_user_on_commit(instance.id)
+
+
+# ── Profile responses ─────────────────────────────────────────────────────────
+
+@receiver(post_save, sender=UserDetails)
+def _profile_details_changed(sender, instance, **kwargs):
+    profile_cache.bump_version_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def _profile_user_changed(sender, instance, created, **kwargs):
+    if not created:
+        profile_cache.bump_version_on_commit(instance.id)
+
+
+# ── Counters ──────────────────────────────────────────────────────────────────
+
+@receiver(post_save, sender=User)
+def _user_created(sender, instance, created, **kwargs):
+    if created:
+        counters.create_for_new_user(instance.id)
+
+
+# ── Query metrics ─────────────────────────────────────────────────────────────
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    query_metrics.install(connection)
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from datetime import timedelta
+
+import jwt
+from jwt import PyJWKSet
+from django.conf import settings
+from django.core.cache import caches
+
+
+class JWKSFetchError(Exception):
+    pass
+
+
+class JWKSCache:
+    """
+    Process-wide cache of the Supabase JWKS document.
+
+    Keys are served from memory for ``ttl`` seconds; on a cold start one
+    lookup fetches them while concurrent ones wait. Once a key set is older
+    than ``ttl - refresh_ahead`` a background thread refetches it, so requests
+    never wait on the network while good keys exist, even past ``ttl``. An
+    unknown ``kid`` causes one synchronous refetch (rate-limited by
+    ``miss_cooldown``) to pick up key rotation. If a fetch fails the last good
+    key set keeps being served.
+    """
+
+    def __init__(self, url, ttl=3600, refresh_ahead=300, timeout=5,
+                 miss_cooldown=30, fetcher=None):
+        self.url           = url
+        self.ttl           = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.timeout       = timeout
+        self.miss_cooldown = miss_cooldown
+        self._fetcher      = fetcher or self._fetch_document
+        self._keys         = {}
+        self._fetched_at   = 0.0
+        self._last_miss    = 0.0
+        self._lock         = threading.Lock()
+        self._first_fetch  = threading.Lock()
+        self._refreshing   = False
+
+    # ── fetching ──────────────────────────────────────────────────────────────
+
+    def _fetch_document(self):
+        req = urllib.request.Request(self.url, headers={'User-Agent': 'tripshare-backend'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.load(resp)
+
+    def refresh(self):
+        """Fetches the key set now. Keeps the old keys and raises on failure."""
+        try:
+            jwk_set = PyJWKSet.from_dict(self._fetcher())
+        except Exception as e:
+            raise JWKSFetchError(f'JWKS fetch failed: {e}') from e
+        keys = {k.key_id: k for k in jwk_set.keys}
+        with self._lock:
+            self._keys       = keys
+            self._fetched_at = time.monotonic()
+        return keys
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except JWKSFetchError as e:
+                print(f"⚠️ Background JWKS refresh failed, serving cached keys: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+    # ── lookup ────────────────────────────────────────────────────────────────
+
+    def get_signing_key(self, kid):
+        now = time.monotonic()
+        age = now - self._fetched_at
+
+        if not self._keys:
+            # Cold start: one request fetches while the rest wait for its keys
+            with self._first_fetch:
+                if not self._keys:
+                    self.refresh()
+        elif age >= self.ttl - self.refresh_ahead:
+            # Stale or nearly stale: keep serving what we have while a
+            # background thread refetches, so a Supabase outage never blocks.
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and now - self._last_miss >= self.miss_cooldown:
+            # Unknown kid: Supabase may have rotated its keys.
+            self._last_miss = now
+            try:
+                self.refresh()
+            except JWKSFetchError as e:
+                print(f"⚠️ JWKS refetch for unknown kid failed: {e}")
+            key = self._keys.get(kid)
+
+        if key is None:
+            raise jwt.InvalidTokenError(f'Unable to find a signing key that matches: "{kid}"')
+        return key
+
+
+class VerifiedClaimsCache:
+    """
+    Bounded LRU cache from a token's SHA-256 digest to its verified claims.
+
+    Entries expire at the token's own ``exp`` plus the verification leeway,
+    so a cached token is never accepted after ``jwt.decode`` would reject it.
+    When ``backend`` names a Django cache alias, entries are also written
+    there so other worker processes can share them; the in-process dict is
+    always checked first.
+    """
+
+    KEY_PREFIX = 'supabase_claims:'
+
+    def __init__(self, maxsize=10000, leeway=60, backend=None):
+        self.maxsize  = maxsize
+        self.leeway   = leeway
+        self.backend  = caches[backend] if backend else None
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+        self._stats   = {'hits': 0, 'backend_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def digest(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode()).hexdigest()
+
+    def get(self, digest):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                expires_at, claims = entry
+                if now < expires_at:
+                    self._entries.move_to_end(digest)
+                    self._stats['hits'] += 1
+                    return claims
+                del self._entries[digest]
+
+        if self.backend is not None:
+            entry = self.backend.get(self.KEY_PREFIX + digest)
+            if entry is not None and now < entry[0]:
+                self._remember(digest, entry)
+                with self._lock:
+                    self._stats['backend_hits'] += 1
+                return entry[1]
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, digest, claims):
+        exp = claims.get('exp')
+        if exp is None:
+            return
+        expires_at = float(exp) + self.leeway
+        ttl        = expires_at - time.time()
+        if ttl <= 0:
+            return
+        entry = (expires_at, claims)
+        self._remember(digest, entry)
+        if self.backend is not None:
+            self.backend.set(self.KEY_PREFIX + digest, entry, timeout=int(ttl) + 1)
+
+    def _remember(self, digest, entry):
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), maxsize=self.maxsize)
+        lookups = stats['hits'] + stats['backend_hits'] + stats['misses']
+        stats['hit_ratio'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class SupabaseTokenVerifier:
+    """
+    Verifies Supabase access tokens against a shared :class:`JWKSCache`.
+
+    With a :class:`VerifiedClaimsCache`, a token that has already been
+    verified costs one hash and one dict lookup until it expires.
+    """
+
+    def __init__(self, jwks_cache, algorithms=("ES256", "RS256", "HS256"), leeway=60,
+                 claims_cache=None):
+        self.jwks_cache   = jwks_cache
+        self.algorithms   = list(algorithms)
+        self.leeway       = timedelta(seconds=leeway)
+        self.claims_cache = claims_cache
+
+    def verify(self, access_token: str) -> dict:
+        if self.claims_cache is not None:
+            digest = self.claims_cache.digest(access_token)
+            claims = self.claims_cache.get(digest)
+            if claims is not None:
+                return claims
+
+        header      = jwt.get_unverified_header(access_token)
+        signing_key = self.jwks_cache.get_signing_key(header.get('kid'))
+        claims = jwt.decode(
+            access_token,
+            signing_key.key,
+            algorithms=self.algorithms,
+            options={"verify_aud": False},
+            leeway=self.leeway,
+        )
+        if self.claims_cache is not None:
+            self.claims_cache.set(digest, claims)
+        return claims
+
+    def stats(self) -> dict:
+        return {'claims_cache': self.claims_cache.stats() if self.claims_cache else None}
+
+
+_verifier      = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier() -> SupabaseTokenVerifier:
+    """Returns the process-wide verifier, building it from settings on first use."""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                jwks_cache = JWKSCache(
+                    settings.SUPABASE_JWKS_URL,
+                    ttl=settings.SUPABASE_JWKS_TTL,
+                    refresh_ahead=settings.SUPABASE_JWKS_REFRESH_AHEAD,
+                    timeout=settings.SUPABASE_JWKS_TIMEOUT,
+                )
+                claims_cache = None
+                if settings.SUPABASE_CLAIMS_CACHE_SIZE > 0:
+                    claims_cache = VerifiedClaimsCache(
+                        maxsize=settings.SUPABASE_CLAIMS_CACHE_SIZE,
+                        backend=settings.SUPABASE_CLAIMS_CACHE_BACKEND or None,
+                    )
+                _verifier = SupabaseTokenVerifier(jwks_cache, claims_cache=claims_cache)
+    return _verifier
@@ -1,3 +1,781 @@
-from django.test import TestCase
+import importlib
+import io
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import (
+    autocomplete, checks, completed_trips, counters, db_router, feed, geo, group_cache, otp_store, outbox,
+    profile_cache, reservations, supabase_auth, throttling, trip_search, views,
+)
+from .models import (
+    CompletedTrip, Follower, GroupDetails, GroupMembership, OutboxEmail, PaymentDetails, Post, Route,
+    SeatAvailability, TimelineEntry, Trip, TripRegistration, UserStats,
+)
+from .pagination import InvalidCursor, aranked_page, decode_cursor, decode_rank_cursor, keyset_page
+
+
+def _has_extension(name):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_extension WHERE extname = %s', [name])
+        return cursor.fetchone() is not None
+
+
+def make_user(username):
+    return User.objects.create(username=username, email=f'{username}@example.com')
+
+
+def make_trip(owner, destination='Munnar', start_location='Kochi', passengers=4):
+    start = date.today() + timedelta(days=30)
+    trip  = Trip.objects.create(user=owner, destination=destination, start_date=start,
+                                end_date=start + timedelta(days=2), vehicle='car', passengers=passengers)
+    Route.objects.create(trip=trip, start_location=start_location)
+    deadline = datetime.combine(start, datetime.min.time(), tzinfo=dt_timezone.utc)
+    PaymentDetails.objects.create(trip=trip, price_per_head=1000, booking_deadline=deadline,
+                                  cancel_deadline=deadline - timedelta(days=1), payment_method='UPI')
+    return trip
+
+
+def follow_pages(fetch):
+    """Calls ``fetch(cursor)`` until it returns no next cursor; returns every id seen, in order."""
+    ids, cursor = [], None
+    for _ in range(100):
+        rows, cursor = fetch(cursor)
+        ids += rows
+        if cursor is None:
+            return ids
+    raise AssertionError('cursor never ran out')
+
+
+# ── Supabase auth ─────────────────────────────────────────────────────────────
+
+class JWKSCacheTests(SimpleTestCase):
+    def test_cold_start_fetches_once_for_concurrent_lookups(self):
+        fetches = []
+
+        def fetcher():
+            fetches.append(1)
+            time.sleep(0.05)
+            return {'keys': [{'kty': 'oct', 'kid': 'k1', 'alg': 'HS256', 'k': 'c2VjcmV0'}]}
+
+        jwks    = supabase_auth.JWKSCache('https://example.invalid/jwks', fetcher=fetcher)
+        threads = [threading.Thread(target=jwks.get_signing_key, args=('k1',)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(jwks.get_signing_key('k1').key_id, 'k1')
+
+
+# ── Rank cursors ──────────────────────────────────────────────────────────────
+
+class _Real(FloatField):
+    def db_type(self, connection):
+        return 'real'
+
+
+class RankCursorTests(TestCase):
+    def setUp(self):
+        self.viewer = make_user('viewer')
+        owner       = make_user('owner')
+        self.trips  = [make_trip(owner) for _ in range(5)]
+
+    @skipUnless(connection.vendor == 'postgresql', 'float4 ranks are a Postgres type')
+    def test_float4_rank_cast_to_float8_pages_through_ties(self):
+        # Two thirds is not exact in float4; every row ties on it
+        rank = Cast(Cast(Value(2 / 3), _Real()), FloatField())
+        qs   = Trip.objects.annotate(rank=rank)
+
+        def fetch(cursor):
+            rows, next_cursor = async_to_sync(aranked_page)(
+                qs, decode_rank_cursor(cursor) if cursor else None, 2)
+            return [trip.id for trip in rows], next_cursor
+
+        ids = follow_pages(fetch)
+        self.assertEqual(ids, sorted((trip.id for trip in self.trips), reverse=True))
+
+    @skipUnless(_has_extension('pg_trgm'), 'needs pg_trgm')
+    def test_text_search_pages_through_ties_without_repeats(self):
+        def fetch(cursor):
+            params = {'q': 'Munar', 'limit': '2', **({'cursor': cursor} if cursor else {})}
+            page   = async_to_sync(trip_search.atext_search_page)(self.viewer, params)
+            return [row['id'] for row in page['results']], page['next_cursor']
+
+        ids = follow_pages(fetch)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), {trip.id for trip in self.trips})
+
+
+class KeysetCursorTests(TestCase):
+    def setUp(self):
+        owner      = make_user('owner')
+        self.trips = [make_trip(owner) for _ in range(5)]
+        # Every row ties on created_at, so the id alone has to break it
+        Trip.objects.update(created_at=datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+
+    def test_pages_through_created_at_ties_without_repeats(self):
+        def fetch(cursor):
+            rows, next_cursor = keyset_page(Trip.objects.all(), decode_cursor(cursor) if cursor else None, 2)
+            return [trip.id for trip in rows], next_cursor
+
+        self.assertEqual(follow_pages(fetch), sorted((trip.id for trip in self.trips), reverse=True))
+
+    def test_malformed_cursors_are_rejected(self):
+        # Empty, not base64, 'a' and 'x|y'
+        for cursor in ('', 'not base64!', 'YQ', 'eHx5'):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+            with self.assertRaises(InvalidCursor):
+                decode_rank_cursor(cursor)
+
+
+class NearSearchTests(TestCase):
+    def setUp(self):
+        self.viewer = make_user('viewer')
+        owner       = make_user('owner')
+        # About 1, 5 and 30 km north of Kochi
+        for km in (1, 5, 30):
+            route = make_trip(owner).route
+            route.origin_lat, route.origin_lng = 9.9312 + km / 111.2, 76.2673
+            route.origin_geohash = geo.encode(route.origin_lat, route.origin_lng)
+            route.save()
+
+    def test_pages_nearest_first_within_the_radius(self):
+        def fetch(cursor):
+            params = {'lat': '9.9312', 'lng': '76.2673', 'radius_km': '10', 'limit': '1',
+                      **({'cursor': cursor} if cursor else {})}
+            page   = async_to_sync(trip_search.anear_page)(self.viewer, params)
+            return [row['distance_km'] for row in page['results']], page['next_cursor']
+
+        self.assertEqual([round(km) for km in follow_pages(fetch)], [1, 5])
+
+
+# ── Autocomplete ──────────────────────────────────────────────────────────────
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        owner = make_user('owner')
+        for destination in ('Munnar', 'Munnar', 'Mumbai', 'Goa'):
+            make_trip(owner, destination=destination)
+
+    def test_failed_first_build_falls_back_to_a_prefix_query(self):
+        loads = []
+
+        def loader(size):
+            loads.append(size)
+            if len(loads) == 1:
+                raise ConnectionError('database unavailable')
+            return autocomplete.popular_destinations(size)
+
+        index = autocomplete.DestinationIndex(size=10, refresh_seconds=3600, loader=loader)
+        self.assertEqual(index.suggest('mu'), ['Munnar', 'Mumbai'])
+        self.assertIsNone(index.stats()['age_seconds'])
+
+        self.assertEqual(index.suggest('mu'), ['Munnar', 'Mumbai'])
+        self.assertEqual((len(loads), index.stats()['destinations']), (2, 3))
+
+
+# ── Replica routing ───────────────────────────────────────────────────────────
+
+REPLICA = 'test_replica'
+
+
+def _unreachable(settings_dict):
+    """A copy of ``settings_dict`` for a database that refuses connections."""
+    unreachable = {**settings_dict, 'OPTIONS': {key: value for key, value in settings_dict['OPTIONS'].items()
+                                                if key != 'pool'}}
+    if settings_dict['ENGINE'].endswith('sqlite3'):
+        unreachable['NAME'] = '/nonexistent/replica.sqlite3'
+    else:
+        unreachable.update(HOST='127.0.0.1', PORT='1')
+    # A mirror is left alone by the test runner's flushes
+    unreachable['TEST'] = {**settings_dict['TEST'], 'MIRROR': 'default'}
+    return unreachable
+
+
+# TestCase would keep every read on the primary: reads inside a transaction on
+# it are never routed
+@override_settings(DB_REPLICA_ALIASES=[REPLICA])
+class ReplicaFallbackTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in the class body: the runner checks the
+        # aliases in ``databases`` exist before any class is set up
+        connections.settings[REPLICA] = _unreachable(connections.settings['default'])
+        cls.databases = {'default', REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        # Up and not due a probe, so the view is sent to it
+        db_router._health[REPLICA] = {'down_until': 0.0, 'next_check': time.monotonic() + 60, 'lag': 0.0}
+        self.addCleanup(db_router._health.pop, REPLICA, None)
+        cache.clear()
+        self.owner = make_user('owner')
+        trip       = make_trip(self.owner)
+        self.group = GroupDetails.objects.create(trip=trip, admin=self.owner, group_name='Munnar')
+        GroupMembership.objects.create(group=self.group, user=self.owner, role=GroupMembership.ROLE_ADMIN)
+
+    def test_connection_error_in_view_is_retried_on_primary(self):
+        request = APIRequestFactory().get(f'/api/groups/{self.group.id}/')
+        force_authenticate(request, user=self.owner)
+        fallbacks = db_router.stats()['fallbacks']
+
+        token = db_router._state.set({'alias': None, 'wrote': False})
+        try:
+            response = async_to_sync(views.get_group_details)(request, group_id=self.group.id)
+        finally:
+            db_router._state.reset(token)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['group_id'], self.group.id)
+        self.assertEqual(db_router.stats()['fallbacks'], fallbacks + 1)
+        self.assertFalse(db_router.stats()['replicas'][REPLICA]['up'])
+
+
+@override_settings(DB_REPLICA_ALIASES=['replica1'])
+class PrimaryPinTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def _serve(self, request, status=200):
+        return db_router.PrimaryPinMiddleware(lambda request: HttpResponse(status=status))(request)
+
+    def _pinned(self, request):
+        return bool(db_router._pin_cache().get_many(db_router._pin_keys(request)))
+
+    def test_write_pins_the_credential_not_the_address(self):
+        self._serve(self.factory.post('/api/posts/create/', HTTP_AUTHORIZATION='Token abc'))
+
+        self.assertTrue(self._pinned(self.factory.get('/api/feed/', HTTP_AUTHORIZATION='Token abc')))
+        # Same address, other or no credentials
+        self.assertFalse(self._pinned(self.factory.get('/api/feed/', HTTP_AUTHORIZATION='Token xyz')))
+        self.assertFalse(self._pinned(self.factory.get('/api/feed/')))
+
+    def test_write_without_credentials_pins_the_address(self):
+        self._serve(self.factory.post('/api/otp/send/', REMOTE_ADDR='203.0.113.7'))
+
+        self.assertTrue(self._pinned(self.factory.get('/api/feed/', REMOTE_ADDR='203.0.113.7')))
+        self.assertFalse(self._pinned(self.factory.get('/api/feed/', REMOTE_ADDR='203.0.113.8')))
+
+    def test_reads_and_failed_writes_do_not_pin(self):
+        self._serve(self.factory.get('/api/feed/', HTTP_AUTHORIZATION='Token abc'))
+        self._serve(self.factory.post('/api/posts/create/', HTTP_AUTHORIZATION='Token abc'), status=500)
+
+        self.assertFalse(self._pinned(self.factory.get('/api/feed/', HTTP_AUTHORIZATION='Token abc')))
+
+    def test_per_process_pin_cache_fails_the_check(self):
+        self.assertEqual([error.id for error in checks.check_replica_pin_cache(None)], ['api.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                              'LOCATION': 'redis://127.0.0.1:6379'}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(checks.check_replica_pin_cache(None), [])
+        with self.settings(DB_REPLICA_ALIASES=[]):
+            self.assertEqual(checks.check_replica_pin_cache(None), [])
+
+
+# ── Feed ──────────────────────────────────────────────────────────────────────
+
+@override_settings(FEED_TIMELINE_BACKEND='api.feed.DBTimelineStore', FEED_TIMELINE_CAP=3)
+class FeedTests(TestCase):
+    def setUp(self):
+        feed._store = None
+        self.addCleanup(setattr, feed, '_store', None)
+        self.reader = make_user('reader')
+        self.author = make_user('author')
+        Follower.objects.create(follower=self.reader, following=self.author)
+        trip        = make_trip(self.author)
+        self.posts  = [Post.objects.create(user=self.author, trip=trip, image_url=f'https://img/{n}.jpg')
+                       for n in range(5)]
+
+    def _get(self, **params):
+        request = APIRequestFactory().get('/api/feed/', params)
+        force_authenticate(request, user=self.reader)
+        return views.home_feed(request)
+
+    def test_push_trims_each_timeline_to_the_cap(self):
+        feed.fan_out(self.author.id, [post.id for post in self.posts])
+
+        kept = TimelineEntry.objects.filter(user=self.reader).values_list('post_id', flat=True)
+        self.assertEqual(sorted(kept), [post.id for post in self.posts[-3:]])
+
+    def test_cursor_pages_through_the_timeline(self):
+        feed.fan_out(self.author.id, [post.id for post in self.posts])
+
+        def fetch(cursor):
+            data = self._get(limit=2, **({'cursor': cursor} if cursor else {})).data
+            return [post['id'] for post in data['results']], data['next_cursor']
+
+        self.assertEqual(follow_pages(fetch), [post.id for post in reversed(self.posts[-3:])])
+
+    def test_limit_below_one_is_rejected(self):
+        for limit in (0, -1):
+            self.assertEqual(self._get(limit=limit).status_code, 400)
+
+
+# ── Publishing ────────────────────────────────────────────────────────────────
+
+class PublishTripTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner')
+        start      = date.today() + timedelta(days=30)
+        self.body  = {
+            'trip':    {'destination': 'Munnar', 'start_date': start.isoformat(),
+                        'end_date': (start + timedelta(days=2)).isoformat(), 'vehicle': 'car', 'passengers': 4},
+            'route':   {'start_location': 'Kochi', 'vehicle_number': 'KL-07-1234', 'vehicle_model': 'Swift'},
+            'payment': {'price_per_head': 1000, 'booking_deadline': f'{start.isoformat()}T00:00:00Z',
+                        'cancel_deadline': f'{(start - timedelta(days=1)).isoformat()}T00:00:00Z',
+                        'payment_method': 'UPI', 'payment_details': {'upi_id': 'owner@upi'}},
+            'contact': {'phone': '9999999999', 'email': 'owner@example.com'},
+        }
+
+    def _publish(self, body):
+        request = APIRequestFactory().post('/api/trips/publish/', body, format='json')
+        force_authenticate(request, user=self.owner)
+        return views.publish_trip(request)
+
+    def test_publishes_trip_with_its_group(self):
+        response = self._publish(self.body)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        group = GroupDetails.objects.get(id=response.data['group_id'])
+        self.assertEqual((group.trip_id, group.admin_id), (response.data['trip_id'], self.owner.id))
+        self.assertTrue(GroupMembership.objects.filter(group=group, user=self.owner).exists())
+
+    def test_sections_that_are_not_objects_are_rejected(self):
+        for section, value in [('route', 'oops'), ('trip', [1]), ('contact', 7)]:
+            response = self._publish({**self.body, section: value})
+            self.assertEqual(response.status_code, 400, section)
+        response = self._publish({**self.body, 'payment': {**self.body['payment'], 'payment_details': 'x'}})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_null_payment_details_counts_as_missing(self):
+        response = self._publish({**self.body, 'payment': {**self.body['payment'], 'payment_details': None}})
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIsNone(PaymentDetails.objects.get(trip_id=response.data['trip_id']).upi_id)
+
+
+# ── Group cache ───────────────────────────────────────────────────────────────
+
+class GroupCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.group = GroupDetails.objects.create(trip=make_trip(self.owner), admin=self.owner, group_name='Munnar')
+        GroupMembership.objects.create(group=self.group, user=self.owner, role=GroupMembership.ROLE_ADMIN)
+
+    def _payload(self):
+        return async_to_sync(group_cache.aget_group_payload)(self.group.id)
+
+    def test_rename_invalidates_once_committed(self):
+        self.assertEqual(self._payload()['group_name'], 'Munnar')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.group_name = 'Munnar trip'
+            self.group.save()
+            # Still cached: a rebuild now would read the uncommitted name
+            self.assertIsNotNone(cache.get(group_cache._key(self.group.id)))
+
+        self.assertEqual(self._payload()['group_name'], 'Munnar trip')
+
+    def test_member_edit_invalidates_their_groups(self):
+        self._payload()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner.first_name = 'Asha'
+            self.owner.save()
+
+        self.assertEqual(self._payload()['members'][0]['name'], 'Asha')
+
+    def test_per_process_caches_warn_on_deploy_check(self):
+        warnings = checks.check_invalidated_caches(None)
+        self.assertEqual({w.id for w in warnings}, {'api.W001'})
+        self.assertEqual([w.msg.split()[0] for w in warnings], checks.INVALIDATED_CACHE_SETTINGS)
+        dummy = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with self.settings(CACHES=dummy):
+            self.assertEqual(checks.check_invalidated_caches(None), [])
+
+
+# ── Outbox ────────────────────────────────────────────────────────────────────
+
+@override_settings(OUTBOX_LEASE_SECONDS=60, EMAIL_TIMEOUT=30, OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.emails = [outbox.enqueue(f'user{n}@example.com', 'Hi', 'Body') for n in range(3)]
+        OutboxEmail.objects.update(next_attempt_at=datetime.now(dt_timezone.utc) - timedelta(seconds=1))
+
+    def test_lease_covers_a_timeout_per_email(self):
+        now   = datetime.now(dt_timezone.utc)
+        batch = outbox.claim_batch(10, now=now)
+
+        self.assertEqual(len(batch), 3)
+        for email in OutboxEmail.objects.all():
+            self.assertEqual(email.status, OutboxEmail.STATUS_SENDING)
+            self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60 + 4 * 30))
+
+    def test_outcome_after_the_lease_is_lost_is_dropped(self):
+        batch = outbox.claim_batch(10)
+        # The lease ran out and another dispatcher claimed the first row
+        OutboxEmail.objects.filter(id=batch[0].id).update(next_attempt_at=batch[0].next_attempt_at
+                                                          + timedelta(seconds=1))
+
+        self.assertEqual(outbox.send_batch(batch), (3, 0))
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxEmail.objects.get(id=batch[0].id).status, OutboxEmail.STATUS_SENDING)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENT).count(), 2)
+
+    def test_failure_is_retried_then_given_up(self):
+        with override_settings(EMAIL_BACKEND='api.tests._FailingBackend'):
+            for _ in range(3):
+                OutboxEmail.objects.update(next_attempt_at=datetime.now(dt_timezone.utc))
+                outbox.send_batch(outbox.claim_batch(10))
+
+        email = OutboxEmail.objects.get(id=self.emails[0].id)
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.STATUS_FAILED, 3))
+        self.assertIn('refused', email.last_error)
+        self.assertEqual(email.body, '')
+
+    def test_sent_otp_row_no_longer_holds_the_code(self):
+        request = APIRequestFactory().post('/api/otp/send/', {'email': 'otp@example.com'}, format='json')
+        force_authenticate(request, user=make_user('otp'))
+        with mock.patch.object(otp_store, 'generate_code', return_value='482913'):
+            self.assertEqual(views.send_otp(request).status_code, 200)
+        OutboxEmail.objects.update(next_attempt_at=datetime.now(dt_timezone.utc))
+
+        outbox.send_batch(outbox.claim_batch(10))
+
+        self.assertTrue(any('482913' in message.body for message in mail.outbox))
+        row = OutboxEmail.objects.get(to_email='otp@example.com')
+        self.assertEqual(row.status, OutboxEmail.STATUS_SENT)
+        self.assertNotIn('482913', row.body)
+
+
+class _FailingBackend(LocMemEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('refused')
+
+
+# ── Profile cache ─────────────────────────────────────────────────────────────
+
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = make_user('viewer')
+        self.target = make_user('target')
+
+    def _get(self, **params):
+        request = APIRequestFactory().get(f'/api/profile/{self.target.id}/', params)
+        force_authenticate(request, user=self.viewer)
+        return async_to_sync(views.other_user_profile)(request, user_id=self.target.id)
+
+    def test_unknown_posts_modes_share_the_all_variant(self):
+        misses = profile_cache.stats()['misses']
+        for mode in ('all', 'everything', 'x' * 200):
+            response = self._get(posts=mode)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['posts'], [])
+        self._get()
+
+        self.assertEqual(profile_cache.stats()['misses'], misses + 1)
+
+
+# ── Counters ──────────────────────────────────────────────────────────────────
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.user  = make_user('user')
+        self.other = make_user('other')
+        Follower.objects.create(follower=self.other, following=self.user)
+
+    def test_new_user_starts_with_a_zero_row(self):
+        stats = UserStats.objects.get(user=make_user('new'))
+        self.assertEqual((stats.post_count, stats.follower_count), (0, 0))
+
+    def test_reading_stats_never_writes(self):
+        UserStats.objects.filter(user=self.user).delete()
+        user = User.objects.get(id=self.user.id)
+
+        # The row lookup and four counts; no INSERT
+        with self.assertNumQueries(5):
+            self.assertEqual(counters.get_stats(user).follower_count, 1)
+        self.assertFalse(UserStats.objects.filter(user=self.user).exists())
+
+    def test_migration_backfills_missing_rows(self):
+        UserStats.objects.all().delete()
+        migration = importlib.import_module('api.migrations.0024_backfill_userstats')
+
+        migration.backfill_user_stats(apps, None)
+
+        counts = dict(UserStats.objects.values_list('user_id', 'follower_count'))
+        self.assertEqual(counts, {self.user.id: 1, self.other.id: 0})
+
+
+# ── Completed trips ───────────────────────────────────────────────────────────
+
+class MaterializeCompletedTripsTests(TestCase):
+    def setUp(self):
+        self.user = make_user('user')
+        for days_ago in (2, 30):
+            trip = make_trip(make_user(f'owner{days_ago}'))
+            Trip.objects.filter(id=trip.id).update(start_date=date.today() - timedelta(days=days_ago + 1),
+                                                   end_date=date.today() - timedelta(days=days_ago))
+            TripRegistration.objects.create(user=self.user, trip=trip)
+
+    def _run(self, *args):
+        out = io.StringIO()
+        call_command('materialize_completed_trips', *args, stdout=out)
+        return out.getvalue()
+
+    @override_settings(COMPLETED_TRIPS_LOOKBACK_DAYS=7)
+    def test_recent_only_looks_back_the_configured_days(self):
+        self._run('--recent')
+        self.assertEqual(CompletedTrip.objects.filter(user=self.user).count(), 1)
+
+        self._run()
+        self.assertEqual(CompletedTrip.objects.filter(user=self.user).count(), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'advisory locks are a Postgres feature')
+    def test_skips_while_another_run_holds_the_lock(self):
+        other = connections.create_connection('default')
+        try:
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_lock(%s)', [completed_trips.LOCK_KEY])
+            self.assertIn('skipped', self._run())
+            self.assertFalse(CompletedTrip.objects.exists())
+        finally:
+            # A pooled connection outlives close(), and the lock with it
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [completed_trips.LOCK_KEY])
+            other.close()
+
+        self._run()
+        self.assertEqual(CompletedTrip.objects.filter(user=self.user).count(), 2)
+
+
+# ── Reservations ──────────────────────────────────────────────────────────────
+
+def _trip_with_group(owner, seats):
+    trip = make_trip(owner, passengers=seats)
+    SeatAvailability.objects.create(trip=trip, total_seats=seats, available_seats=seats)
+    GroupDetails.objects.create(trip=trip, admin=owner, group_name='Munnar')
+    return trip
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.trip = _trip_with_group(make_user('owner'), seats=2)
+
+    def _seats(self):
+        return SeatAvailability.objects.get(trip=self.trip).available_seats
+
+    def test_full_trip_rejects_the_next_join(self):
+        for n in range(2):
+            reservations.join_trip(make_user(f'user{n}'), self.trip)
+
+        with self.assertRaises(reservations.TripFull):
+            reservations.join_trip(make_user('late'), self.trip)
+        self.assertEqual(self._seats(), 0)
+        self.assertEqual(GroupDetails.objects.get(trip=self.trip).members_count, 3)
+
+    def test_joining_twice_takes_one_seat(self):
+        user = make_user('user')
+        reservations.join_trip(user, self.trip)
+
+        with self.assertRaises(reservations.AlreadyJoined):
+            reservations.join_trip(user, self.trip)
+        self.assertEqual(self._seats(), 1)
+
+    def test_hold_converts_without_a_second_seat_and_lapses_otherwise(self):
+        joiner, holder = make_user('joiner'), make_user('holder')
+        reservations.hold_seat(joiner, self.trip)
+        reservations.join_trip(joiner, self.trip)
+        reservations.hold_seat(holder, self.trip, seconds=60)
+        self.assertEqual(self._seats(), 0)
+
+        released = reservations.release_expired_holds(now=datetime.now(dt_timezone.utc) + timedelta(seconds=61))
+
+        self.assertEqual(released, 1)
+        self.assertEqual(self._seats(), 1)
+        self.assertFalse(TripRegistration.objects.filter(user=holder).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs concurrent writers')
+class ConcurrentJoinTests(TransactionTestCase):
+    SEATS, USERS = 3, 12
+
+    def test_concurrent_joins_never_oversell(self):
+        trip    = _trip_with_group(make_user('owner'), seats=self.SEATS)
+        users   = [make_user(f'user{n}') for n in range(self.USERS)]
+        start   = threading.Barrier(self.USERS)
+        results = []
+
+        def join(user):
+            try:
+                start.wait()
+                reservations.join_trip(user, trip)
+                results.append('joined')
+            except reservations.TripFull:
+                results.append('full')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=join, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), ['full'] * (self.USERS - self.SEATS) + ['joined'] * self.SEATS)
+        self.assertEqual(SeatAvailability.objects.get(trip=trip).available_seats, 0)
+        self.assertEqual(TripRegistration.objects.filter(trip=trip).count(), self.SEATS)
+
+
+# ── OTP ───────────────────────────────────────────────────────────────────────
+
+class _OTPStoreTests:
+    """Limits every OTP store has to enforce; subclasses set ``make_store``."""
+
+    def setUp(self):
+        cache.clear()
+        self.store = self.make_store(max_attempts=3, burst=2, refill_seconds=60)
+
+    def test_code_is_used_once(self):
+        self.store.issue('A@example.com', '123456', ttl=300)
+
+        self.store.verify('a@example.com', '123456')
+        with self.assertRaises(otp_store.OTPNotFound):
+            self.store.verify('a@example.com', '123456')
+
+    def test_wrong_guesses_run_out_and_burn_the_code(self):
+        self.store.issue('a@example.com', '123456', ttl=300)
+
+        left = []
+        for _ in range(3):
+            with self.assertRaises(otp_store.OTPMismatch) as mismatch:
+                self.store.verify('a@example.com', '000000')
+            left.append(mismatch.exception.attempts_left)
+        self.assertEqual(left, [2, 1, 0])
+        with self.assertRaises(otp_store.TooManyAttempts):
+            self.store.verify('a@example.com', '123456')
+        with self.assertRaises(otp_store.OTPNotFound):
+            self.store.verify('a@example.com', '123456')
+
+    def test_resends_are_limited_to_the_burst_then_refill(self):
+        now = time.time()
+        with mock.patch('api.otp_store.time.time', return_value=now):
+            self.store.issue('a@example.com', '111111', ttl=300)
+            self.store.issue('a@example.com', '222222', ttl=300)
+            with self.assertRaises(otp_store.ResendLimited) as limited:
+                self.store.issue('a@example.com', '333333', ttl=300)
+            self.assertGreater(limited.exception.retry_after, 0)
+            # Other emails have their own allowance
+            self.store.issue('b@example.com', '444444', ttl=300)
+
+        with mock.patch('api.otp_store.time.time', return_value=now + 2 * 60 + 1):
+            self.store.issue('a@example.com', '555555', ttl=300)
+            self.store.verify('a@example.com', '555555')
+
+    def test_expired_code_is_not_found(self):
+        self.store.issue('a@example.com', '123456', ttl=-1)
+
+        with self.assertRaises(otp_store.OTPNotFound):
+            self.store.verify('a@example.com', '123456')
+
+
+class DBOTPStoreTests(_OTPStoreTests, TestCase):
+    make_store = otp_store.DBOTPStore
+
+
+class CacheOTPStoreTests(_OTPStoreTests, SimpleTestCase):
+    make_store = otp_store.CacheOTPStore
+
+
+# ── Throttles ─────────────────────────────────────────────────────────────────
+
+class _Clock:
+    now = 0.0
+
+
+class _TestThrottle(throttling.IPThrottle):
+    scope = 'test'
+    rate  = '3/min'
+
+    def timer(self):
+        return _Clock.now
+
+
+class _ThrottleTests:
+    """The sliding window over each counter store; subclasses set ``store``."""
+
+    def setUp(self):
+        cache.clear()
+        throttling._store = None
+        self.addCleanup(setattr, throttling, '_store', None)
+        _Clock.now = 600.0   # the start of a window
+
+    def _request(self, addr='203.0.113.7', **headers):
+        return RequestFactory().post('/api/login/', REMOTE_ADDR=addr, **headers)
+
+    def _allowed(self, n, **kwargs):
+        throttle = _TestThrottle()
+        return [throttle.allow_request(self._request(**kwargs), None) for _ in range(n)], throttle
+
+    def test_rate_holds_within_a_window(self):
+        with self.settings(THROTTLE_STORE=self.store):
+            allowed, throttle = self._allowed(4)
+            self.assertEqual(allowed, [True, True, True, False])
+            self.assertGreater(throttle.wait(), 0)
+            # Another address has its own count
+            self.assertEqual(self._allowed(1, addr='203.0.113.8')[0], [True])
+
+    def test_previous_window_slides_out_gradually(self):
+        with self.settings(THROTTLE_STORE=self.store):
+            self._allowed(3)
+            # Halfway through the next window the previous 3 count as 1.5
+            _Clock.now += 90
+            self.assertEqual(self._allowed(3)[0], [True, False, False])
+            # Two windows on, nothing is left of either
+            _Clock.now += 120
+            self.assertEqual(self._allowed(4)[0], [True, True, True, False])
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        with self.settings(THROTTLE_STORE=self.store):
+            allowed = [self._allowed(1, HTTP_X_FORWARDED_FOR=f'198.51.100.{n}')[0][0] for n in range(4)]
+            self.assertEqual(allowed, [True, True, True, False])
+
+
+class DBWindowStoreTests(_ThrottleTests, TestCase):
+    store = 'api.throttling.DBWindowStore'
+
+
+class CacheWindowStoreTests(_ThrottleTests, SimpleTestCase):
+    store = 'api.throttling.CacheWindowStore'
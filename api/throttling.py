@@ -0,0 +1,235 @@
+"""
+Sliding-window throttles for the expensive unauthenticated endpoints.
+
+A window of ``duration`` seconds is approximated from two fixed windows:
+the count so far in the current window plus the previous window's count,
+weighted by how much of it still overlaps the sliding window. That costs
+one atomic increment and one read per request. DRF's ``SimpleRateThrottle``
+instead rewrites a list of every request timestamp.
+
+Rates come from ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` by scope.
+Counters live in the store named by ``THROTTLE_STORE``: :class:`DBWindowStore`
+(an unlogged table, default) or :class:`CacheWindowStore` (a shared cache
+with atomic ``incr``, such as Redis or Memcached).
+"""
+import abc
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils.module_loading import import_string
+from rest_framework.throttling import SimpleRateThrottle
+
+from .models import ThrottleCounter
+
+
+# ── Counter stores ────────────────────────────────────────────────────────────
+
+class WindowStore(abc.ABC):
+    @abc.abstractmethod
+    def hit(self, key, previous_key, ttl):
+        """Adds one to ``key`` and returns ``(count of key, count of previous_key)``."""
+
+    @abc.abstractmethod
+    def undo(self, key):
+        """Takes back a hit that was rejected, so it does not count against the client."""
+
+
+class DBWindowStore(WindowStore):
+    """Counters as rows in ``throttle_counters``; expired rows are swept every ``SWEEP_SECONDS``."""
+
+    SWEEP_SECONDS = 60
+
+    HIT_SQL = """
+    INSERT INTO throttle_counters (key, hits, expires_at)
+    VALUES (%(key)s, 1, %(expires_at)s)
+    ON CONFLICT (key) DO UPDATE SET hits = throttle_counters.hits + 1
+    RETURNING hits
+    """
+
+    PREVIOUS_SQL = 'SELECT hits FROM throttle_counters WHERE key = %(previous_key)s'
+
+    # Postgres does both in one round trip
+    HIT_AND_PREVIOUS_SQL = f"""
+    WITH hit AS ({HIT_SQL})
+    SELECT (SELECT hits FROM hit), ({PREVIOUS_SQL})
+    """
+
+    def __init__(self):
+        self._next_sweep = 0.0
+
+    def hit(self, key, previous_key, ttl):
+        now = time.time()
+        params = {'key': key, 'previous_key': previous_key, 'expires_at': now + ttl}
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(self.HIT_AND_PREVIOUS_SQL, params)
+                current, previous = cursor.fetchone()
+            else:
+                cursor.execute(self.HIT_SQL, params)
+                current = cursor.fetchone()[0]
+                cursor.execute(self.PREVIOUS_SQL, params)
+                previous = (cursor.fetchone() or [None])[0]
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.SWEEP_SECONDS
+            ThrottleCounter.objects.filter(expires_at__lt=now).delete()
+        return current, previous or 0
+
+    def undo(self, key):
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE throttle_counters SET hits = hits - 1 WHERE key = %s AND hits > 0', [key])
+
+
+class CacheWindowStore(WindowStore):
+    """
+    Counters in a Django cache. ``incr`` must be atomic across workers, as it
+    is on Redis and Memcached; LocMemCache only counts within one process.
+    """
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def hit(self, key, previous_key, ttl):
+        try:
+            current = self.cache.incr(key)
+        except ValueError:
+            # First hit in this window; if another request created it first, add() loses
+            current = 1 if self.cache.add(key, 1, timeout=ttl) else self.cache.incr(key)
+        return current, self.cache.get(previous_key, 0)
+
+    def undo(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+
+_store      = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> WindowStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store_class = import_string(settings.THROTTLE_STORE)
+                if issubclass(store_class, CacheWindowStore):
+                    _store = store_class(alias=settings.THROTTLE_CACHE_ALIAS)
+                else:
+                    _store = store_class()
+    return _store
+
+
+# ── Rejection counters ────────────────────────────────────────────────────────
+
+_stats      = {}
+_stats_lock = threading.Lock()
+
+
+def _record(scope, allowed):
+    with _stats_lock:
+        counts = _stats.setdefault(scope, {'allowed': 0, 'rejected': 0})
+        counts['allowed' if allowed else 'rejected'] += 1
+
+
+def stats() -> dict:
+    """Allowed and rejected requests per scope since this process started."""
+    with _stats_lock:
+        return {scope: dict(counts) for scope, counts in sorted(_stats.items())}
+
+
+# ── Throttles ─────────────────────────────────────────────────────────────────
+
+class SlidingWindowThrottle(SimpleRateThrottle, abc.ABC):
+    """
+    Base class. Subclasses set ``scope`` and implement :meth:`get_ident_value`,
+    returning the string to count requests against, or ``None`` to skip.
+    """
+
+    @abc.abstractmethod
+    def get_ident_value(self, request):
+        pass
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_value(request)
+        if ident is None:
+            return None
+        return f'throttle:{self.scope}:{hashlib.sha256(ident.encode()).hexdigest()[:32]}'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now     = self.timer()
+        window       = int(self.now // self.duration)
+        self.elapsed = self.now / self.duration - window
+        current_key  = f'{self.key}:{window}'
+        self.current, self.previous = get_store().hit(
+            current_key, f'{self.key}:{window - 1}', ttl=2 * self.duration)
+
+        allowed = self.current + self.previous * (1 - self.elapsed) <= self.num_requests
+        if not allowed:
+            get_store().undo(current_key)
+            self.current -= 1
+        _record(self.scope, allowed)
+        return allowed
+
+    def wait(self):
+        """Seconds until one more request fits in the sliding window."""
+        room = self.num_requests - self.current - 1
+        if room >= 0 and self.previous:
+            # Still in this window, once enough of the previous one has slid out
+            fraction = max(0.0, 1 - room / self.previous - self.elapsed)
+        else:
+            # This window's count has to slide out as well
+            fraction = 1 - self.elapsed + max(0.0, 1 - (self.num_requests - 1) / max(self.current, 1))
+        return max(1, math.ceil(fraction * self.duration))
+
+
+class IPThrottle(SlidingWindowThrottle):
+    def get_ident_value(self, request):
+        return self.get_ident(request) or None
+
+
+class UserThrottle(SlidingWindowThrottle):
+    def get_ident_value(self, request):
+        if request.user and request.user.is_authenticated:
+            return str(request.user.pk)
+        return None
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    """Counts requests per target ``email`` in the request body, whoever sends them."""
+
+    def get_ident_value(self, request):
+        email = request.data.get('email', '') if hasattr(request.data, 'get') else ''
+        email = str(email).strip().lower()
+        return email or None
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class SignupIPThrottle(IPThrottle):
+    scope = 'signup_ip'
+
+
+class OTPSendIPThrottle(IPThrottle):
+    scope = 'otp_send_ip'
+
+
+class OTPSendUserThrottle(UserThrottle):
+    scope = 'otp_send_user'
+
+
+class OTPSendEmailThrottle(EmailThrottle):
+    scope = 'otp_send_email'
@@ -0,0 +1,274 @@
+from datetime import date
+
+from django.contrib.postgres.search import SearchQuery, SearchVector, TrigramWordSimilarity
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Exists, FloatField, OuterRef, Q
+from django.db.models.functions import Cast, Greatest
+from django.utils import timezone
+
+from . import geo
+from .models import GroupMembership, Route, RouteStop, Trip
+from .pagination import (
+    akeyset_page, aranked_page, decode_cursor, decode_rank_cursor, encode_score_cursor,
+)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE     = 100
+
+DEFAULT_NEAR_RADIUS_KM = 10
+MAX_NEAR_RADIUS_KM     = 200
+
+
+class SearchParamError(ValueError):
+    pass
+
+
+# ── Params ────────────────────────────────────────────────────────────────────
+
+def _parse(params, name, cast):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise SearchParamError(f'Invalid value for {name}')
+
+
+def _flag(value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def parse_search_params(params, cursor_decoder=decode_cursor):
+    limit = _parse(params, 'limit', int) or DEFAULT_PAGE_SIZE
+    return {
+        'q':            (params.get('q') or '').strip(),
+        'destination':  (params.get('destination') or '').strip(),
+        'origin':       (params.get('origin') or '').strip(),
+        'start_from':   _parse(params, 'start_from', date.fromisoformat),
+        'start_to':     _parse(params, 'start_to', date.fromisoformat),
+        'min_price':    _parse(params, 'min_price', int),
+        'max_price':    _parse(params, 'max_price', int),
+        'min_seats':    _parse(params, 'min_seats', int),
+        'open_only':    _parse(params, 'open', _flag) or False,
+        'complete':     _parse(params, 'complete', _flag) is not False,
+        'cursor':       _parse(params, 'cursor', cursor_decoder),
+        'limit':        max(1, min(limit, MAX_PAGE_SIZE)),
+    }
+
+
+# ── Queries ───────────────────────────────────────────────────────────────────
+
+def base_queryset(user):
+    """Trips not owned by ``user`` with everything the result row needs joined in."""
+    is_joined = GroupMembership.objects.filter(group_id=OuterRef('group_info__id'), user=user)
+    return (Trip.objects.exclude(user=user)
+            .select_related('user__details', 'vehicle_details', 'route',
+                            'payment_info', 'seat_info', 'group_info')
+            .annotate(is_joined=Exists(is_joined))
+            .order_by('-created_at', '-id'))
+
+
+def filtered_queryset(user, p):
+    qs = base_queryset(user)
+    if p['complete']:
+        qs = qs.filter(payment_info__isnull=False, route__isnull=False)
+    if p['destination']:
+        qs = qs.filter(destination__icontains=p['destination'])
+    if p['origin']:
+        qs = qs.filter(route__start_location__icontains=p['origin'])
+    if p['start_from']:
+        qs = qs.filter(start_date__gte=p['start_from'])
+    if p['start_to']:
+        qs = qs.filter(start_date__lte=p['start_to'])
+    if p['min_price'] is not None:
+        qs = qs.filter(payment_info__price_per_head__gte=p['min_price'])
+    if p['max_price'] is not None:
+        qs = qs.filter(payment_info__price_per_head__lte=p['max_price'])
+    if p['min_seats'] is not None:
+        qs = qs.filter(seat_info__available_seats__gte=p['min_seats'])
+    if p['open_only']:
+        qs = qs.filter(payment_info__booking_deadline__gt=timezone.now())
+    return qs
+
+
+def _text_matches(model, field, q):
+    # Each side is an OR of two predicates on one column, so Postgres can
+    # answer it from that column's trigram and tsvector GIN indexes.
+    query = SearchQuery(q, config='simple', search_type='websearch')
+    return (model.objects
+            .annotate(document=SearchVector(field, config='simple'))
+            .filter(Q(**{f'{field}__trigram_word_similar': q}) | Q(document=query)))
+
+
+def text_queryset(user, p):
+    """
+    Trips whose destination or origin matches ``p['q']`` fuzzily (so "Munar"
+    finds "Munnar") or by whole words, annotated with a ``rank`` in [0, 1]:
+    the better trigram word similarity of the two fields. The similarity is
+    a float4; it is cast to float8 so that the rank a cursor carries back
+    compares equal to the row it came from.
+    """
+    q          = p['q']
+    by_dest    = _text_matches(Trip, 'destination', q).values('id')
+    by_origin  = _text_matches(Route, 'start_location', q).values('trip_id')
+    return (filtered_queryset(user, p)
+            .filter(id__in=by_dest.union(by_origin))
+            .annotate(rank=Cast(Greatest(TrigramWordSimilarity(q, 'destination'),
+                                         TrigramWordSimilarity(q, 'route__start_location')),
+                                FloatField())))
+
+
+# ── Rows ──────────────────────────────────────────────────────────────────────
+
+def _related(obj, name):
+    # Reverse one-to-ones raise instead of returning None when missing.
+    try:
+        return getattr(obj, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def trip_row(trip):
+    route   = _related(trip, 'route')
+    vehicle = _related(trip, 'vehicle_details')
+    payment = _related(trip, 'payment_info')
+    group   = _related(trip, 'group_info')
+    details = _related(trip.user, 'details')
+
+    start_str, start_location = 'Date not set', 'Unknown'
+    if route:
+        start_location = route.start_location
+        if route.start_datetime:
+            start_str = route.start_datetime.strftime('%d %b, %I:%M %p')
+        elif trip.start_date:
+            start_str = trip.start_date.strftime('%d %b')
+
+    max_capacity, people_already = trip.passengers, 0
+    if group:
+        people_already = max(0, group.members_count - 1)
+
+    return {
+        'id': trip.id, 'destination': trip.destination, 'start_date': start_str,
+        'vehicle': vehicle.vehicle_model if vehicle else trip.vehicle,
+        'people_needed': max(0, max_capacity - people_already),
+        'max_capacity': max_capacity, 'people_already': people_already,
+        'price': f"₹{payment.price_per_head}" if payment else '₹0',
+        'driver_name': details.name if details else (trip.user.first_name or trip.user.username),
+        'user_id': trip.user_id, 'from': start_location, 'is_joined': trip.is_joined,
+    }
+
+
+async def acompat_results(user):
+    """The original unpaginated list, built from a single query."""
+    qs = base_queryset(user).filter(payment_info__isnull=False, route__isnull=False)
+    return [trip_row(trip) async for trip in qs]
+
+
+async def asearch_page(user, params):
+    p = parse_search_params(params)
+    trips, next_cursor = await akeyset_page(filtered_queryset(user, p), p['cursor'], p['limit'])
+    return {
+        'results':     [trip_row(trip) for trip in trips],
+        'next_cursor': next_cursor,
+    }
+
+
+async def atext_search_page(user, params):
+    p = parse_search_params(params, cursor_decoder=decode_rank_cursor)
+    if not p['q']:
+        raise SearchParamError('q is required')
+    trips, next_cursor = await aranked_page(text_queryset(user, p), p['cursor'], p['limit'])
+    return {
+        'results':     [dict(trip_row(trip), rank=round(trip.rank, 4)) for trip in trips],
+        'next_cursor': next_cursor,
+    }
+
+
+# ── Nearby ────────────────────────────────────────────────────────────────────
+
+def _in_cells(field, cells):
+    match = Q()
+    for cell in cells:
+        match |= Q(**{f'{field}__startswith': cell})
+    return match
+
+
+def parse_near_params(params):
+    lat, lng = _parse(params, 'lat', float), _parse(params, 'lng', float)
+    if lat is None or lng is None:
+        raise SearchParamError('lat and lng are required')
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise SearchParamError('lat or lng is out of range')
+    radius = _parse(params, 'radius_km', float) or DEFAULT_NEAR_RADIUS_KM
+    if not 0 < radius <= MAX_NEAR_RADIUS_KM:
+        raise SearchParamError(f'radius_km must be between 0 and {MAX_NEAR_RADIUS_KM}')
+    return {'lat': lat, 'lng': lng, 'radius_km': radius, 'via': _parse(params, 'via', _flag) or False}
+
+
+def _point_scans(near):
+    """Querysets of ``(trip_id, lat, lng)`` for the route points that may lie within the radius."""
+    cells = geo.cells_for_radius(near['lat'], near['lng'], near['radius_km'])
+    scans = [Route.objects.filter(_in_cells('origin_geohash', cells))
+             .values_list('trip_id', 'origin_lat', 'origin_lng')]
+    if near['via']:
+        scans.append(RouteStop.objects.filter(_in_cells('geohash', cells))
+                     .values_list('trip_id', 'lat', 'lng'))
+    return scans
+
+
+def _rank_points(near, points, after):
+    if not points:
+        return []
+    trip_ids, lats, lngs = zip(*points)
+    distances = geo.haversine_km(near['lat'], near['lng'], lats, lngs)
+    ranked    = sorted((distance, trip_id)
+                       for trip_id, distance in geo.nearest_per_key(trip_ids, distances).items()
+                       if distance <= near['radius_km'])
+    if after is not None:
+        ranked = [entry for entry in ranked if entry > after]
+    return ranked
+
+
+async def anearby_trip_distances(user, p, near, after=None, count=None):
+    """
+    ``[(distance_km, trip_id), ...]`` nearest first for trips leaving within
+    ``radius_km`` of the point, or, with ``via``, whose origin or any stop is.
+    Starts after the ``(distance_km, trip_id)`` pair ``after`` and stops once
+    ``count`` trips are found.
+
+    The geohash scan and distance cut run on the route tables alone. The
+    search filters are then checked by id, nearest first, only for as many
+    trips as the page needs.
+    """
+    points = [point for scan in _point_scans(near) async for point in scan]
+    ranked = _rank_points(near, points, after)
+
+    found, chunk = [], max(4 * (count or 0), 200)
+    candidates   = filtered_queryset(user, p).order_by()
+    for start in range(0, len(ranked), chunk):
+        batch   = ranked[start:start + chunk]
+        allowed = {trip_id async for trip_id in candidates.filter(
+            id__in=[trip_id for _, trip_id in batch]).values_list('id', flat=True)}
+        found  += [entry for entry in batch if entry[1] in allowed]
+        if count is not None and len(found) >= count:
+            return found[:count]
+    return found
+
+
+async def anear_page(user, params):
+    p    = parse_search_params(params, cursor_decoder=decode_rank_cursor)
+    near = parse_near_params(params)
+    ranked = await anearby_trip_distances(user, p, near, after=p['cursor'], count=p['limit'] + 1)
+    page   = ranked[:p['limit']]
+    by_id  = await base_queryset(user).ain_bulk([trip_id for _, trip_id in page])
+    next_cursor = encode_score_cursor(*page[-1]) if len(ranked) > p['limit'] else None
+    return {
+        'results':     [dict(trip_row(by_id[trip_id]), distance_km=round(distance, 2))
+                        for distance, trip_id in page if trip_id in by_id],
+        'next_cursor': next_cursor,
+    }
@@ -7,7 +7,9 @@ urlpatterns = [
     path('login/',                        views.login_view),
     path('profile/',                      views.user_profile),
     path('profile/<int:user_id>/',        views.other_user_profile),
+    path('profile/<int:user_id>/posts/',  views.user_posts),
     path('follow/<int:user_id>/',         views.follow_user),
+    path('feed/',                         views.home_feed),
 
     # OTP
     path('otp/send/',                     views.send_otp),
@@ -18,11 +20,15 @@ urlpatterns = [
     path('savetrip/route/',               views.save_route),
     path('savetrip/payment/',             views.save_payment),
     path('savetrip/contact/',             views.save_contact),
+    path('trips/publish/',                views.publish_trip),
 
     # Data Retrieval & Interaction
     path('savetrip/my-trips/',            views.get_user_trips),
     path('trips/search/',                 views.search_trips),
+    path('trips/autocomplete/',           views.autocomplete_destinations),
     path('trips/join/confirm/',           views.confirm_join),
+    path('trips/join/hold/',              views.hold_join),
+    path('trips/join/release/',           views.release_join),
 
     path('trips/completed/',              views.get_completed_trips),
 
@@ -32,4 +38,8 @@ urlpatterns = [
 
     path('posts/create/',                 views.create_post),
     path('posts/<int:post_id>/',          views.delete_post, name='delete_post'),
+
+    # Internal
+    path('internal/stats/',               views.internal_stats),
+    path('internal/metrics/',             views.internal_metrics),
 ]
\ No newline at end of file
@@ -1,46 +1,47 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+import hmac
+from functools import partial
+from adrf.decorators import api_view as async_api_view
+from asgiref.sync import sync_to_async
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 import jwt
-from jwt import PyJWKClient
-from datetime import timedelta
-from django.db import IntegrityError
+from django.db import IntegrityError, InterfaceError, OperationalError, transaction
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
-from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
 from django.conf import settings
-import random
+from django.http import HttpResponse
 from .models import (
     Trip, Route, Vehicle, PaymentDetails,
-    ContactDetails, GroupDetails, UserDetails, SeatAvailability,
-    Post, Follower,
+    ContactDetails, GroupDetails, GroupMembership, UserDetails, SeatAvailability,
+    Post, Follower, TripRegistration,
 )
 from .serializers import (
     UserProfileSerializer, OtherUserProfileSerializer,
     TripSerializer, RouteSerializer, VehicleSerializer,
     PaymentDetailsSerializer, ContactDetailsSerializer, GroupDetailsSerializer,
+    TripPublishSerializer, registered_trips, trip_summary,
 )
 from datetime import date
 from .models import CompletedTrip
+from .supabase_auth import get_verifier
+from . import (
+    autocomplete, counters, db_pool, db_router, feed, group_cache, otp_store, outbox, profile_cache,
+    query_metrics, reservations, throttling, trip_search,
+)
+from .db_router import read_from_replica
+from .pagination import InvalidCursor, akeyset_page, decode_cursor, keyset_page
 from django.db import connection
 
-SUPABASE_JWKS_URL = 'https://tqmrytzypqsuxjwdrihh.supabase.co/auth/v1/.well-known/jwks.json'
 OTP_EXPIRY_SECONDS = 600  # 10 minutes
 
 
 def _verify_supabase_token(access_token: str) -> dict:
     try:
-        jwks_client = PyJWKClient(SUPABASE_JWKS_URL)
-        signing_key = jwks_client.get_signing_key_from_jwt(access_token)
-        decoded = jwt.decode(
-            access_token,
-            signing_key.key,
-            algorithms=["ES256", "RS256", "HS256"],
-            options={"verify_aud": False},
-            leeway=timedelta(seconds=60),
-        )
+        decoded = get_verifier().verify(access_token)
         print(f"✅ JWT verified. User: {decoded.get('sub')}")
         return decoded
     except Exception as e:
@@ -96,10 +97,13 @@ def _get_or_fix_user_details(user, supabase_uid, email, name):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([throttling.OTPSendIPThrottle, throttling.OTPSendUserThrottle,
+                   throttling.OTPSendEmailThrottle])
 def send_otp(request):
     """
-    Generates a 6-digit OTP, stores it in cache for 10 minutes,
-    and sends it to the provided email via Gmail SMTP.
+    Generates a 6-digit OTP, stores its hash for 10 minutes,
+    and queues the email in the outbox; dispatch_outbox sends it.
+    Each email may only be sent a few codes in a short time.
     """
     email = request.data.get('email', '').strip()
     if not email or '@' not in email:
@@ -107,28 +111,32 @@ def send_otp(request):
                         status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        otp       = str(random.randint(100000, 999999))
-        cache_key = f'otp_email_{email}'
-
-        # Store in cache — auto-deletes after OTP_EXPIRY_SECONDS
-        cache.set(cache_key, otp, timeout=OTP_EXPIRY_SECONDS)
-
-        send_mail(
-            subject='Your TripShare Verification Code',
-            message=(
-                f'Your verification code is: {otp}\n\n'
-                f'This code is valid for 10 minutes.\n'
-                f'Do not share this code with anyone.'
-            ),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
-        )
-
-        print(f"✅ OTP sent to {email}")
+        otp = otp_store.generate_code()
+
+        # Code and email commit together, or neither does
+        with transaction.atomic():
+            otp_store.get_store().issue(email, otp, ttl=OTP_EXPIRY_SECONDS)
+            outbox.enqueue(
+                to_email=email,
+                subject='Your TripShare Verification Code',
+                body=(
+                    f'Your verification code is: {otp}\n\n'
+                    f'This code is valid for 10 minutes.\n'
+                    f'Do not share this code with anyone.'
+                ),
+            )
+
+        print(f"✅ OTP queued for {email}")
         return Response({'message': f'OTP sent to {email}'},
                         status=status.HTTP_200_OK)
 
+    except otp_store.ResendLimited as e:
+        print(f"⚠️ OTP resend limited for {email}")
+        return Response({'error': 'Too many OTP requests. Try again later.',
+                         'retry_after': e.retry_after},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS,
+                        headers={'Retry-After': str(e.retry_after)})
+
     except Exception as e:
         print(f"❌ OTP send failed: {e}")
         return Response({'error': f'Failed to send OTP: {str(e)}'},
@@ -139,8 +147,8 @@ def send_otp(request):
 @permission_classes([IsAuthenticated])
 def verify_otp(request):
     """
-    Verifies the OTP entered by the user against what's stored in cache.
-    Deletes from cache immediately on success.
+    Verifies the OTP entered by the user against the stored hash.
+    A code is single-use and allows OTP_MAX_ATTEMPTS guesses.
     """
     email = request.data.get('email', '').strip()
     otp   = request.data.get('otp', '').strip()
@@ -149,19 +157,19 @@ def verify_otp(request):
         return Response({'error': 'Email and OTP are required'},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    cache_key   = f'otp_email_{email}'
-    stored_otp  = cache.get(cache_key)
-
-    if stored_otp is None:
+    try:
+        otp_store.get_store().verify(email, otp)
+    except otp_store.OTPNotFound:
         return Response({'verified': False, 'error': 'OTP expired or not sent'},
                         status=status.HTTP_400_BAD_REQUEST)
-
-    if stored_otp != otp:
-        return Response({'verified': False, 'error': 'Incorrect OTP'},
+    except otp_store.OTPMismatch as e:
+        return Response({'verified': False, 'error': 'Incorrect OTP',
+                         'attempts_left': e.attempts_left},
                         status=status.HTTP_400_BAD_REQUEST)
+    except otp_store.TooManyAttempts:
+        return Response({'verified': False, 'error': 'Too many attempts. Request a new OTP.'},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS)
 
-    # ✅ Correct — delete immediately so it can't be reused
-    cache.delete(cache_key)
     print(f"✅ OTP verified for {email}")
     return Response({'verified': True}, status=status.HTTP_200_OK)
 
@@ -170,6 +178,7 @@ def verify_otp(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([throttling.SignupIPThrottle])
 def signup(request):
     access_token = request.data.get('access_token')
     first_name   = request.data.get('first_name', '')
@@ -211,6 +220,7 @@ def signup(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([throttling.LoginIPThrottle])
 def login_view(request):
     access_token = request.data.get('access_token')
 
@@ -255,44 +265,111 @@ def login_view(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
-    serializer = UserProfileSerializer(request.user)
-    return Response(serializer.data)
+    data = profile_cache.get_or_build(
+        request.user.id, 'self', lambda: UserProfileSerializer(request.user).data)
+    return Response(data)
+
+
+PROFILE_POSTS_PAGE_SIZE = 30
+
+
+def _post_row(post):
+    return {
+        'id': post.id,
+        'image_url': post.image_url,
+        'caption': post.caption,
+        'created_at': post.created_at,
+        'trip': {
+            'id': post.trip.id,
+            'destination': post.trip.destination,
+            'start_date': post.trip.start_date,
+            'end_date': post.trip.end_date
+        } if post.trip else None
+    }
 
 
-@api_view(['GET'])
+def _profile_posts(user_id):
+    return Post.objects.filter(user_id=user_id).select_related('trip')
+
+
+def _profile_posts_page(user_id, params):
+    cursor = params.get('cursor')
+    posts, next_cursor = keyset_page(
+        _profile_posts(user_id), decode_cursor(cursor) if cursor else None,
+        PROFILE_POSTS_PAGE_SIZE)
+    return [_post_row(post) for post in posts], next_cursor
+
+
+async def _aprofile_posts_page(user_id, params):
+    cursor = params.get('cursor')
+    posts, next_cursor = await akeyset_page(
+        _profile_posts(user_id), decode_cursor(cursor) if cursor else None,
+        PROFILE_POSTS_PAGE_SIZE)
+    return [_post_row(post) for post in posts], next_cursor
+
+
+async def _aprofile_posts_all(user_id):
+    return [_post_row(post) async for post in
+            _profile_posts(user_id).order_by('-created_at', '-id')]
+
+
+async def _aregistered_trips(user_id):
+    return [trip_summary(trip) async for trip in registered_trips(user_id)]
+
+
+async def _aother_user_body(user_id, posts_mode):
+    target_user = await User.objects.select_related('stats').aget(id=user_id)
+    trips       = await _aregistered_trips(user_id)
+
+    if not hasattr(target_user, 'stats'):
+        await sync_to_async(counters.get_stats)(target_user)
+    data = OtherUserProfileSerializer(target_user, context={'trips': trips}).data
+    if posts_mode == 'page':
+        data['posts'], data['posts_next_cursor'] = await _aprofile_posts_page(user_id, {})
+    elif posts_mode != 'none':
+        data['posts'] = await _aprofile_posts_all(user_id)
+    return data
+
+
+@read_from_replica
+@async_api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def other_user_profile(request, user_id):
+async def other_user_profile(request, user_id):
+    """
+    ``?posts=page`` returns the first page of posts with ``posts_next_cursor``
+    (continue with ``profile/<id>/posts/``), ``?posts=none`` only the header.
+    Without it every post is returned, as before.
+    """
     try:
-        target_user = User.objects.get(id=user_id)
-        is_following = Follower.objects.filter(
-            follower=request.user, following=target_user).exists()
-        serializer = OtherUserProfileSerializer(target_user)
-        data = serializer.data
-        
-        # Get posts with trip details
-        posts = Post.objects.filter(user=target_user).select_related('trip').order_by('-created_at')
-        posts_data = []
-        for post in posts:
-            post_data = {
-                'id': post.id,
-                'image_url': post.image_url,
-                'caption': post.caption,
-                'created_at': post.created_at,
-                'trip': {
-                    'id': post.trip.id,
-                    'destination': post.trip.destination,
-                    'start_date': post.trip.start_date,
-                    'end_date': post.trip.end_date
-                } if post.trip else None
-            }
-            posts_data.append(post_data)
-        
-        data['posts'] = posts_data
-        data['is_following'] = is_following
-        data['is_own_profile'] = (request.user.id == target_user.id)
+        posts_mode = request.query_params.get('posts')
+        # Part of the cache key, so only the known modes; anything else means all
+        if posts_mode not in ('page', 'none'):
+            posts_mode = 'all'
+
+        # The cached body is shared by every viewer; viewer fields go on top
+        data = await profile_cache.aget_or_build(user_id, f'other:{posts_mode}',
+                                                 partial(_aother_user_body, user_id, posts_mode))
+        data['is_following']   = await Follower.objects.filter(
+            follower=request.user, following_id=user_id).aexists()
+        data['is_own_profile'] = (request.user.id == user_id)
         return Response(data, status=status.HTTP_200_OK)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    except (OperationalError, InterfaceError):
+        raise   # read_from_replica retries on the primary
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_posts(request, user_id):
+    try:
+        results, next_cursor = _profile_posts_page(user_id, request.query_params)
+        return Response({'results': results, 'next_cursor': next_cursor},
+                        status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -305,10 +382,20 @@ def follow_user(request, user_id):
         if target_user == request.user:
             return Response({'error': 'Cannot follow yourself'},
                             status=status.HTTP_400_BAD_REQUEST)
-        follow, created = Follower.objects.get_or_create(
-            follower=request.user, following=target_user)
+        with transaction.atomic():
+            follow, created = Follower.objects.get_or_create(
+                follower=request.user, following=target_user)
+            if created:
+                counters.bump(request.user.id, following_count=1)
+                counters.bump(target_user.id, follower_count=1)
+                feed.on_follow(request.user.id, target_user.id)
+            else:
+                deleted, _ = Follower.objects.filter(id=follow.id).delete()
+                if deleted:
+                    counters.bump(request.user.id, following_count=-1)
+                    counters.bump(target_user.id, follower_count=-1)
+                    feed.on_unfollow(request.user.id, target_user.id)
         if not created:
-            follow.delete()
             return Response({'following': False, 'message': 'Unfollowed'},
                             status=status.HTTP_200_OK)
         return Response({'following': True, 'message': 'Followed'},
@@ -319,35 +406,46 @@ def follow_user(request, user_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-# ── GROUP ─────────────────────────────────────────────────────────────────────
+# ── FEED ──────────────────────────────────────────────────────────────────────
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_group_details(request, group_id):
+def home_feed(request):
+    """Posts from followed users, newest first. Page with ``?cursor=<next_cursor>``."""
     try:
-        group   = GroupDetails.objects.get(id=group_id)
-        members = []
-        for uid in group.members_list:
-            try:
-                user        = User.objects.get(id=uid)
-                user_detail = getattr(user, 'details', None)
-                members.append({
-                    'user_id':  user.id,
-                    'name':     user_detail.name if user_detail else
-                                f"{user.first_name} {user.last_name}".strip() or user.username,
-                    'email':    user.email,
-                    'is_admin': user.id == group.admin.id,
-                })
-            except User.DoesNotExist:
-                pass
-        return Response({
-            'group_id':   group.id,
-            'group_name': group.group_name,
-            'admin_id':   group.admin.id,
-            'members':    members,
-        }, status=status.HTTP_200_OK)
+        cursor = request.query_params.get('cursor')
+        limit  = min(int(request.query_params.get('limit', 20)), 100)
+        posts, next_cursor = feed.read_feed(
+            request.user.id, before=int(cursor) if cursor else None, limit=limit)
+    except ValueError:
+        return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    for post in posts:
+        row         = _post_row(post)
+        author      = post.user
+        details     = getattr(author, 'details', None)
+        row['user'] = {
+            'id':   author.id,
+            'name': details.name if details else
+                    f"{author.first_name} {author.last_name}".strip() or author.username,
+        }
+        results.append(row)
+    return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+
+
+# ── GROUP ─────────────────────────────────────────────────────────────────────
+
+@read_from_replica
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def get_group_details(request, group_id):
+    try:
+        return Response(await group_cache.aget_group_payload(group_id), status=status.HTTP_200_OK)
     except GroupDetails.DoesNotExist:
         return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+    except (OperationalError, InterfaceError):
+        raise   # read_from_replica retries on the primary
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -357,7 +455,7 @@ def get_group_details(request, group_id):
 def rename_group(request, group_id):
     try:
         group = GroupDetails.objects.get(id=group_id)
-        if group.admin != request.user:
+        if group.admin_id != request.user.id:
             return Response({'error': 'Only admin can rename the group'},
                             status=status.HTTP_403_FORBIDDEN)
         new_name = request.data.get('group_name', '').strip()
@@ -375,23 +473,85 @@ def rename_group(request, group_id):
 
 # ── TRIP FLOW ─────────────────────────────────────────────────────────────────
 
+def _object(data, name):
+    """``data[name]``, or ``{}`` when missing or null. Raises ``ValueError`` when it is not an object."""
+    value = data.get(name)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f'{name} must be an object')
+    return value
+
+
+def _route_data(data):
+    return {
+        'start_location': data.get('start_location'),
+        'stops': data.get('stops', []), 'start_datetime': data.get('start_datetime'),
+        'end_datetime': data.get('end_datetime'),
+        'origin_lat': data.get('origin_lat'), 'origin_lng': data.get('origin_lng'),
+    }
+
+
+def _vehicle_data(data):
+    return {
+        'vehicle_number': data.get('vehicle_number'),
+        'vehicle_model': data.get('vehicle_model'),
+    }
+
+
+def _payment_data(data):
+    payment_method = data.get('payment_method')
+    details_map    = _object(data, 'payment_details')
+    return {
+        'price_per_head': data.get('price_per_head'),
+        'booking_deadline': data.get('booking_deadline'),
+        'cancel_deadline':  data.get('cancel_deadline'),
+        'payment_method':   payment_method,
+        'upi_id':     details_map.get('upi_id')     if payment_method == 'UPI'  else None,
+        'account_no': details_map.get('account_no') if payment_method == 'Bank' else None,
+        'ifsc':       details_map.get('ifsc')        if payment_method == 'Bank' else None,
+    }
+
+
+def _contact_data(data):
+    return {
+        'phone': data.get('phone'), 'email': data.get('email'),
+        'is_phone_verified': data.get('is_phone_verified', False),
+        'is_email_verified': data.get('is_email_verified', False),
+    }
+
+
+def _register_owner(trip, user):
+    SeatAvailability.objects.create(
+        trip=trip, total_seats=trip.passengers, available_seats=trip.passengers)
+    TripRegistration.objects.create(user=user, trip=trip)
+    counters.bump(user.id, trip_count=1)
+
+
+def _create_group(trip, user):
+    group = GroupDetails.objects.create(
+        trip=trip, admin=user, group_name=f"Trip to {trip.destination}", members_count=1)
+    GroupMembership.objects.create(group=group, user=user, role=GroupMembership.ROLE_ADMIN)
+    return group
+
+
+def _get_or_create_group(trip, user):
+    """The trip's group, created with ``user`` as admin if it has none; get_or_create survives a race."""
+    group, created = GroupDetails.objects.get_or_create(
+        trip=trip, defaults={'admin': user, 'group_name': f"Trip to {trip.destination}", 'members_count': 1})
+    if created:
+        GroupMembership.objects.create(group=group, user=user, role=GroupMembership.ROLE_ADMIN)
+    return group
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def save_trip(request):
     serializer = TripSerializer(data=request.data)
     if serializer.is_valid():
-        trip = serializer.save(user=request.user)
-        SeatAvailability.objects.create(
-            trip=trip, total_seats=trip.passengers, available_seats=trip.passengers)
-        try:
-            user_details = request.user.details
-            current_list = list(user_details.trips_registered)
-            if trip.id not in current_list:
-                current_list.append(trip.id)
-                user_details.trips_registered = current_list
-                user_details.save()
-        except UserDetails.DoesNotExist:
-            pass
+        with transaction.atomic():
+            trip = serializer.save(user=request.user)
+            _register_owner(trip, request.user)
         return Response({'message': 'Trip saved successfully', 'trip_id': trip.id},
                         status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -407,15 +567,8 @@ def save_route(request):
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    route_data = {
-        'trip': trip.id, 'start_location': data.get('start_location'),
-        'stops': data.get('stops', []), 'start_datetime': data.get('start_datetime'),
-        'end_datetime': data.get('end_datetime'),
-    }
-    vehicle_data = {
-        'trip': trip.id, 'vehicle_number': data.get('vehicle_number'),
-        'vehicle_model': data.get('vehicle_model'),
-    }
+    route_data   = {'trip': trip.id, **_route_data(data)}
+    vehicle_data = {'trip': trip.id, **_vehicle_data(data)}
 
     try:
         route_serializer = RouteSerializer(Route.objects.get(trip=trip), data=route_data)
@@ -428,8 +581,9 @@ def save_route(request):
         vehicle_serializer = VehicleSerializer(data=vehicle_data)
 
     if route_serializer.is_valid() and vehicle_serializer.is_valid():
-        route_serializer.save()
-        vehicle_serializer.save()
+        with transaction.atomic():
+            route_serializer.save()
+            vehicle_serializer.save()
         return Response({'message': 'Route and Vehicle details saved!'}, status=status.HTTP_200_OK)
     return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -437,24 +591,17 @@ def save_route(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def save_payment(request):
-    data           = request.data
-    trip_id        = data.get('trip_id')
-    payment_method = data.get('payment_method')
-    details_map    = data.get('payment_details', {})
+    data    = request.data
+    trip_id = data.get('trip_id')
     try:
         trip = Trip.objects.get(id=trip_id, user=request.user)
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    payment_data = {
-        'trip': trip.id, 'price_per_head': data.get('price_per_head'),
-        'booking_deadline': data.get('booking_deadline'),
-        'cancel_deadline':  data.get('cancel_deadline'),
-        'payment_method':   payment_method,
-        'upi_id':     details_map.get('upi_id')     if payment_method == 'UPI'  else None,
-        'account_no': details_map.get('account_no') if payment_method == 'Bank' else None,
-        'ifsc':       details_map.get('ifsc')        if payment_method == 'Bank' else None,
-    }
+    try:
+        payment_data = {'trip': trip.id, **_payment_data(data)}
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     try:
         serializer = PaymentDetailsSerializer(
             PaymentDetails.objects.get(trip=trip), data=payment_data)
@@ -477,11 +624,7 @@ def save_contact(request):
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    contact_data = {
-        'trip': trip.id, 'phone': data.get('phone'), 'email': data.get('email'),
-        'is_phone_verified': data.get('is_phone_verified', False),
-        'is_email_verified': data.get('is_email_verified', False),
-    }
+    contact_data = {'trip': trip.id, **_contact_data(data)}
     try:
         contact_serializer = ContactDetailsSerializer(
             ContactDetails.objects.get(trip=trip), data=contact_data)
@@ -489,33 +632,69 @@ def save_contact(request):
         contact_serializer = ContactDetailsSerializer(data=contact_data)
 
     if contact_serializer.is_valid():
-        contact_serializer.save()
-        group, _ = GroupDetails.objects.get_or_create(
-            trip=trip,
-            defaults={
-                'admin': request.user, 'group_name': f"Trip to {trip.destination}",
-                'members_count': 1, 'members_list': [request.user.id],
-            },
-        )
+        with transaction.atomic():
+            contact_serializer.save()
+            group = _get_or_create_group(trip, request.user)
         return Response({'message': 'Trip Published & Group Created!',
                          'group_id': group.id, 'group_name': group.group_name},
                         status=status.HTTP_201_CREATED)
     return Response(contact_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def get_user_trips(request):
+def publish_trip(request):
+    """
+    The whole savetrip/ wizard in one request. The body has ``trip``,
+    ``route``, ``payment`` and ``contact`` objects shaped like the step
+    payloads (without ``trip_id``). Everything is validated before anything
+    is written, then all rows are inserted in one transaction.
+    """
+    data = request.data
+    try:
+        route      = _object(data, 'route')
+        serializer = TripPublishSerializer(data={
+            'trip':    _object(data, 'trip'),
+            'route':   _route_data(route),
+            'vehicle': _vehicle_data(route),
+            'payment': _payment_data(_object(data, 'payment')),
+            'contact': _contact_data(_object(data, 'contact')),
+        })
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    v, user = serializer.validated_data, request.user
+    with transaction.atomic():
+        trip = Trip.objects.create(user=user, **v['trip'])
+        _register_owner(trip, user)
+        RouteSerializer.sync_stops(Route.objects.create(trip=trip, **v['route']))
+        Vehicle.objects.create(trip=trip, **v['vehicle'])
+        PaymentDetails.objects.create(trip=trip, **v['payment'])
+        ContactDetails.objects.create(trip=trip, **v['contact'])
+        # The trip is new, so nothing can have created its group yet
+        group = _create_group(trip, user)
+    return Response({'message': 'Trip Published & Group Created!', 'trip_id': trip.id,
+                     'group_id': group.id, 'group_name': group.group_name},
+                    status=status.HTTP_201_CREATED)
+
+
+@read_from_replica
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def get_user_trips(request):
     try:
-        user_details   = request.user.details
-        registered_ids = user_details.trips_registered
-        if not registered_ids:
-            return Response([], status=status.HTTP_200_OK)
+        registrations = (TripRegistration.objects
+                         .filter(user=request.user, status__in=TripRegistration.ACTIVE_STATUSES)
+                         .select_related('trip__group_info')
+                         .order_by('trip_id'))
         results = []
-        for trip in Trip.objects.filter(id__in=registered_ids):
+        async for registration in registrations:
+            trip = registration.trip
             try:
                 group = trip.group_info
-                group_name, group_id, admin_id = group.group_name, group.id, group.admin.id
+                group_name, group_id, admin_id = group.group_name, group.id, group.admin_id
             except GroupDetails.DoesNotExist:
                 group_name, group_id, admin_id = f"Trip to {trip.destination}", None, None
             results.append({
@@ -524,188 +703,207 @@ def get_user_trips(request):
                 'last_message': f"Trip to {trip.destination} is confirmed!", 'time': 'Just now',
             })
         return Response(results, status=status.HTTP_200_OK)
-    except UserDetails.DoesNotExist:
-        return Response({'error': 'User details not found'}, status=status.HTTP_404_NOT_FOUND)
+    except (OperationalError, InterfaceError):
+        raise   # read_from_replica retries on the primary
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@read_from_replica
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def search_trips(request):
+    """
+    ``?mode=search`` filters in SQL and returns a cursor-paginated page:
+    destination, origin, start_from, start_to, min_price, max_price,
+    min_seats, open, complete, cursor, limit.
+    ``?mode=text&q=...`` takes the same filters and ranks fuzzy matches on
+    destination and origin, best first.
+    ``?mode=near&lat=..&lng=..[&radius_km=10][&via=1]`` takes the same
+    filters and returns trips leaving (or, with via, passing) nearby,
+    nearest first.
+    Without a mode the original full-list response is returned.
+    """
+    try:
+        mode = request.query_params.get('mode')
+        if mode == 'search':
+            return Response(await trip_search.asearch_page(request.user, request.query_params),
+                            status=status.HTTP_200_OK)
+        if mode == 'text':
+            return Response(await trip_search.atext_search_page(request.user, request.query_params),
+                            status=status.HTTP_200_OK)
+        if mode == 'near':
+            return Response(await trip_search.anear_page(request.user, request.query_params),
+                            status=status.HTTP_200_OK)
+        return Response(await trip_search.acompat_results(request.user), status=status.HTTP_200_OK)
+    except trip_search.SearchParamError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except (OperationalError, InterfaceError):
+        raise   # read_from_replica retries on the primary
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def search_trips(request):
+def autocomplete_destinations(request):
+    prefix = (request.query_params.get('q') or '').strip()
     try:
-        trips = Trip.objects.exclude(user=request.user).order_by('-created_at').select_related(
-            'vehicle_details', 'route', 'payment_info', 'seat_info')
-        results = []
-        for trip in trips:
-            if not hasattr(trip, 'payment_info') or not hasattr(trip, 'route'):
-                continue
-            start_str, start_location = 'Date not set', 'Unknown'
-            if hasattr(trip, 'route'):
-                start_location = trip.route.start_location
-                if trip.route.start_datetime:
-                    start_str = trip.route.start_datetime.strftime('%d %b, %I:%M %p')
-                elif trip.start_date:
-                    start_str = trip.start_date.strftime('%d %b')
-            vehicle_name = (trip.vehicle_details.vehicle_model
-                            if hasattr(trip, 'vehicle_details') else trip.vehicle)
-            price        = (f"₹{trip.payment_info.price_per_head}"
-                            if hasattr(trip, 'payment_info') else '₹0')
-            max_capacity, is_registered, people_already = trip.passengers, False, 0
-            try:
-                group          = GroupDetails.objects.get(trip=trip)
-                people_already = max(0, group.members_count - 1)
-                if request.user.id in group.members_list:
-                    is_registered = True
-            except GroupDetails.DoesNotExist:
-                pass
-            driver_name = (trip.user.details.name if hasattr(trip.user, 'details')
-                           else (trip.user.first_name or trip.user.username))
-            results.append({
-                'id': trip.id, 'destination': trip.destination, 'start_date': start_str,
-                'vehicle': vehicle_name, 'people_needed': max(0, max_capacity - people_already),
-                'max_capacity': max_capacity, 'people_already': people_already,
-                'price': price, 'driver_name': driver_name, 'user_id': trip.user.id,
-                'from': start_location, 'is_joined': is_registered,
-            })
-        return Response(results, status=status.HTTP_200_OK)
+        limit = min(int(request.query_params.get('limit', autocomplete.MAX_SUGGESTIONS)),
+                    autocomplete.MAX_SUGGESTIONS)
+    except ValueError:
+        return Response({'error': 'Invalid value for limit'}, status=status.HTTP_400_BAD_REQUEST)
+    if not prefix:
+        return Response({'results': []}, status=status.HTTP_200_OK)
+    try:
+        return Response({'results': autocomplete.get_index().suggest(prefix, limit)},
+                        status=status.HTTP_200_OK)
     except Exception as e:
+        print(f"❌ Autocomplete error: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _reservation_error_response(error):
+    if isinstance(error, reservations.AlreadyJoined):
+        return Response({'error': 'You have already joined this trip.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if isinstance(error, reservations.TripFull):
+        return Response({'error': 'Trip is full!'}, status=status.HTTP_400_BAD_REQUEST)
+    if isinstance(error, reservations.SeatInfoMissing):
+        return Response({'error': 'Seat information missing.'},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({'error': 'No seat hold found'}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def confirm_join(request):
     trip_id = request.data.get('trip_id')
     try:
-        trip, user = Trip.objects.get(id=trip_id), request.user
-        if user.details.trips_registered and trip.id in user.details.trips_registered:
-            return Response({'error': 'You have already joined this trip.'},
-                            status=status.HTTP_400_BAD_REQUEST)
-        try:
-            seat_info = SeatAvailability.objects.get(trip=trip)
-        except SeatAvailability.DoesNotExist:
-            return Response({'error': 'Seat information missing.'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        if seat_info.available_seats <= 0:
-            return Response({'error': 'Trip is full!'}, status=status.HTTP_400_BAD_REQUEST)
-
-        seat_info.available_seats -= 1
-        seat_info.save()
-
-        group           = GroupDetails.objects.get(trip=trip)
-        current_members = list(group.members_list)
-        if user.id not in current_members:
-            current_members.append(user.id)
-            group.members_list  = current_members
-            group.members_count = len(current_members)
-            group.save()
-
-        user_details  = user.details
-        current_trips = list(user_details.trips_registered)
-        current_trips.append(trip.id)
-        user_details.trips_registered = current_trips
-        user_details.save()
-
+        trip  = Trip.objects.get(id=trip_id)
+        group = reservations.join_trip(request.user, trip)
         return Response({
             'message': 'Joined successfully!', 'group_id': group.id,
-            'group_name': group.group_name, 'admin_id': group.admin.id,
+            'group_name': group.group_name, 'admin_id': group.admin_id,
             'destination': trip.destination,
         }, status=status.HTTP_200_OK)
+    except reservations.ReservationError as e:
+        return _reservation_error_response(e)
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
     except GroupDetails.DoesNotExist:
         return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_completed_trips(request):
-
-    try:
-        user = request.user
-        today = date.today()
 
-        # SAFELY GET USER DETAILS
-        try:
-            user_details = user.details
-        except UserDetails.DoesNotExist:
-            return Response([], status=200)
 
-        trip_ids = user_details.trips_registered or []
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def hold_join(request):
+    """
+    Reserves a seat while the user finishes paying. Confirm with
+    ``trips/join/confirm/`` before ``held_until`` or the seat is released.
+    """
+    trip_id = request.data.get('trip_id')
+    try:
+        trip = Trip.objects.get(id=trip_id)
+        hold = reservations.hold_seat(request.user, trip)
+        return Response({'message': 'Seat held', 'trip_id': trip.id,
+                         'held_until': hold.held_until}, status=status.HTTP_200_OK)
+    except reservations.ReservationError as e:
+        return _reservation_error_response(e)
+    except Trip.DoesNotExist:
+        return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        trips = Trip.objects.filter(id__in=trip_ids)
 
-        completed_list = []
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def release_join(request):
+    trip_id = request.data.get('trip_id')
+    try:
+        trip = Trip.objects.get(id=trip_id)
+        reservations.release_hold(request.user, trip)
+        return Response({'message': 'Seat released'}, status=status.HTTP_200_OK)
+    except reservations.ReservationError as e:
+        return _reservation_error_response(e)
+    except Trip.DoesNotExist:
+        return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        for trip in trips:
 
-            if trip.end_date:
+@read_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_completed_trips(request):
+    # Rows are written by the materialize_completed_trips job; the end_date
+    # filter also hides rows the old per-GET upsert made for future trips.
+    completed_list = list(
+        CompletedTrip.objects
+        .filter(user=request.user, end_date__lt=date.today())
+        .order_by('-end_date', '-id')
+        .values('trip_id', 'destination', 'start_date', 'end_date')
+    )
+    return Response(completed_list, status=200)
 
-                CompletedTrip.objects.get_or_create(
-                    user=user,
-                    trip=trip,
-                    defaults={
-                        "destination": trip.destination,
-                        "start_date": trip.start_date,
-                        "end_date": trip.end_date,
-                    }
-                )
+_image_url_validator = URLValidator(schemes=['http', 'https'])
 
-                completed_list.append({
-                    "trip_id": trip.id,
-                    "destination": trip.destination,
-                    "start_date": trip.start_date,
-                    "end_date": trip.end_date
-                })
 
-        return Response(completed_list, status=200)
+def _validate_album(images):
+    """Returns a list of errors; empty when every image URL is acceptable."""
+    if not isinstance(images, list):
+        return ['images must be a list of URLs']
+    cap = settings.POST_MAX_IMAGES_PER_REQUEST
+    if len(images) > cap:
+        return [f'At most {cap} images per request']
+    errors = []
+    for index, url in enumerate(images):
+        try:
+            _image_url_validator(url if isinstance(url, str) else '')
+        except ValidationError:
+            errors.append(f'images[{index}] is not a valid URL')
+    return errors
 
-    except Exception as e:
-        print("COMPLETED TRIPS ERROR:", e)
-        return Response({"error": str(e)}, status=500)
 
-from .models import Post, Trip
+def _create_album(user, trip, images):
+    """Inserts one post per image in a single statement; returns them in request order."""
+    with transaction.atomic():
+        posts = Post.objects.bulk_create(
+            [Post(user=user, trip=trip, image_url=url) for url in images])
+        if posts:
+            counters.bump(user.id, post_count=len(posts))
+            feed.fan_out_on_commit(user.id, [post.id for post in posts])
+    return posts
 
-from .models import Post, Trip
 
 @api_view(['POST'])
 def create_post(request):
     user = request.user
     trip_id = request.data.get("trip_id")
     images = request.data.get("images", [])
-    destination = request.data.get("destination")  # Get destination
-    start_date = request.data.get("start_date")    # Get start date
-    end_date = request.data.get("end_date")        # Get end date
+
+    errors = _validate_album(images)
+    if errors:
+        return Response({"error": errors[0], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
         trip = Trip.objects.get(id=trip_id)
     except Trip.DoesNotExist:
         return Response({"error": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    created_posts = []
-    for img in images:
-        post = Post.objects.create(
-            user=user,
-            trip=trip,
-            image_url=img,
-            # You can add these fields to your Post model if you want to store them directly
-        )
-        created_posts.append({
-            "id": post.id,
-            "image_url": post.image_url,
-            "trip": {
-                "id": trip.id,
-                "destination": trip.destination,
-                "start_date": trip.start_date,
-                "end_date": trip.end_date
-            }
-        })
-
+    posts = _create_album(user, trip, images)
+    trip_data = {
+        "id": trip.id,
+        "destination": trip.destination,
+        "start_date": trip.start_date,
+        "end_date": trip.end_date
+    }
     return Response({
         "message": "Post created",
-        "posts": created_posts
+        "post_ids": [post.id for post in posts],
+        "posts": [{"id": post.id, "image_url": post.image_url, "trip": trip_data} for post in posts]
     }, status=status.HTTP_200_OK)
 
 @api_view(['DELETE'])
@@ -718,9 +916,41 @@ def delete_post(request, post_id):
         # You might want to extract the file path from the image_url
         # and delete it from Supabase here
         
-        post.delete()
+        with transaction.atomic():
+            deleted, _ = Post.objects.filter(id=post.id).delete()
+            if deleted:
+                counters.bump(request.user.id, post_count=-1)
         return Response({"message": "Post deleted successfully"}, status=status.HTTP_200_OK)
     except Post.DoesNotExist:
         return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ── INTERNAL ──────────────────────────────────────────────────────────────────
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def internal_stats(request):
+    """Cache and counter stats for tuning; staff only."""
+    return Response({
+        'supabase_verifier': get_verifier().stats(),
+        'profile_cache':     profile_cache.stats(),
+        'autocomplete':      autocomplete.get_index().stats(),
+        'throttles':         throttling.stats(),
+        'db':                db_pool.stats(),
+        'db_router':         db_router.stats(),
+        'queries':           query_metrics.stats(),
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def internal_metrics(request):
+    """Query metrics in Prometheus format; staff, or ``Authorization: Bearer <METRICS_TOKEN>``."""
+    bearer  = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+    allowed = request.user.is_staff or (
+        settings.METRICS_TOKEN and hmac.compare_digest(bearer, settings.METRICS_TOKEN))
+    if not allowed:
+        return Response({'error': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(query_metrics.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
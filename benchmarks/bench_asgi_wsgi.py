@@ -0,0 +1,196 @@
+"""
+Throughput and latency of the read endpoints served by gunicorn (WSGI)
+against uvicorn (ASGI), side by side, at several connection counts.
+
+Starts each server on a local port and then drives it from an asyncio load
+generator. Every connection sends keep-alive GET requests back to back for
+``--seconds``, cycling through trips/search/, profile/<id>/, groups/<id>/
+and savetrip/my-trips/ as an existing user. Needs gunicorn and uvicorn, and
+runs against the database configured by mybackend.settings, which must
+already hold some trips, groups and posts:
+
+    python benchmarks/bench_asgi_wsgi.py --concurrency 100 500 1000 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from api.models import GroupMembership, Post  # noqa: E402
+
+
+def server_commands(workers, threads, port):
+    bind = f'127.0.0.1:{port}'
+    return {
+        'wsgi': ['gunicorn', 'mybackend.wsgi:application', '--bind', bind,
+                 '--workers', str(workers), '--threads', str(threads), '--backlog', '4096',
+                 '--log-level', 'warning'],
+        'asgi': ['uvicorn', 'mybackend.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+                 '--workers', str(workers), '--backlog', '4096', '--log-level', 'warning',
+                 '--no-access-log'],
+    }
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not listen on port {port}')
+
+
+def pick_paths():
+    """A user with a group, a profile to view, and the paths to cycle through."""
+    membership = GroupMembership.objects.select_related('user').order_by('id').first()
+    post       = Post.objects.exclude(user=membership.user).order_by('id').first() if membership else None
+    if membership is None or post is None:
+        raise SystemExit('Seed some trips, groups and posts first.')
+    token, _ = Token.objects.get_or_create(user=membership.user)
+    return token.key, [
+        '/api/trips/search/?mode=search&limit=20',
+        f'/api/profile/{post.user_id}/?posts=page',
+        f'/api/groups/{membership.group_id}/',
+        '/api/savetrip/my-trips/',
+    ]
+
+
+# ── Load generator ────────────────────────────────────────────────────────────
+
+async def read_response(reader):
+    """Reads one HTTP/1.1 response; returns ``(status, keep_alive)``."""
+    head    = await reader.readuntil(b'\r\n\r\n')
+    lines   = head.decode('latin-1').split('\r\n')
+    status  = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection') != 'close'
+
+
+async def client(port, requests, deadline, latencies, errors):
+    reader = writer = None
+    n = 0
+    while time.monotonic() < deadline:
+        request = requests[n % len(requests)]
+        n += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            errors['connection'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+        if status >= 400:
+            errors[f'http_{status}'] = errors.get(f'http_{status}', 0) + 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, token, paths, concurrency, seconds):
+    requests = [(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                 f'Authorization: Token {token}\r\nConnection: keep-alive\r\n\r\n').encode()
+                for path in paths]
+    latencies, errors = [], {'connection': 0}
+    started  = time.monotonic()
+    deadline = started + seconds
+    await asyncio.gather(*(client(port, requests[i % len(requests):] + requests[:i % len(requests)],
+                                  deadline, latencies, errors)
+                           for i in range(concurrency)))
+    return latencies, time.monotonic() - started, errors
+
+
+def summarize(latencies, elapsed, errors):
+    if not latencies:
+        return {'rps': 0.0, 'p50': None, 'p99': None, 'errors': errors}
+    latencies.sort()
+    return {
+        'rps':    len(latencies) / elapsed,
+        'p50':    statistics.median(latencies),
+        'p99':    latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'errors': {kind: count for kind, count in errors.items() if count},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--warmup-seconds', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--wsgi-threads', type=int, default=1,
+                        help='gunicorn threads per worker (default: 1, plain sync workers)')
+    parser.add_argument('--servers', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    token, paths = pick_paths()
+    env = dict(os.environ, DEBUG='False')
+    results = []
+    for name in args.servers:
+        command = server_commands(args.workers, args.wsgi_threads, args.port)[name]
+        process = subprocess.Popen(command, cwd=ROOT, env=env)
+        try:
+            wait_for_port(args.port, process)
+            asyncio.run(drive(args.port, token, paths, 10, args.warmup_seconds))
+            for concurrency in args.concurrency:
+                summary = summarize(*asyncio.run(drive(args.port, token, paths, concurrency, args.seconds)))
+                results.append((name, concurrency, summary))
+                print(f'{name} c={concurrency}: {summary["rps"]:,.0f} req/s', flush=True)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(f'\n{args.workers} worker(s) per server, {args.seconds:.0f}s per run, paths: {", ".join(paths)}')
+    print(f"{'server':<6} {'conns':>6} {'req/s':>9} {'p50':>10} {'p99':>10}  errors")
+    for name, concurrency, s in results:
+        p50 = f"{s['p50']:.1f}ms" if s['p50'] is not None else '-'
+        p99 = f"{s['p99']:.1f}ms" if s['p99'] is not None else '-'
+        print(f"{name:<6} {concurrency:>6} {s['rps']:>9,.0f} {p50:>10} {p99:>10}  {s['errors'] or ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Album upload cost: the old one-INSERT-per-image loop against the batched
+create_post path, at 1, 10 and 50 images per request.
+
+Runs against the database configured by mybackend.settings (run
+``manage.py migrate`` first):
+
+    python benchmarks/bench_create_post.py --requests 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from django.db import transaction  # noqa: E402
+
+from api import counters, feed  # noqa: E402
+from api.models import Post, Trip  # noqa: E402
+from api.views import _create_album  # noqa: E402
+
+
+def legacy_create(user, trip, images):
+    # What create_post did before: one INSERT and one round trip per image,
+    # rebuilding the trip dict each time, with the same counter/feed upkeep.
+    created_posts = []
+    with transaction.atomic():
+        for img in images:
+            post = Post.objects.create(user=user, trip=trip, image_url=img)
+            created_posts.append({
+                "id": post.id, "image_url": post.image_url,
+                "trip": {"id": trip.id, "destination": trip.destination,
+                         "start_date": trip.start_date, "end_date": trip.end_date},
+            })
+        counters.bump(user.id, post_count=len(created_posts))
+        feed.fan_out_on_commit(user.id, [post["id"] for post in created_posts])
+    return created_posts
+
+
+def run(fn, user, trip, size, requests):
+    images  = [f'https://cdn.example.com/bench/{i}.jpg' for i in range(size)]
+    samples = []
+    fn(user, trip, images)  # warm up
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn(user, trip, images)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(samples), statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50])
+    args = parser.parse_args()
+
+    user = User.objects.create(username=f'bench-posts-{uuid.uuid4().hex[:8]}')
+    trip = Trip.objects.create(user=user, destination='Bench', start_date=date.today(),
+                               end_date=date.today(), vehicle='car', passengers=4)
+    try:
+        print(f"{'images':>6}  {'loop p50':>10}  {'bulk p50':>10}  {'speedup':>7}")
+        for size in args.sizes:
+            _, loop_p50 = run(legacy_create, user, trip, size, args.requests)
+            _, bulk_p50 = run(_create_album, user, trip, size, args.requests)
+            print(f"{size:>6}  {loop_p50:>8.2f}ms  {bulk_p50:>8.2f}ms  {loop_p50 / bulk_p50:>6.1f}x")
+    finally:
+        user.delete()
+
+
+if __name__ == '__main__':
+    main()
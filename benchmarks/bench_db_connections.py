@@ -0,0 +1,133 @@
+"""
+Per-request database latency with no connection reuse, persistent
+connections (CONN_MAX_AGE) and the psycopg pool (DB_CONN_MODE=pool).
+
+Each simulated request goes through Django's request lifecycle: it sends
+request_started, runs the two small queries every authenticated request
+makes (a token lookup and a row by primary key), then sends
+request_finished, which closes or returns the connection as the selected
+mode dictates. ``--style wsgi`` runs requests on long-lived worker threads
+the way gunicorn does. ``--style asgi`` runs every request on a fresh
+thread, as Django's ASGI handler does. Runs against the Postgres
+configured by mybackend.settings:
+
+    python benchmarks/bench_db_connections.py --requests 2000 --threads 8 --style wsgi asgi
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.signals import request_finished, request_started  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from api.models import Trip  # noqa: E402
+
+MODES = ['none', 'persistent', 'pool']
+
+
+def configure(mode, pool_size):
+    """Points every connection created from now on at ``mode``; existing ones are closed first."""
+    connections.close_all()
+    if connection.pool is not None:
+        connection.close_pool()
+    settings_dict = connections.settings['default']
+    settings_dict['OPTIONS'].pop('pool', None)
+    settings_dict['CONN_MAX_AGE'] = 600 if mode == 'persistent' else 0
+    if mode == 'pool':
+        settings_dict['OPTIONS']['pool'] = {'name': 'bench', 'min_size': pool_size, 'max_size': pool_size}
+
+
+def one_request(token_key, trip_id):
+    request_started.send(sender=None)
+    try:
+        Token.objects.filter(key=token_key).select_related('user').first()
+        Trip.objects.filter(pk=trip_id).first()
+    finally:
+        request_finished.send(sender=None)
+
+
+def run(style, requests, threads, token_key, trip_id):
+    samples = []
+    lock    = threading.Lock()
+
+    def timed():
+        start = time.perf_counter()
+        one_request(token_key, trip_id)
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            samples.append(elapsed)
+
+    def wsgi_worker(count):
+        for _ in range(count):
+            timed()
+        connections.close_all()
+
+    started = time.perf_counter()
+    if style == 'wsgi':
+        workers = [threading.Thread(target=wsgi_worker, args=(len(range(i, requests, threads)),))
+                   for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    else:
+        # ``threads`` requests in flight at a time, each on a thread of its own
+        for batch in range(0, requests, threads):
+            workers = [threading.Thread(target=timed) for _ in range(min(threads, requests - batch))]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+    return samples, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--style', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    token = Token.objects.select_related('user').first()
+    trip  = Trip.objects.order_by('id').first()
+    if token is None or trip is None:
+        raise SystemExit('Needs at least one auth token and one trip in the database.')
+    token_key, trip_id = token.key, trip.id
+
+    print(f'{args.requests} requests, {args.threads} thread(s), pool of {args.pool_size}')
+    print(f"{'style':<6} {'mode':<11} {'p50':>9} {'p99':>9} {'req/s':>8}  pool")
+    try:
+        for style in args.style:
+            for mode in args.modes:
+                configure(mode, args.pool_size)
+                run(style, args.threads, args.threads, token_key, trip_id)   # warm-up
+                samples, elapsed = run(style, args.requests, args.threads, token_key, trip_id)
+                samples.sort()
+                p50, p99 = statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+                pool  = connection.pool
+                extra = ''
+                if pool is not None:
+                    pool_stats = pool.get_stats()
+                    extra = (f"{pool_stats.get('connections_num', 0)} opened, "
+                             f"{pool_stats.get('requests_waiting', 0)} waiting")
+                print(f'{style:<6} {mode:<11} {p50:>7.2f}ms {p99:>7.2f}ms {len(samples) / elapsed:>8,.0f}  {extra}')
+    finally:
+        configure('none', args.pool_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+"""
+Latency percentiles and query counts for every endpoint in api/urls.py,
+against a seeded dataset, checked against per-endpoint query budgets.
+
+Requests go through the whole middleware stack in-process with Django's test
+client. Supabase JWT verification uses a local JWKS server and a key
+generated per run. Outgoing mail goes to a local SMTP sink, so nothing
+leaves the machine. Write endpoints really write; run this against a
+database you can throw away. ``--reseed`` empties it (manage.py flush) and
+fills it with ``manage.py seed`` at the chosen size.
+
+The results are written to a JSON file (``--output``). ``--baseline``
+prints them next to an earlier file. The exit status is 1 when an endpoint
+goes over its query budget or answers with an unexpected status.
+
+Needs aiosmtpd (pip install aiosmtpd):
+
+    python benchmarks/bench_endpoints.py --size 1k --reseed --requests 200
+    python benchmarks/bench_endpoints.py --size 1k --baseline benchmarks/results/endpoints-1k-20261018-120000.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import jwt  # noqa: E402
+from aiosmtpd.controller import Controller  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from jwt.algorithms import ECAlgorithm  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.throttling import SimpleRateThrottle  # noqa: E402
+
+from api import otp_store, outbox, query_metrics, supabase_auth  # noqa: E402
+from api.models import (  # noqa: E402
+    Follower, GroupDetails, GroupMembership, Post, SeatAvailability, Trip, TripRegistration,
+)
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+# Most statements one request to the endpoint may run. Set to what each ran on
+# the 1k dataset, so a new query anywhere (an N+1, a missed select_related)
+# fails the run; raise one deliberately when a change needs the extra query.
+# None marks an endpoint whose count has not been measured yet: it is reported
+# but not checked.
+BUDGETS = {
+    'signup':           11,
+    'login':            4,
+    'profile':          1,
+    'other-profile':    2,
+    'user-posts':       2,
+    'follow':           12,
+    'feed':             5,
+    'otp-send':         9,
+    'otp-verify':       3,
+    'savetrip-trip':    5,
+    'savetrip-route':   12,
+    'savetrip-payment': 6,
+    'savetrip-contact': 11,
+    'publish':          13,
+    'my-trips':         2,
+    'search':           2,
+    'search-text':      None,   # needs pg_trgm, which the 1k run lacked
+    'search-near':      4,
+    'autocomplete':     1,
+    'join-hold':        6,
+    'join-release':     4,
+    'join-confirm':     19,
+    'completed':        2,
+    'group-details':    1,
+    'group-rename':     3,
+    'create-post':      8,
+    'delete-post':      6,
+    'internal-stats':   1,
+    'internal-metrics': 1,
+}
+
+
+# ── Local stand-ins ───────────────────────────────────────────────────────────
+
+def serve_jwks():
+    """A JWKS endpoint for a fresh ES256 key; returns ``(url, private_key, server)``."""
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    jwk = json.loads(ECAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({'kid': 'bench-key', 'alg': 'ES256', 'use': 'sig'})
+    body = json.dumps({'keys': [jwk]}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/jwks.json', private_key, server
+
+
+def supabase_token(private_key, sub):
+    now = datetime.now(timezone.utc)
+    return jwt.encode(
+        {'sub': sub, 'email': f'{sub}@example.com', 'iat': now, 'exp': now + timedelta(hours=1),
+         'user_metadata': {'full_name': 'Bench Traveller'}},
+        private_key, algorithm='ES256', headers={'kid': 'bench-key'},
+    )
+
+
+class Sink:
+    def __init__(self):
+        self.messages = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return '250 OK'
+
+
+# ── Fixture ───────────────────────────────────────────────────────────────────
+
+class Fixture:
+    """Users, tokens and rows the endpoints act on, created fresh for each run."""
+
+    def __init__(self, run_id, iterations, private_key):
+        self.run_id      = run_id
+        self.private_key = private_key
+        group = GroupDetails.objects.order_by('-members_count', 'id').select_related('trip').first()
+        other = None
+        if group is not None:
+            other = Post.objects.exclude(user_id=group.admin_id).order_by('id').first()
+        if other is None:
+            raise SystemExit('Seed some data first (manage.py seed, or --reseed).')
+        self.viewer   = User.objects.get(id=group.admin_id)
+        self.group_id = group.id
+        self.other_id = other.user_id
+        self.any_trip = group.trip_id
+        self.origin   = Trip.objects.filter(route__isnull=False).values_list(
+            'route__origin_lat', 'route__origin_lng').first()
+        self.token    = Token.objects.get_or_create(user=self.viewer)[0].key
+
+        staff = User.objects.create(username=f'bench-{run_id}-staff', is_staff=True)
+        self.staff_token = Token.objects.create(user=staff).key
+
+        # Every join request needs a user who has not joined yet
+        joiners = User.objects.bulk_create(
+            [User(username=f'bench-{run_id}-joiner-{n}') for n in range(2 * iterations)])
+        tokens  = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in joiners])
+        self.joiner_tokens = [token.key for token in tokens]
+
+        today = date.today()
+        self.join_trip = Trip.objects.create(
+            user=self.viewer, destination='Bench Ridge', start_date=today + timedelta(days=30),
+            end_date=today + timedelta(days=32), vehicle='van', passengers=len(joiners) + 1)
+        SeatAvailability.objects.create(trip=self.join_trip, total_seats=len(joiners) + 1,
+                                        available_seats=len(joiners) + 1)
+        TripRegistration.objects.create(user=self.viewer, trip=self.join_trip)
+        join_group = GroupDetails.objects.create(trip=self.join_trip, admin=self.viewer, group_name='Bench Ridge')
+        GroupMembership.objects.create(group=join_group, user=self.viewer, role=GroupMembership.ROLE_ADMIN)
+
+        self.login_token = supabase_token(private_key, f'bench-{run_id}-login')
+        self.trip_ids, self.post_ids = [], []
+
+    def auth(self, token=None):
+        return {'Authorization': f'Token {token or self.token}'}
+
+
+def trip_payload():
+    start = date.today() + timedelta(days=45)
+    return {'destination': 'Munnar', 'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=3)).isoformat(), 'vehicle': 'car', 'passengers': 4}
+
+
+def route_payload():
+    return {'start_location': 'Kochi', 'origin_lat': 9.93, 'origin_lng': 76.27,
+            'stops': [{'name': 'Kothamangalam', 'lat': 10.06, 'lng': 76.63}],
+            'vehicle_number': 'KL-07-1234', 'vehicle_model': 'Innova'}
+
+
+def payment_payload():
+    deadline = datetime.now(timezone.utc) + timedelta(days=40)
+    return {'price_per_head': 2500, 'booking_deadline': deadline.isoformat(),
+            'cancel_deadline': (deadline - timedelta(days=2)).isoformat(),
+            'payment_method': 'UPI', 'payment_details': {'upi_id': 'bench@upi'}}
+
+
+def contact_payload():
+    return {'phone': '9876543210', 'email': 'bench@example.com', 'is_email_verified': True}
+
+
+def endpoints(fx, iterations):
+    """``(name, expected statuses, request builder)``; the builder returns ``(method, path, body, headers)``."""
+    lat, lng = fx.origin or (9.93, 76.27)
+
+    def otp_verify(i):
+        email = f'bench-{fx.run_id}-verify-{i}@example.com'
+        otp_store.get_store().issue(email, '424242', ttl=600)
+        return 'post', '/api/otp/verify/', {'email': email, 'otp': '424242'}, fx.auth()
+
+    return [
+        ('signup', {201}, lambda i: ('post', '/api/signup/', {
+            'access_token': supabase_token(fx.private_key, f'bench-{fx.run_id}-signup-{i}')}, {})),
+        ('login', {200}, lambda i: ('post', '/api/login/', {'access_token': fx.login_token}, {})),
+        ('profile', {200}, lambda i: ('get', '/api/profile/', None, fx.auth())),
+        ('other-profile', {200}, lambda i: ('get', f'/api/profile/{fx.other_id}/?posts=page', None, fx.auth())),
+        ('user-posts', {200}, lambda i: ('get', f'/api/profile/{fx.other_id}/posts/', None, fx.auth())),
+        ('follow', {200}, lambda i: ('post', f'/api/follow/{fx.other_id}/', None, fx.auth())),
+        ('feed', {200}, lambda i: ('get', '/api/feed/', None, fx.auth())),
+        ('otp-send', {200}, lambda i: ('post', '/api/otp/send/', {
+            'email': f'bench-{fx.run_id}-send-{i}@example.com'}, fx.auth())),
+        ('otp-verify', {200}, otp_verify),
+        ('savetrip-trip', {201}, lambda i: ('post', '/api/savetrip/trip/', trip_payload(), fx.auth())),
+        ('savetrip-route', {200}, lambda i: ('post', '/api/savetrip/route/', {
+            'trip_id': fx.trip_ids[i], **route_payload()}, fx.auth())),
+        ('savetrip-payment', {201}, lambda i: ('post', '/api/savetrip/payment/', {
+            'trip_id': fx.trip_ids[i], **payment_payload()}, fx.auth())),
+        ('savetrip-contact', {201}, lambda i: ('post', '/api/savetrip/contact/', {
+            'trip_id': fx.trip_ids[i], **contact_payload()}, fx.auth())),
+        ('publish', {201}, lambda i: ('post', '/api/trips/publish/', {
+            'trip': trip_payload(), 'route': route_payload(), 'payment': payment_payload(),
+            'contact': contact_payload()}, fx.auth())),
+        ('my-trips', {200}, lambda i: ('get', '/api/savetrip/my-trips/', None, fx.auth())),
+        ('search', {200}, lambda i: ('get', '/api/trips/search/?mode=search&limit=20', None, fx.auth())),
+        ('search-text', {200}, lambda i: ('get', '/api/trips/search/?mode=text&q=hill+station', None, fx.auth())),
+        ('search-near', {200}, lambda i: ('get', f'/api/trips/search/?mode=near&lat={lat}&lng={lng}&radius_km=50',
+                                          None, fx.auth())),
+        ('autocomplete', {200}, lambda i: ('get', '/api/trips/autocomplete/?q=Mu', None, fx.auth())),
+        ('join-hold', {200}, lambda i: ('post', '/api/trips/join/hold/', {'trip_id': fx.join_trip.id},
+                                        fx.auth(fx.joiner_tokens[i]))),
+        ('join-release', {200}, lambda i: ('post', '/api/trips/join/release/', {'trip_id': fx.join_trip.id},
+                                           fx.auth(fx.joiner_tokens[i]))),
+        ('join-confirm', {200}, lambda i: ('post', '/api/trips/join/confirm/', {'trip_id': fx.join_trip.id},
+                                           fx.auth(fx.joiner_tokens[iterations + i]))),
+        ('completed', {200}, lambda i: ('get', '/api/trips/completed/', None, fx.auth())),
+        ('group-details', {200}, lambda i: ('get', f'/api/groups/{fx.group_id}/', None, fx.auth())),
+        ('group-rename', {200}, lambda i: ('patch', f'/api/groups/{fx.group_id}/rename/', {
+            'group_name': f'Bench group {i}'}, fx.auth())),
+        ('create-post', {200}, lambda i: ('post', '/api/posts/create/', {
+            'trip_id': fx.any_trip, 'images': [f'https://img.example.com/bench/{fx.run_id}/{i}.jpg']}, fx.auth())),
+        ('delete-post', {200, 204}, lambda i: ('delete', f'/api/posts/{fx.post_ids[i]}/', None, fx.auth())),
+        ('internal-stats', {200}, lambda i: ('get', '/api/internal/stats/', None, fx.auth(fx.staff_token))),
+        ('internal-metrics', {200}, lambda i: ('get', '/api/internal/metrics/', None, fx.auth(fx.staff_token))),
+    ]
+
+
+def remember(fx, name, response):
+    """Keeps the ids later steps need: savetrip steps reuse trips, delete-post removes created posts."""
+    if name == 'savetrip-trip' and response.status_code == 201:
+        fx.trip_ids.append(response.json()['trip_id'])
+    elif name == 'create-post' and response.status_code == 200:
+        fx.post_ids.extend(response.json()['post_ids'])
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, round(q / 100 * len(samples) + 0.5) - 1))]
+
+
+def run_endpoint(client, fx, name, expected, build, warmup, requests):
+    latencies, queries, statuses = [], [], {}
+    for i in range(warmup + requests):
+        method, path, body, headers = build(i)
+        kwargs = {'headers': headers}
+        if body is not None:
+            kwargs.update(data=json.dumps(body), content_type='application/json')
+        with query_metrics.capture() as collector, contextlib.redirect_stdout(io.StringIO()):
+            start    = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            elapsed  = (time.perf_counter() - start) * 1000
+        remember(fx, name, response)
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(collector.count)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    budget = BUDGETS.get(name)
+    return {
+        'p50_ms':         round(percentile(latencies, 50), 3),
+        'p90_ms':         round(percentile(latencies, 90), 3),
+        'p99_ms':         round(percentile(latencies, 99), 3),
+        'mean_ms':        round(sum(latencies) / len(latencies), 3),
+        'max_ms':         round(max(latencies), 3),
+        'queries_median': percentile(queries, 50),
+        'queries_max':    max(queries),
+        'query_budget':   budget,
+        'over_budget':    budget is not None and max(queries) > budget,
+        'statuses':       {str(code): count for code, count in sorted(statuses.items())},
+        'unexpected':     sum(count for code, count in statuses.items() if code not in expected),
+    }
+
+
+def dataset_counts():
+    return {
+        'users':     User.objects.count(),
+        'trips':     Trip.objects.count(),
+        'groups':    GroupDetails.objects.count(),
+        'posts':     Post.objects.count(),
+        'followers': Follower.objects.count(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    base = (baseline or {}).get('endpoints', {})
+    print(f"\n{'endpoint':<17} {'p50':>9} {'p90':>9} {'p99':>9} {'queries':>8} {'budget':>7}  "
+          f"{'vs baseline p50/p99' if base else ''}")
+    for name, r in results['endpoints'].items():
+        flags = ' OVER BUDGET' if r['over_budget'] else ''
+        if r['unexpected']:
+            flags += f" {r['unexpected']} unexpected status(es) {r['statuses']}"
+        delta = ''
+        if name in base:
+            old   = base[name]
+            delta = (f"{(r['p50_ms'] / old['p50_ms'] - 1) * 100:+6.1f}% "
+                     f"{(r['p99_ms'] / old['p99_ms'] - 1) * 100:+6.1f}%")
+            if r['queries_max'] != old['queries_max']:
+                delta += f" queries {old['queries_max']}→{r['queries_max']}"
+        print(f"{name:<17} {r['p50_ms']:>7.2f}ms {r['p90_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms "
+              f"{r['queries_max']:>8} {r['query_budget'] or '-':>7}  {delta}{flags}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', choices=SIZES, default='1k')
+    parser.add_argument('--reseed', action='store_true',
+                        help='flush the database and seed --size trips first')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', nargs='+', help='endpoint names to run')
+    parser.add_argument('--skip', nargs='+', default=[], help='endpoint names to leave out')
+    parser.add_argument('--output', type=Path,
+                        help='default: benchmarks/results/endpoints-<size>-<timestamp>.json')
+    parser.add_argument('--baseline', type=Path, help='earlier results file to compare against')
+    parser.add_argument('--smtp-port', type=int, default=8025, help='port for the local SMTP sink')
+    args = parser.parse_args()
+
+    if args.reseed:
+        call_command('seed', trips=SIZES[args.size], seed=args.seed, flush=True, interactive=False)
+    dataset = dataset_counts()
+    if not SIZES[args.size] * 0.9 <= dataset['trips'] <= SIZES[args.size] * 1.5:
+        print(f"⚠️ The database has {dataset['trips']} trips, not about {SIZES[args.size]}; "
+              f"use --reseed to match --size")
+
+    jwks_url, private_key, jwks_server = serve_jwks()
+    sink       = Sink()
+    smtp       = Controller(sink, hostname='127.0.0.1', port=args.smtp_port)
+    smtp.start()
+    iterations = args.warmup + args.requests
+    run_id     = uuid.uuid4().hex[:8]
+    rates      = {scope: '1000000/min' for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']}
+    overrides  = override_settings(
+        SUPABASE_JWKS_URL=jwks_url, EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='127.0.0.1', EMAIL_PORT=args.smtp_port, EMAIL_USE_TLS=False,
+        EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+    )
+
+    results = {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit':     git_commit(),
+        'size':       args.size,
+        'dataset':    dataset,
+        'requests':   args.requests,
+        'warmup':     args.warmup,
+        'database':   connection.vendor,
+        'python':     platform.python_version(),
+        'django':     django.get_version(),
+        'endpoints':  {},
+    }
+    try:
+        with overrides, mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', rates), \
+                mock.patch.object(supabase_auth, '_verifier', None):
+            # Quiet the per-request log lines; statuses are recorded instead
+            logging.disable(logging.CRITICAL)
+            fx     = Fixture(run_id, iterations, private_key)
+            client = Client()
+            client.post('/api/signup/', {'access_token': fx.login_token}, content_type='application/json')
+            for name, expected, build in endpoints(fx, iterations):
+                if (args.only and name not in args.only) or name in args.skip:
+                    continue
+                results['endpoints'][name] = run_endpoint(client, fx, name, expected, build,
+                                                          args.warmup, args.requests)
+                print(f"{name:<17} p50 {results['endpoints'][name]['p50_ms']:.2f}ms", flush=True)
+
+            started = time.perf_counter()
+            sent    = outbox.dispatch()
+            results['outbox'] = {'sent': sent['sent'], 'failed': sent['failed'], 'smtp_messages': sink.messages,
+                                 'seconds': round(time.perf_counter() - started, 3)}
+    finally:
+        logging.disable(logging.NOTSET)
+        smtp.stop()
+        jwks_server.shutdown()
+
+    output = args.output or ROOT / 'benchmarks' / 'results' / (
+        f"endpoints-{args.size}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + '\n')
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_results(results, baseline)
+    print(f"\nOutbox: {results['outbox']}\nResults written to {output}")
+
+    failed = [name for name, r in results['endpoints'].items() if r['over_budget'] or r['unexpected']]
+    if failed:
+        print(f"❌ Over budget or unexpected status: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
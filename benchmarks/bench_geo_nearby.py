@@ -0,0 +1,134 @@
+"""
+"Trips near me" latency: geohash cell scan plus vectorized haversine ranking
+against a full scan of every route's coordinates, over N seeded routes.
+
+Runs against the database configured by mybackend.settings (point the DB_*
+variables at a local Postgres and run ``manage.py migrate`` first):
+
+    python benchmarks/bench_geo_nearby.py --routes 1000000 --stops 1
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from asgiref.sync import async_to_sync  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from api import geo, trip_search  # noqa: E402
+from api.models import Route, RouteStop, Trip  # noqa: E402
+
+SEED_BATCH = 10000
+# Roughly the Indian subcontinent
+LAT_RANGE, LNG_RANGE = (8.0, 35.0), (68.0, 97.0)
+
+
+def _point(rng):
+    return rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)
+
+
+def seed(n_routes, stops_per_route, rng):
+    owner = User.objects.create(username=f'bench-geo-{uuid.uuid4().hex[:8]}')
+    today = date.today()
+    for lo in range(0, n_routes, SEED_BATCH):
+        size  = min(SEED_BATCH, n_routes - lo)
+        trips = Trip.objects.bulk_create([
+            Trip(user=owner, destination='Bench', start_date=today, end_date=today,
+                 vehicle='car', passengers=4) for _ in range(size)])
+        routes = []
+        for trip in trips:
+            lat, lng = _point(rng)
+            routes.append(Route(trip=trip, start_location='Bench', origin_lat=lat, origin_lng=lng,
+                                origin_geohash=geo.encode(lat, lng)))
+        routes = Route.objects.bulk_create(routes)
+        stops = []
+        for route in routes:
+            for position in range(stops_per_route):
+                lat, lng = _point(rng)
+                stops.append(RouteStop(trip_id=route.trip_id, position=position, lat=lat, lng=lng,
+                                       geohash=geo.encode(lat, lng)))
+        RouteStop.objects.bulk_create(stops)
+    return owner
+
+
+def full_scan(lat, lng, radius_km, via):
+    # No spatial index: pull every coordinate and rank them all.
+    points = list(Route.objects.exclude(origin_lat=None)
+                  .values_list('trip_id', 'origin_lat', 'origin_lng'))
+    if via:
+        points += list(RouteStop.objects.values_list('trip_id', 'lat', 'lng'))
+    trip_ids, lats, lngs = zip(*points)
+    nearest = geo.nearest_per_key(trip_ids, geo.haversine_km(lat, lng, lats, lngs))
+    return sorted((d, trip_id) for trip_id, d in nearest.items() if d <= radius_km)
+
+
+def timed(fn, probes, repeat):
+    samples = []
+    for _ in range(repeat):
+        for lat, lng in probes:
+            start = time.perf_counter()
+            fn(lat, lng)
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--routes', type=int, default=1_000_000)
+    parser.add_argument('--stops', type=int, default=1, help='stop points per route')
+    parser.add_argument('--radii', type=float, nargs='+', default=[5, 25, 100])
+    parser.add_argument('--probes', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=trip_search.DEFAULT_PAGE_SIZE)
+    parser.add_argument('--full-scan', action='store_true', help='also time the no-index baseline once')
+    args = parser.parse_args()
+
+    rng     = random.Random(42)
+    started = time.perf_counter()
+    owner   = seed(args.routes, args.stops, rng)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE route_details; ANALYZE route_stops; ANALYZE trip_details')
+    print(f'seeded {args.routes:,} routes ({args.stops} stop(s) each) in {time.perf_counter() - started:.1f}s')
+
+    searcher = User.objects.create(username=f'bench-geo-searcher-{uuid.uuid4().hex[:8]}')
+    params   = trip_search.parse_search_params({'complete': '0'})
+    probes   = [_point(rng) for _ in range(args.probes)]
+    try:
+        print(f"{'radius':>7}  {'via':>3}  {'in radius':>9}  {'page p50':>9}  {'page max':>9}")
+        for radius in args.radii:
+            for via in (False, True):
+                near = {'radius_km': radius, 'via': via}
+
+                def search(lat, lng, count=args.page_size + 1):
+                    return async_to_sync(trip_search.anearby_trip_distances)(
+                        searcher, params, dict(near, lat=lat, lng=lng), count=count)
+
+                in_radius  = statistics.mean(len(search(lat, lng, count=None)) for lat, lng in probes)
+                p50, worst = timed(search, probes, repeat=2)
+                print(f'{radius:>5.0f}km  {"yes" if via else "no":>3}  {in_radius:>9.1f}  '
+                      f'{p50:>7.1f}ms  {worst:>7.1f}ms')
+        if args.full_scan:
+            lat, lng = probes[0]
+            start = time.perf_counter()
+            full_scan(lat, lng, args.radii[0], via=True)
+            print(f'full scan (via): {(time.perf_counter() - start) * 1000:.0f}ms')
+    finally:
+        Trip.objects.filter(user=owner).delete()
+        owner.delete()
+        searcher.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrent joins against one trip: checks that seats are never oversold and
+reports join throughput.
+
+Runs against the database configured by mybackend.settings (point the DB_*
+variables at a local Postgres and run ``manage.py migrate`` first):
+
+    python benchmarks/bench_join_concurrency.py --seats 50 --users 400 --threads 32
+    python benchmarks/bench_join_concurrency.py --legacy   # the old read-modify-write path
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from api import reservations  # noqa: E402
+from api.models import GroupDetails, GroupMembership, SeatAvailability, Trip  # noqa: E402
+
+
+def legacy_join(user, trip):
+    # What confirm_join did before: read, decrement in Python, save.
+    seat_info = SeatAvailability.objects.get(trip=trip)
+    if seat_info.available_seats <= 0:
+        raise reservations.TripFull()
+    seat_info.available_seats -= 1
+    seat_info.save()
+    group = GroupDetails.objects.get(trip=trip)
+    GroupMembership.objects.get_or_create(group=group, user=user)
+
+
+def setup(seats, users):
+    tag   = uuid.uuid4().hex[:8]
+    owner = User.objects.create(username=f'bench-owner-{tag}')
+    trip  = Trip.objects.create(user=owner, destination='Bench', start_date=date.today(),
+                                end_date=date.today(), vehicle='bus', passengers=seats)
+    SeatAvailability.objects.create(trip=trip, total_seats=seats, available_seats=seats)
+    group = GroupDetails.objects.create(trip=trip, group_name='Bench', admin=owner)
+    GroupMembership.objects.create(group=group, user=owner, role=GroupMembership.ROLE_ADMIN)
+    joiners = User.objects.bulk_create(
+        [User(username=f'bench-{tag}-{i}') for i in range(users)])
+    return owner, trip, joiners
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seats', type=int, default=50)
+    parser.add_argument('--users', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+
+    owner, trip, joiners = setup(args.seats, args.users)
+    join    = legacy_join if args.legacy else reservations.join_trip
+    results = {'joined': 0, 'full': 0, 'error': 0}
+    lock    = threading.Lock()
+    start   = threading.Barrier(args.threads)
+
+    def worker(chunk):
+        start.wait()
+        for user in chunk:
+            try:
+                join(user, trip)
+                outcome = 'joined'
+            except reservations.TripFull:
+                outcome = 'full'
+            except Exception:
+                outcome = 'error'
+            with lock:
+                results[outcome] += 1
+        connection.close()
+
+    chunks = [joiners[i::args.threads] for i in range(args.threads)]
+    began  = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(worker, chunks))
+    elapsed = time.perf_counter() - began
+
+    seats   = SeatAvailability.objects.get(trip=trip).available_seats
+    members = GroupMembership.objects.filter(group__trip=trip).count() - 1
+    print(f"{'legacy' if args.legacy else 'atomic'}: {args.users} joins on {args.seats} seats, "
+          f"{args.threads} threads")
+    print(f"  joined={results['joined']} full={results['full']} error={results['error']}")
+    print(f"  seats left={seats} members added={members}")
+    print(f"  throughput={args.users / elapsed:,.0f} join attempts/s ({elapsed:.2f}s)")
+    oversold = members > args.seats or seats < 0 or args.seats - seats != members
+    print('  OVERSOLD / LOST UPDATES' if oversold else '  no oversell')
+
+    User.objects.filter(id__in=[u.id for u in joiners] + [owner.id]).delete()
+    sys.exit(1 if oversold and not args.legacy else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Per-login JWT verification latency with and without the process-wide JWKS
+cache, and with the verified-claims cache on top for repeated tokens.
+
+Serves a JWKS document from a local stand-in server (with optional artificial
+latency to mimic Supabase) and verifies the same kind of token the app gets
+from the mobile clients.
+
+    python benchmarks/bench_jwks_cache.py --logins 200 --latency-ms 40
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+from jwt import PyJWKClient
+from jwt.algorithms import ECAlgorithm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.supabase_auth import JWKSCache, SupabaseTokenVerifier, VerifiedClaimsCache  # noqa: E402
+
+KID = 'bench-key'
+
+
+def make_key():
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    jwk = json.loads(ECAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({'kid': KID, 'alg': 'ES256', 'use': 'sig'})
+    return private_key, {'keys': [jwk]}
+
+
+def serve_jwks(document, latency):
+    body = json.dumps(document).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        hits = 0
+
+        def do_GET(self):
+            Handler.hits += 1
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler
+
+
+def make_token(private_key):
+    now = datetime.now(timezone.utc)
+    return jwt.encode(
+        {'sub': 'bench-user', 'email': 'bench@example.com', 'iat': now,
+         'exp': now + timedelta(hours=1), 'user_metadata': {'full_name': 'Bench User'}},
+        private_key, algorithm='ES256', headers={'kid': KID},
+    )
+
+
+def verify_uncached(url, token):
+    # The pre-cache code path: a fresh PyJWKClient per login.
+    signing_key = PyJWKClient(url).get_signing_key_from_jwt(token)
+    return jwt.decode(token, signing_key.key, algorithms=["ES256", "RS256", "HS256"],
+                      options={"verify_aud": False}, leeway=timedelta(seconds=60))
+
+
+def run(label, fn, token, logins):
+    samples = []
+    for _ in range(logins):
+        start = time.perf_counter()
+        fn(token)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<10} mean={statistics.mean(samples):8.3f}ms  "
+          f"p50={statistics.median(samples):8.3f}ms  p95={p95:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=40.0,
+                        help='artificial JWKS server latency')
+    args = parser.parse_args()
+
+    private_key, document = make_key()
+    server, handler = serve_jwks(document, args.latency_ms / 1000)
+    url   = f'http://127.0.0.1:{server.server_address[1]}/auth/v1/.well-known/jwks.json'
+    token = make_token(private_key)
+
+    print(f"{args.logins} logins, JWKS latency {args.latency_ms}ms")
+    handler.hits = 0
+    run('uncached', lambda t: verify_uncached(url, t), token, args.logins)
+    print(f"{'':<10} JWKS fetches: {handler.hits}")
+
+    handler.hits = 0
+    verifier = SupabaseTokenVerifier(JWKSCache(url))
+    run('cached', verifier.verify, token, args.logins)
+    print(f"{'':<10} JWKS fetches: {handler.hits}")
+
+    # Mobile clients retry with the same token; those repeats hit the claims cache.
+    verifier = SupabaseTokenVerifier(JWKSCache(url), claims_cache=VerifiedClaimsCache())
+    run('claims', verifier.verify, token, args.logins)
+    print(f"{'':<10} {verifier.stats()['claims_cache']}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Completed-trip materialization throughput: seeds N registrations on trips
+that have already ended and times the first (inserting) and second (nothing
+changed) passes of ``completed_trips.materialize``.
+
+Runs against the database configured by mybackend.settings (point the DB_*
+variables at a local Postgres and run ``manage.py migrate`` first):
+
+    python benchmarks/bench_materialize_completed.py --registrations 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from api.completed_trips import DEFAULT_BATCH_SIZE, materialize  # noqa: E402
+from api.models import CompletedTrip, Trip, TripRegistration  # noqa: E402
+
+SEED_BATCH = 10000
+
+
+def seed(registrations, per_trip):
+    tag      = uuid.uuid4().hex[:8]
+    n_trips  = max(1, registrations // per_trip)
+    ended    = date.today() - timedelta(days=30)
+    users = []
+    for lo in range(0, per_trip, SEED_BATCH):
+        users += User.objects.bulk_create(
+            [User(username=f'bench-done-{tag}-{i}') for i in range(lo, min(per_trip, lo + SEED_BATCH))])
+    trips = []
+    for lo in range(0, n_trips, SEED_BATCH):
+        trips += Trip.objects.bulk_create([
+            Trip(user=users[i % per_trip], destination=f'Bench {i % 500}', start_date=ended - timedelta(days=3),
+                 end_date=ended, vehicle='car', passengers=per_trip)
+            for i in range(lo, min(n_trips, lo + SEED_BATCH))
+        ])
+    rows = []
+    for trip in trips:
+        rows += [TripRegistration(user=user, trip=trip) for user in users]
+        if len(rows) >= SEED_BATCH:
+            TripRegistration.objects.bulk_create(rows, batch_size=SEED_BATCH)
+            rows = []
+    TripRegistration.objects.bulk_create(rows, batch_size=SEED_BATCH)
+    return users, n_trips * per_trip
+
+
+def timed(batch_size):
+    started = time.perf_counter()
+    written = materialize(batch_size=batch_size)
+    return written, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--registrations', type=int, default=1_000_000)
+    parser.add_argument('--per-trip', type=int, default=20, help='registrations per trip')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if CompletedTrip.objects.exists() or TripRegistration.objects.exists():
+        print('⚠️ Existing registrations/completed trips are included in the timings')
+
+    started = time.perf_counter()
+    users, seeded = seed(args.registrations, args.per_trip)
+    print(f'seeded {seeded:,} registrations in {time.perf_counter() - started:.1f}s')
+    try:
+        scanned = TripRegistration.objects.count()
+        print(f"{'pass':<14} {'written':>10}  {'time':>7}  {'registrations/s':>15}")
+        for label in ('insert', 'no-op upsert'):
+            written, elapsed = timed(args.batch_size)
+            print(f'{label:<14} {written:>10,}  {elapsed:>6.1f}s  {scanned / elapsed:>15,.0f}')
+    finally:
+        User.objects.filter(id__in=[user.id for user in users]).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+OTP email cost: sending inline in the request (the old send_otp) against
+queueing in the outbox, plus dispatch_outbox throughput, all against a
+local SMTP stand-in with configurable latency.
+
+Needs aiosmtpd (pip install aiosmtpd). Runs against the database configured
+by mybackend.settings (run ``manage.py migrate`` first):
+
+    python benchmarks/bench_otp_outbox.py --emails 500 --smtp-delay-ms 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from aiosmtpd.controller import Controller  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.mail import send_mail  # noqa: E402
+
+from api import outbox  # noqa: E402
+from api.models import OutboxEmail  # noqa: E402
+
+
+class SlowSink:
+    """Accepts everything, after ``delay`` seconds per connection and per message."""
+
+    def __init__(self, delay):
+        self.delay       = delay
+        self.connections = 0
+        self.messages    = 0
+        self._lock       = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.connections += 1
+        await asyncio.sleep(self.delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        with self._lock:
+            self.messages += 1
+        return '250 OK'
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--smtp-delay-ms', type=float, default=50)
+    parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=settings.OUTBOX_WORKERS)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    sink       = SlowSink(args.smtp_delay_ms / 1000)
+    controller = Controller(sink, hostname='127.0.0.1', port=args.port)
+    controller.start()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST, settings.EMAIL_PORT, settings.EMAIL_USE_TLS = '127.0.0.1', args.port, False
+    settings.EMAIL_HOST_USER = settings.EMAIL_HOST_PASSWORD = ''
+
+    domain = f'bench-{uuid.uuid4().hex[:8]}.example.com'
+    inline_n = min(args.emails, 100)
+    try:
+        inline = []
+        for i in range(inline_n):
+            start = time.perf_counter()
+            send_mail('Your TripShare Verification Code', 'Your verification code is: 123456',
+                      settings.DEFAULT_FROM_EMAIL, [f'inline{i}@{domain}'])
+            inline.append((time.perf_counter() - start) * 1000)
+
+        queued = []
+        for i in range(args.emails):
+            start = time.perf_counter()
+            outbox.enqueue(f'user{i}@{domain}', 'Your TripShare Verification Code',
+                           'Your verification code is: 123456')
+            queued.append((time.perf_counter() - start) * 1000)
+
+        connections_before = sink.connections
+        start  = time.perf_counter()
+        totals = outbox.dispatch(batch_size=args.batch_size, workers=args.workers)
+        elapsed = time.perf_counter() - start
+
+        print(f'SMTP stand-in latency: {args.smtp_delay_ms:.0f}ms per connection and per message')
+        print(f"{'in request':<18} {'p50':>9} {'p99':>9}")
+        for label, samples in ((f'send_mail x{inline_n}', inline), (f'enqueue x{args.emails}', queued)):
+            p50, p99 = percentiles(samples)
+            print(f'{label:<18} {p50:>7.2f}ms {p99:>7.2f}ms')
+        print(f"dispatch: {totals['sent']} sent, {totals['failed']} failed in {elapsed:.2f}s "
+              f"({totals['sent'] / elapsed:,.0f} emails/s) over "
+              f"{sink.connections - connections_before} SMTP connection(s), "
+              f'{args.workers} worker(s) x {args.batch_size}/batch')
+    finally:
+        controller.stop()
+        OutboxEmail.objects.filter(to_email__endswith=f'@{domain}').delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Overhead of api.query_metrics per statement and per request.
+
+First times the wrapper on its own around a no-op ``execute``, then times
+``--queries`` primary-key lookups three ways: with no wrapper on the
+connection, with the wrapper installed but the request not sampled, and
+with the request sampled. Then serves ``--requests`` GETs of
+trips/completed/ through the full middleware stack at several sample
+rates. Runs against the database configured by mybackend.settings:
+
+    python benchmarks/bench_query_metrics.py --queries 5000 --requests 1000
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from api import query_metrics  # noqa: E402
+from api.models import Trip  # noqa: E402
+
+
+def wrapper_only(calls):
+    def execute(sql, params, many, context):
+        return None
+
+    sql     = 'SELECT "trip_details"."id" FROM "trip_details" WHERE "trip_details"."id" = %s LIMIT 21'
+    results = []
+    for label, collector in [('not sampled', None), ('sampled', query_metrics._Collector())]:
+        token = query_metrics._collector.set(collector)
+        try:
+            start = time.perf_counter()
+            for _ in range(calls):
+                query_metrics._execute_wrapper(execute, sql, (1,), False, {})
+            results.append((label, (time.perf_counter() - start) * 1e9 / calls))
+        finally:
+            query_metrics._collector.reset(token)
+    return results
+
+
+def per_query(queries, trip_id):
+    connection.ensure_connection()
+    variants = [('no wrapper', False, False), ('wrapper, not sampled', True, False), ('wrapper, sampled', True, True)]
+    results  = []
+    for label, wrapped, sampled in variants:
+        if not wrapped:
+            connection.execute_wrappers.remove(query_metrics._execute_wrapper)
+        token = query_metrics._collector.set(query_metrics._Collector() if sampled else None)
+        try:
+            samples = []
+            for _ in range(queries):
+                start = time.perf_counter()
+                Trip.objects.filter(pk=trip_id).first()
+                samples.append((time.perf_counter() - start) * 1e6)
+        finally:
+            query_metrics._collector.reset(token)
+            query_metrics.install(connection)
+        results.append((label, statistics.median(samples), statistics.mean(samples)))
+    return results
+
+
+def per_request(requests, token_key, rates):
+    client = Client(HTTP_AUTHORIZATION=f'Token {token_key}')
+    results = []
+    for rate in rates:
+        with override_settings(QUERY_METRICS_SAMPLE_RATE=rate):
+            client.get('/api/trips/completed/')
+            samples = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.get('/api/trips/completed/')
+                samples.append((time.perf_counter() - start) * 1000)
+        results.append((f'sample rate {rate:g}', statistics.median(samples), statistics.mean(samples)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--rates', type=float, nargs='+', default=[0, 0.05, 1])
+    args = parser.parse_args()
+
+    trip  = Trip.objects.order_by('id').first()
+    token = Token.objects.first()
+    if trip is None or token is None:
+        raise SystemExit('Needs at least one trip and one auth token in the database.')
+    # Keep the per-request JSON lines out of the timings
+    logging.getLogger('api.query_metrics').setLevel(logging.CRITICAL)
+
+    print(f"{'wrapper alone':<24} {'per call':>9}")
+    for label, ns in wrapper_only(args.queries * 100):
+        print(f'{label:<24} {ns:>7.0f}ns')
+    print(f"\n{'per statement':<24} {'p50':>9} {'mean':>9}")
+    for label, p50, mean in per_query(args.queries, trip.id):
+        print(f'{label:<24} {p50:>7.1f}us {mean:>7.1f}us')
+    print(f"\n{'per request':<24} {'p50':>9} {'mean':>9}")
+    for label, p50, mean in per_request(args.requests, token.key, args.rates):
+        print(f'{label:<24} {p50:>7.2f}ms {mean:>7.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
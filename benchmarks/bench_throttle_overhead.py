@@ -0,0 +1,109 @@
+"""
+Per-request cost of the sliding-window throttles in api.throttling,
+against DRF's own SimpleRateThrottle, at high request rates.
+
+Each variant runs ``--requests`` throttle checks spread over ``--clients``
+client IPs from ``--threads`` threads. The rate limit is set high enough
+that nothing is rejected, so every check does the full counting work.
+Runs against the database configured by mybackend.settings (run
+``manage.py migrate`` first):
+
+    python benchmarks/bench_throttle_overhead.py --requests 20000 --threads 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.db import close_old_connections  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework.throttling import AnonRateThrottle  # noqa: E402
+
+from api import throttling  # noqa: E402
+from api.models import ThrottleCounter  # noqa: E402
+
+
+def make_variants(rate):
+    class DRFThrottle(AnonRateThrottle):
+        pass
+
+    class SlidingThrottle(throttling.IPThrottle):
+        scope = 'bench'
+
+    DRFThrottle.rate, SlidingThrottle.rate = rate, rate
+    return [
+        ('DRF SimpleRateThrottle (locmem)', DRFThrottle, None),
+        ('sliding window, CacheWindowStore (locmem)', SlidingThrottle, throttling.CacheWindowStore()),
+        ('sliding window, DBWindowStore', SlidingThrottle, throttling.DBWindowStore()),
+    ]
+
+
+def run(throttle_class, requests, clients, threads):
+    factory = APIRequestFactory()
+    pool    = [factory.post('/api/login/', REMOTE_ADDR=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}')
+               for i in range(clients)]
+    for request in pool:
+        request.user = AnonymousUser()
+    samples, rejected = [], []
+    lock = threading.Lock()
+
+    def worker(offset):
+        mine, denied = [], 0
+        try:
+            for n in range(offset, requests, threads):
+                request = pool[n % clients]
+                start   = time.perf_counter()
+                allowed = throttle_class().allow_request(request, None)
+                mine.append((time.perf_counter() - start) * 1e6)
+                denied += not allowed
+        finally:
+            close_old_connections()
+        with lock:
+            samples.extend(mine)
+            rejected.append(denied)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return samples, time.perf_counter() - started, sum(rejected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rate', default='1000000/min')
+    args = parser.parse_args()
+
+    print(f'{args.requests} checks over {args.clients} client(s), {args.threads} thread(s), rate {args.rate}')
+    print(f"{'variant':<44} {'p50':>9} {'p99':>9} {'checks/s':>10} {'rejected':>9}")
+    try:
+        for label, throttle_class, store in make_variants(args.rate):
+            ThrottleCounter.objects.filter(key__startswith='throttle:bench:').delete()
+            with mock.patch.object(throttling, '_store', store or throttling.get_store()):
+                samples, elapsed, rejected = run(throttle_class, args.requests, args.clients, args.threads)
+            samples.sort()
+            p50, p99 = statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+            print(f'{label:<44} {p50:>7.1f}us {p99:>7.1f}us {len(samples) / elapsed:>10,.0f} {rejected:>9}')
+    finally:
+        ThrottleCounter.objects.filter(key__startswith='throttle:bench:').delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
+import copy
 from pathlib import Path
-from decouple import config
+from decouple import Choices, Csv, config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -18,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
@@ -25,8 +27,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.query_metrics.QueryMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.db_router.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,6 +71,73 @@ DATABASES = {
     }
 }
 
+# ── Database connections ──────────────────────────────────────────────────────
+# DB_CONN_MODE picks how requests get a connection:
+#   pool       — a psycopg pool per worker process, shared by its threads and
+#                by the per-request threads of the ASGI app (default)
+#   persistent — one connection per thread, reused for DB_CONN_MAX_AGE
+#                seconds; WSGI only, since ASGI runs each request in a new thread
+#   none       — a new connection (TCP, TLS and auth) for every request
+DB_CONN_MODE = config('DB_CONN_MODE', default='pool', cast=Choices(['pool', 'persistent', 'none']))
+
+# Ping a reused connection before handing it out, so a server-side
+# disconnect shows up as a fresh connection instead of a failed request
+DATABASES['default']['CONN_HEALTH_CHECKS'] = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
+if DB_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'name':         'default',
+        'min_size':     config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        # Per worker process; keep workers * max_size under the server's max_connections
+        'max_size':     config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        # Seconds a request waits for a free connection before failing
+        'timeout':      config('DB_POOL_TIMEOUT', default=10, cast=float),
+        # Requests allowed to queue for one; beyond that they fail at once (0 = no limit)
+        'max_waiting':  config('DB_POOL_MAX_WAITING', default=0, cast=int),
+        # Connections are replaced after this long, and closed after idling this long
+        'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800, cast=float),
+        'max_idle':     config('DB_POOL_MAX_IDLE', default=300, cast=float),
+    }
+elif DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=600, cast=int)
+
+# ── Read replicas ─────────────────────────────────────────────────────────────
+# Comma-separated host[:port][/name] of streaming replicas of the default
+# database, added as replica1, replica2, ... with the same credentials and
+# connection mode. Views decorated with api.db_router.read_from_replica read
+# from them; everything else uses the primary.
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=Csv())
+
+for n, address in enumerate(DB_REPLICAS, 1):
+    address, _, name = address.partition('/')
+    host, _, port    = address.partition(':')
+    replica = copy.deepcopy(DATABASES['default'])
+    replica.update({
+        'HOST': host,
+        'PORT': port or replica['PORT'],
+        'NAME': name or replica['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    })
+    if 'pool' in replica['OPTIONS']:
+        replica['OPTIONS']['pool']['name'] = f'replica{n}'
+    DATABASES[f'replica{n}'] = replica
+
+DB_REPLICA_ALIASES = [f'replica{n}' for n in range(1, len(DB_REPLICAS) + 1)]
+DATABASE_ROUTERS   = ['api.db_router.PrimaryReplicaRouter']
+
+# After a write a client reads from the primary for this long, so it sees its
+# own changes. Pins are kept in DB_PIN_CACHE_ALIAS, which must be shared by
+# all workers (Redis/Memcached) for a pin to hold across them; with replicas
+# configured, a per-process cache fails the api.E001 system check.
+DB_PIN_SECONDS     = config('DB_PIN_SECONDS', default=10, cast=int)
+DB_PIN_CACHE_ALIAS = config('DB_PIN_CACHE_ALIAS', default='default')
+# Replicas are probed this often per process; one that is unreachable or
+# lags more than DB_REPLICA_MAX_LAG_SECONDS is skipped for
+# DB_REPLICA_RETRY_SECONDS
+DB_REPLICA_CHECK_SECONDS   = config('DB_REPLICA_CHECK_SECONDS', default=10, cast=int)
+DB_REPLICA_MAX_LAG_SECONDS = config('DB_REPLICA_MAX_LAG_SECONDS', default=5, cast=float)
+DB_REPLICA_RETRY_SECONDS   = config('DB_REPLICA_RETRY_SECONDS', default=30, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -88,9 +159,104 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Per-endpoint limits for api.throttling; a sliding window per client
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip':       config('THROTTLE_LOGIN_IP', default='30/min'),
+        'signup_ip':      config('THROTTLE_SIGNUP_IP', default='10/min'),
+        'otp_send_ip':    config('THROTTLE_OTP_SEND_IP', default='20/hour'),
+        'otp_send_user':  config('THROTTLE_OTP_SEND_USER', default='10/hour'),
+        'otp_send_email': config('THROTTLE_OTP_SEND_EMAIL', default='10/hour'),
+    },
+    # Proxies in front of the app that append to X-Forwarded-For. 0 ignores the
+    # header and keys on REMOTE_ADDR; set it to the number of trusted proxies
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
-# ── Cache — stores OTPs in memory, auto-deletes after timeout ─────────────────
+# Where throttle counters live: api.throttling.DBWindowStore (shared through
+# the database) or api.throttling.CacheWindowStore (THROTTLE_CACHE_ALIAS must
+# then be a shared cache such as Redis/Memcached)
+THROTTLE_STORE       = config('THROTTLE_STORE', default='api.throttling.DBWindowStore')
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='default')
+
+# ── Query metrics ─────────────────────────────────────────────────────────────
+# Share of requests whose queries are timed and checked for N+1 patterns
+# (0 turns it off, 1 records every request)
+QUERY_METRICS_SAMPLE_RATE        = config('QUERY_METRICS_SAMPLE_RATE', default=0.05, cast=float)
+# A query shape repeated this many times in one request is an N+1 candidate
+QUERY_METRICS_NPLUSONE_THRESHOLD = config('QUERY_METRICS_NPLUSONE_THRESHOLD', default=5, cast=int)
+# Requests over this many statements are logged at WARNING
+QUERY_METRICS_MAX_QUERIES        = config('QUERY_METRICS_MAX_QUERIES', default=30, cast=int)
+QUERY_METRICS_SLOWEST            = config('QUERY_METRICS_SLOWEST', default=5, cast=int)
+# Bearer token Prometheus scrapes internal/metrics/ with; empty = staff only
+METRICS_TOKEN                    = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per sampled request
+        'api.query_metrics': {
+            'handlers':  ['console'],
+            'level':     config('QUERY_METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# ── Trips ─────────────────────────────────────────────────────────────────────
+# How long trips/join/hold/ keeps a seat before it is released again
+SEAT_HOLD_SECONDS = config('SEAT_HOLD_SECONDS', default=600, cast=int)
+
+# groups/<id>/ member cards; invalidated on join/leave, rename and profile edits.
+# GROUP_CACHE_ALIAS must be shared by all workers (Redis/Memcached): with a
+# per-process cache the other workers keep serving a stale card until the TTL
+# (manage.py check --deploy warns, api.W001)
+GROUP_MEMBERS_CACHE_TTL = config('GROUP_MEMBERS_CACHE_TTL', default=300, cast=int)
+GROUP_CACHE_ALIAS       = config('GROUP_CACHE_ALIAS', default='default')
+
+# profile/ and profile/<id>/ bodies, keyed by a per-user version bumped on change.
+# PROFILE_CACHE_ALIAS must be shared by all workers, like GROUP_CACHE_ALIAS
+PROFILE_CACHE_TTL   = config('PROFILE_CACHE_TTL', default=600, cast=int)
+PROFILE_CACHE_ALIAS = config('PROFILE_CACHE_ALIAS', default='default')
+
+# manage.py materialize_completed_trips --recent, run from cron, only looks at
+# trips that ended within the last COMPLETED_TRIPS_LOOKBACK_DAYS
+COMPLETED_TRIPS_LOOKBACK_DAYS = config('COMPLETED_TRIPS_LOOKBACK_DAYS', default=7, cast=int)
+
+# ── Search ────────────────────────────────────────────────────────────────────
+# trips/autocomplete/ suggests from the N most common destinations, rebuilt
+# in the background once the in-memory index is older than the refresh interval
+AUTOCOMPLETE_DESTINATIONS    = config('AUTOCOMPLETE_DESTINATIONS', default=5000, cast=int)
+AUTOCOMPLETE_REFRESH_SECONDS = config('AUTOCOMPLETE_REFRESH_SECONDS', default=300, cast=int)
+
+# ── Posts ─────────────────────────────────────────────────────────────────────
+POST_MAX_IMAGES_PER_REQUEST = config('POST_MAX_IMAGES_PER_REQUEST', default=50, cast=int)
+
+# ── Feed ──────────────────────────────────────────────────────────────────────
+# api.feed.DBTimelineStore, or api.feed.CacheTimelineStore for local testing
+FEED_TIMELINE_BACKEND     = config('FEED_TIMELINE_BACKEND', default='api.feed.DBTimelineStore')
+FEED_TIMELINE_CAP         = config('FEED_TIMELINE_CAP', default=500, cast=int)
+FEED_FANOUT_BATCH_SIZE    = config('FEED_FANOUT_BATCH_SIZE', default=1000, cast=int)
+# Authors above this follower count are merged in at read time instead
+FEED_FANOUT_MAX_FOLLOWERS = config('FEED_FANOUT_MAX_FOLLOWERS', default=10000, cast=int)
+FEED_BACKFILL_POSTS       = config('FEED_BACKFILL_POSTS', default=50, cast=int)
+
+# ── OTP ───────────────────────────────────────────────────────────────────────
+# api.otp_store.DBOTPStore (shared by every worker through the database) or
+# api.otp_store.CacheOTPStore (needs a shared cache such as Redis/Memcached in
+# OTP_CACHE_ALIAS; LocMemCache is per process)
+OTP_STORE        = config('OTP_STORE', default='api.otp_store.DBOTPStore')
+OTP_CACHE_ALIAS  = config('OTP_CACHE_ALIAS', default='default')
+OTP_MAX_ATTEMPTS = config('OTP_MAX_ATTEMPTS', default=5, cast=int)
+# Each email may request OTP_RESEND_BURST codes at once, then one more every
+# OTP_RESEND_REFILL_SECONDS
+OTP_RESEND_BURST          = config('OTP_RESEND_BURST', default=3, cast=int)
+OTP_RESEND_REFILL_SECONDS = config('OTP_RESEND_REFILL_SECONDS', default=120, cast=int)
+
+# ── Cache — per-process; anything shared between workers belongs elsewhere ────
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -98,14 +264,40 @@ CACHES = {
 }
 
 # ── Gmail SMTP ────────────────────────────────────────────────────────────────
-EMAIL_BACKEND       = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST          = 'smtp.gmail.com'
-EMAIL_PORT          = 587
-EMAIL_USE_TLS       = True
+# Overridable so tests and benchmarks can point at a local SMTP stand-in
+EMAIL_BACKEND       = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST          = config('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_PORT          = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_USE_TLS       = config('EMAIL_USE_TLS', default=True, cast=bool)
+EMAIL_TIMEOUT       = config('EMAIL_TIMEOUT', default=30, cast=int)
 EMAIL_HOST_USER     = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL  = config('EMAIL_HOST_USER')
 
+# Outgoing mail is queued in email_outbox and sent by manage.py dispatch_outbox
+OUTBOX_BATCH_SIZE         = config('OUTBOX_BATCH_SIZE', default=50, cast=int)
+OUTBOX_WORKERS            = config('OUTBOX_WORKERS', default=4, cast=int)
+OUTBOX_MAX_ATTEMPTS       = config('OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+# Retry n waits OUTBOX_RETRY_BASE_SECONDS * 2**(n-1), capped at OUTBOX_RETRY_MAX_SECONDS
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=15, cast=int)
+OUTBOX_RETRY_MAX_SECONDS  = config('OUTBOX_RETRY_MAX_SECONDS', default=900, cast=int)
+# A claimed batch is held for this long plus EMAIL_TIMEOUT for the connection
+# and for each email in it; one not finished by then is picked up again
+OUTBOX_LEASE_SECONDS      = config('OUTBOX_LEASE_SECONDS', default=120, cast=int)
+
 # ── Supabase ──────────────────────────────────────────────────────────────────
 SUPABASE_URL        = config('SUPABASE_URL')
-SUPABASE_JWT_SECRET = config('SUPABASE_JWT_SECRET')
\ No newline at end of file
+SUPABASE_JWT_SECRET = config('SUPABASE_JWT_SECRET')
+
+# JWKS keys are cached for the whole process and refreshed in the background
+SUPABASE_JWKS_URL           = config(
+    'SUPABASE_JWKS_URL',
+    default='https://tqmrytzypqsuxjwdrihh.supabase.co/auth/v1/.well-known/jwks.json')
+SUPABASE_JWKS_TTL           = config('SUPABASE_JWKS_TTL', default=3600, cast=int)
+SUPABASE_JWKS_REFRESH_AHEAD = config('SUPABASE_JWKS_REFRESH_AHEAD', default=300, cast=int)
+SUPABASE_JWKS_TIMEOUT       = config('SUPABASE_JWKS_TIMEOUT', default=5, cast=int)
+
+# Verified claims, keyed by token digest; set the backend to a CACHES alias
+# to share entries between worker processes
+SUPABASE_CLAIMS_CACHE_SIZE    = config('SUPABASE_CLAIMS_CACHE_SIZE', default=10000, cast=int)
+SUPABASE_CLAIMS_CACHE_BACKEND = config('SUPABASE_CLAIMS_CACHE_BACKEND', default='')
\ No newline at end of file